@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import codecs
+import json
+from typing import BinaryIO, Container, Iterator
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = ' \t\n\r'
+
+class JsonStreamError(ValueError):
+    """The text is not a JSON object of the expected shape"""
+    pass
+
+class JsonObjectReader():
+    """
+    Read the members of a top-level JSON object from a binary file, a chunk at a time.
+
+    Arrays under the streamed keys are decoded an element at a time, so only
+    one element and the text around it are held at once.
+    """
+    def __init__(self, fp: BinaryIO, chunkSize: int = CHUNK_SIZE):
+        self.fp = fp
+        self.chunkSize = chunkSize
+        self.bytesRead = 0
+        self.__textDecoder = codecs.getincrementaldecoder('utf-8')()
+        self.__jsonDecoder = json.JSONDecoder()
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+
+    def __fill(self, size: int) -> bool:
+        """Read about size more bytes, False if already at the end"""
+        if self.__eof:
+            return False
+        data = self.fp.read(size)
+        self.bytesRead += len(data)
+        if data:
+            text = self.__textDecoder.decode(data)
+        else:
+            self.__eof = True
+            text = self.__textDecoder.decode(b'', final=True)
+        # Consumed text is dropped here, it is never looked at again
+        self.__buffer = self.__buffer[self.__pos:] + text
+        self.__pos = 0
+        return True
+
+    def __peek(self) -> str:
+        """Skip whitespace, return the next character, or '' at the end"""
+        while True:
+            buffer = self.__buffer
+            pos = self.__pos
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            self.__pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self.__fill(self.chunkSize):
+                return ''
+
+    def __expect(self, chars: str) -> str:
+        char = self.__peek()
+        if char == '' or char not in chars:
+            raise JsonStreamError(f"Expecting one of {' '.join(chars)} near byte {self.bytesRead}")
+        self.__pos += 1
+        return char
+
+    def __value(self) -> object:
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__jsonDecoder.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError:
+                # Likely cut by the chunk, read as much again so a large value is not decoded over and over
+                if not self.__fill(max(self.chunkSize, len(self.__buffer) - self.__pos)):
+                    raise
+                continue
+            # A number at the end of the buffer may go on in the next chunk
+            if end == len(self.__buffer) and self.__fill(self.chunkSize):
+                continue
+            self.__pos = end
+            return value
+
+    def members(self, streamKeys: Container[str] = ()) -> Iterator[tuple[str, int | None, object]]:
+        """
+        Yield (key, None, value) for each member of the object.
+
+        Members under streamKeys must be arrays, (key, index, element) is
+        yielded for each of their elements instead, or (key, None, []) once
+        if the array is empty so the key is still seen.
+        """
+        self.__expect('{')
+        if self.__peek() == '}':
+            self.__pos += 1
+        else:
+            while True:
+                key = self.__value()
+                if type(key) != str:
+                    raise JsonStreamError(f"Expecting a property name near byte {self.bytesRead}")
+                self.__expect(':')
+                if key in streamKeys:
+                    if self.__peek() != '[':
+                        raise JsonStreamError(f"Expecting an array for '{key}'")
+                    self.__pos += 1
+                    if self.__peek() == ']':
+                        self.__pos += 1
+                        yield key, None, []
+                    else:
+                        index = 0
+                        while True:
+                            yield key, index, self.__value()
+                            index += 1
+                            if self.__expect(',]') == ']':
+                                break
+                else:
+                    yield key, None, self.__value()
+                if self.__expect(',}') == '}':
+                    break
+        if self.__peek() != '':
+            raise JsonStreamError(f"Extra data near byte {self.bytesRead}")
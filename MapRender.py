@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from itertools import chain
+from operator import attrgetter
+from typing import TYPE_CHECKING, Hashable
+
+import numpy as np
+import PIL.Image
+from PIL import ImageColor
+
+from CommonPalette import AOE_PAL
+from _prebuild.TerrainLut import TERRAIN_LUT_BYTES, TERRAIN_LUT_SHAPE
+
+if TYPE_CHECKING:
+    from AoE2ScenarioParser.objects.managers.map_manager import MapManager
+    from AoE2ScenarioParser.objects.data_objects.unit import Unit
+
+# [terrain_id][elevation][RGB], generated by prebuild.py from TerrainPal.
+# The last row is the fallback colour for unknown terrain ids.
+TERRAIN_LUT = np.frombuffer(TERRAIN_LUT_BYTES, dtype=np.uint8).reshape(TERRAIN_LUT_SHAPE)
+TERRAIN_FALLBACK_ID = TERRAIN_LUT_SHAPE[0] - 1
+
+AOE_PAL_RGB = np.array([ImageColor.getrgb(color) for color in AOE_PAL], dtype=np.uint8)
+
+def gatherTerrain(mm: MapManager) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Read terrain_id and elevation of every tile in a single pass.
+
+    Return two arrays shaped [y][x], ASP stores tiles row by row.
+    """
+    tiles = mm.terrain
+    flat = np.fromiter(chain.from_iterable((tile.terrain_id, tile.elevation) for tile in tiles),
+                       dtype=np.int32, count=len(tiles) * 2)
+    flat = flat.reshape(mm.map_height, mm.map_width, 2)
+    return flat[..., 0], flat[..., 1]
+
+def rasterizeTerrain(mm: MapManager) -> PIL.Image.Image:
+    """Build the terrain dot map, one pixel per tile"""
+    terrainIds, elevations = gatherTerrain(mm)
+    terrainIds = np.where((terrainIds >= 0) & (terrainIds < TERRAIN_FALLBACK_ID), terrainIds, TERRAIN_FALLBACK_ID)
+    elevations = np.clip(elevations, 0, TERRAIN_LUT.shape[1] - 1)
+    return PIL.Image.fromarray(TERRAIN_LUT[terrainIds, elevations])
+
+class UnitDotPalette():
+    """
+    unit_const -> RGBA of its dot on the unit layer.
+
+    Build once per language load, UNIT_NAME holds the minimap info of units.
+    Alpha 0 means the unit is not drawn, consts flagged in `byPlayer` take their owner's colour.
+    """
+    def __init__(self, unitNames: dict[int, dict], playerColors: list[tuple[int, int, int]]):
+        consts = [const for const, info in unitNames.items()
+                  if isinstance(const, int) and const >= 0 and isinstance(info, dict)]
+        size = max(consts, default=-1) + 1
+        self.colors = np.zeros((size, 4), dtype=np.uint8)
+        self.byPlayer = np.zeros(size, dtype=bool)
+        self.playerColors = np.array([(*color, 255) for color in playerColors], dtype=np.uint8)
+        for const in consts:
+            info = unitNames[const]
+            if info.get('minimap_mode') not in (1, 4):
+                continue
+            if info.get('minimap_color', 0) == 0:
+                self.byPlayer[const] = True
+            else:
+                self.colors[const, :3] = AOE_PAL_RGB[info['minimap_color']]
+            self.colors[const, 3] = 255
+        # Whole RGBA values, one uint32 per dot, for rasterizeUnits
+        self.colorWords = self.colors.view(np.uint32)[:, 0]
+        self.playerColorWords = self.playerColors.view(np.uint32)[:, 0]
+        self.drawn = self.colors[:, 3] != 0
+
+    def colorOf(self, unitConst: int, player: int) -> tuple[int, int, int, int] | None:
+        """Return the dot colour of a unit, None if it is not drawn"""
+        if not 0 <= unitConst < len(self.colors) or self.colors[unitConst, 3] == 0:
+            return None
+        if self.byPlayer[unitConst]:
+            return tuple(int(c) for c in self.playerColors[player])
+        return tuple(int(c) for c in self.colors[unitConst])
+
+def rasterizeUnits(units: list[Unit], sizeMap: int, palette: UnitDotPalette) -> PIL.Image.Image:
+    """
+    Build the RGBA unit layer, 2 dots per tile plus one border dot.
+
+    A unit is at dot (int(x * 2 + 0.5), int(y * 2 + 0.5)), the later unit wins a shared dot.
+    """
+    sizeLayer = sizeMap * 2 + 1
+    layer = np.zeros(sizeLayer * sizeLayer, dtype=np.uint32)
+    if units:
+        # One C-level getter per field, reading the attributes is most of the time here
+        count = len(units)
+        x = np.fromiter(map(attrgetter('x'), units), dtype=np.float64, count=count)
+        y = np.fromiter(map(attrgetter('y'), units), dtype=np.float64, count=count)
+        consts = np.fromiter(map(attrgetter('unit_const'), units), dtype=np.int64, count=count)
+        players = np.fromiter(map(attrgetter('player'), units), dtype=np.int64, count=count)
+        shown = (0 <= x) & (x < sizeMap) & (0 <= y) & (y < sizeMap) & (0 <= consts) & (consts < len(palette.colors))
+        shown[shown] = palette.drawn[consts[shown]]
+        x, y, consts, players = x[shown], y[shown], consts[shown], players[shown]
+        colors = palette.colorWords[consts]
+        byPlayer = palette.byPlayer[consts]
+        colors[byPlayer] = palette.playerColorWords[np.clip(players[byPlayer], 0, len(palette.playerColors) - 1)]
+        dots = (y * 2 + 0.5).astype(np.int64) * sizeLayer + (x * 2 + 0.5).astype(np.int64)
+        # Keep the last unit of every dot, scatter order of duplicated indices is unspecified
+        dots, lastIndex = np.unique(dots[::-1], return_index=True)
+        layer[dots] = colors[::-1][lastIndex]
+    return PIL.Image.fromarray(layer.view(np.uint8).reshape(sizeLayer, sizeLayer, 4))
+
+class ImageLruCache():
+    """Least recently used cache of images, bounded by their total size in bytes"""
+    def __init__(self, maxBytes: int):
+        self.maxBytes = maxBytes
+        self._images: OrderedDict[Hashable, PIL.Image.Image] = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _sizeOf(image: PIL.Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key: Hashable) -> PIL.Image.Image | None:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key: Hashable, image: PIL.Image.Image):
+        if key in self._images:
+            self._bytes -= self._sizeOf(self._images.pop(key))
+        size = self._sizeOf(image)
+        if size > self.maxBytes:
+            return
+        while self._bytes + size > self.maxBytes:
+            _, oldest = self._images.popitem(last=False)
+            self._bytes -= self._sizeOf(oldest)
+        self._images[key] = image
+        self._bytes += size
+
+    def clear(self):
+        self._images.clear()
+        self._bytes = 0
+
+class MapCompositor():
+    """
+    Terrain, unit and selection layers composed at 4 pixels per tile.
+
+    Every setter recomposes only what it changed and returns the dirty boxes
+    in composite pixels, `versions` changes with any layer.
+    """
+    SELECTION_COLOR = (255, 255, 0)
+    SELECTION_ALPHA = 176
+
+    def __init__(self):
+        self.terrain: PIL.Image.Image = None
+        self.units: PIL.Image.Image = None
+        # (x1, y1, x2, y2) in tiles, both ends included
+        self.selection: tuple[int, int, int, int] | None = None
+        self.image: PIL.Image.Image = PIL.Image.new('RGB', (1, 1))
+        self.terrainVersion = 0
+        self.unitVersion = 0
+        self.selectionVersion = 0
+
+    @property
+    def versions(self) -> tuple[int, int, int]:
+        return (self.terrainVersion, self.unitVersion, self.selectionVersion)
+
+    @property
+    def sizeMap(self) -> int:
+        return self.terrain.width
+
+    def load(self, terrain: PIL.Image.Image, units: PIL.Image.Image):
+        """Replace every layer and compose the whole map, clearing the selection"""
+        self.terrain = terrain
+        self.units = units
+        self.selection = None
+        self.image = PIL.Image.new('RGB', (terrain.width * 4, terrain.height * 4))
+        self.terrainVersion += 1
+        self.unitVersion += 1
+        self.selectionVersion += 1
+        self._compose((0, 0, terrain.width, terrain.height))
+
+    def setUnits(self, units: PIL.Image.Image) -> list[tuple[int, int, int, int]]:
+        self.units = units
+        self.unitVersion += 1
+        return self._compose((0, 0, self.sizeMap, self.sizeMap))
+
+    def setUnitDot(self, dotX: int, dotY: int, color: tuple[int, int, int, int] | None) -> list[tuple[int, int, int, int]]:
+        """Draw a dot of the unit layer, None clears it"""
+        self.units.putpixel((dotX, dotY), color or (0, 0, 0, 0))
+        self.unitVersion += 1
+        # A dot covers composite pixels 2 * dot - 1 and 2 * dot
+        return self._compose(((2 * dotX - 1) // 4, (2 * dotY - 1) // 4, 2 * dotX // 4 + 1, 2 * dotY // 4 + 1))
+
+    def setSelection(self, selection: tuple[int, int, int, int] | None) -> list[tuple[int, int, int, int]]:
+        """Move the selected area, None clears it"""
+        old, self.selection = self.selection, selection
+        if old == selection:
+            return []
+        self.selectionVersion += 1
+        tileBoxes = [(x1, y1, x2 + 1, y2 + 1) for x1, y1, x2, y2 in filter(None, (old, selection))]
+        if len(tileBoxes) == 2 and self._intersect(*tileBoxes) is not None:
+            # Overlapped areas, one box instead of composing the overlap twice
+            (ax1, ay1, ax2, ay2), (bx1, by1, bx2, by2) = tileBoxes
+            tileBoxes = [(min(ax1, bx1), min(ay1, by1), max(ax2, bx2), max(ay2, by2))]
+        return [dirty for tileBox in tileBoxes for dirty in self._compose(tileBox)]
+
+    @staticmethod
+    def _intersect(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> tuple[int, int, int, int] | None:
+        box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return None
+        return box
+
+    def _compose(self, tileBox: tuple[int, int, int, int]) -> list[tuple[int, int, int, int]]:
+        """Compose a box of tiles (x1, y1, x2, y2), ends excluded, into the composite"""
+        tileBox = self._intersect(tileBox, (0, 0, self.sizeMap, self.sizeMap))
+        if tileBox is None:
+            return []
+        tx1, ty1, tx2, ty2 = tileBox
+        region = self.terrain.crop(tileBox)
+        if self.selection is not None:
+            x1, y1, x2, y2 = self.selection
+            selected = self._intersect(tileBox, (x1, y1, x2 + 1, y2 + 1))
+            if selected is not None:
+                size = (selected[2] - selected[0], selected[3] - selected[1])
+                region.paste(self.SELECTION_COLOR, (selected[0] - tx1, selected[1] - ty1),
+                             PIL.Image.new('L', size, self.SELECTION_ALPHA))
+        region = region.resize((region.width * 4, region.height * 4), resample=PIL.Image.NEAREST)
+        # The unit layer has 2 dots per tile and is drawn 1 pixel up-left, composite pixel p shows dot (p + 1) // 2
+        dots = self.units.crop((tx1 * 2, ty1 * 2, tx2 * 2 + 1, ty2 * 2 + 1))
+        dots = dots.resize((dots.width * 2, dots.height * 2), resample=PIL.Image.NEAREST)
+        region.paste(dots, (-1, -1), dots)
+        self.image.paste(region, (tx1 * 4, ty1 * 4))
+        return [(tx1 * 4, ty1 * 4, tx2 * 4, ty2 * 4)]
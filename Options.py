@@ -15,6 +15,7 @@ class GlobalOptions():
         self.nameGaiaFix = ttk.StringVar(value="(GAIA)")
 
         self.addDuplicateMark = ttk.BooleanVar(value=False)
+        self.compactTriggerJson = ttk.BooleanVar(value=False)
         self.load(f'{self._baseDir}/config.json')
 
     def load(self, file):
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import copyreg
+import gc
+import hashlib
+import importlib
+import io
+import os
+import pickle
+import tempfile
+import types
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Event, Thread
+from uuid import UUID
+
+import AoE2ScenarioParser
+from AoE2ScenarioParser.objects.aoe2_object_manager import AoE2ObjectManager
+from AoE2ScenarioParser.scenarios import aoe2_scenario
+from AoE2ScenarioParser.scenarios.aoe2_de_scenario import AoE2DEScenario
+
+from _prebuild.version import VERSION_STRING
+
+# The scenario being restored, every object of a snapshot refers to it by this UUID
+_restoringUuid: UUID = None
+
+def _restoredUuid() -> UUID:
+    return _restoringUuid
+
+def _importModule(name: str) -> types.ModuleType:
+    return importlib.import_module(name)
+
+@contextmanager
+def _gcPaused():
+    """Millions of objects are created or visited, collecting in between only costs time"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+class ScenarioCache():
+    """
+    Snapshots of parsed scenario sections on disk.
+
+    A snapshot is keyed by the content hash of the scenario file, the ASP
+    version and the TC version, and least recently used ones are evicted
+    beyond maxBytes. Restoring one skips decompressing and parsing the file,
+    the managers are still set up from the sections as ASP does.
+    """
+    FORMAT = 1
+    SUFFIX = '.snapshot'
+
+    def __init__(self, cacheDir: str, maxBytes: int = 512 * 1024 * 1024):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        # Scenario uuid -> set when the scenario is written before its snapshot is
+        self._abandoned: dict[UUID, Event] = {}
+
+    @classmethod
+    def keyOf(cls, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(f'|{AoE2ScenarioParser.__version__}|{VERSION_STRING}|{cls.FORMAT}'.encode())
+        return digest.hexdigest()
+
+    def _snapshotPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, key + ScenarioCache.SUFFIX)
+
+    def load(self, path: str, key: str) -> AoE2DEScenario | None:
+        """Restore a scenario from its snapshot, None if there is none"""
+        global _restoringUuid
+        snapshotPath = self._snapshotPath(key)
+        try:
+            with open(snapshotPath, 'rb') as f:
+                data = zlib.decompress(f.read())
+            os.utime(snapshotPath)
+        except (OSError, zlib.error):
+            return None
+        try:
+            with _gcPaused():
+                meta, sectionsData = pickle.loads(data)
+                if meta['format'] != ScenarioCache.FORMAT:
+                    raise ValueError('Snapshot format mismatch')
+                # The same steps as AoE2Scenario.from_file, with sections from the snapshot
+                scenario = AoE2DEScenario(meta['game_version'], meta['scenario_version'],
+                                          source_location=path, name=Path(path).stem, variant=meta['variant'])
+                scenario._load_structure()
+                aoe2_scenario._initialise_version_dependencies(scenario.game_version, scenario.scenario_version)
+                _restoringUuid = scenario.uuid
+                try:
+                    scenario.sections = pickle.loads(sectionsData)
+                finally:
+                    _restoringUuid = None
+                scenario._file_header = meta['file_header']
+                scenario._object_manager = AoE2ObjectManager(scenario.uuid)
+                scenario._object_manager.setup()
+        except Exception as e:
+            print(f'Discard scenario snapshot {key}: {e!r}')
+            self._remove(snapshotPath)
+            return None
+        print(f'Restored scenario from snapshot {key}')
+        return scenario
+
+    def storeLater(self, key: str, scenario: AoE2DEScenario):
+        """Write a snapshot of a newly parsed scenario in a background thread"""
+        abandoned = self._abandoned.setdefault(scenario.uuid, Event())
+        Thread(target=self._store, args=(key, scenario, abandoned), name='ScenarioCache', daemon=True).start()
+
+    def abandon(self, scenario: AoE2DEScenario):
+        """
+        Drop a pending snapshot, call before the scenario is written.
+
+        Writing commits the managers back to the sections, a snapshot taken
+        meanwhile would not match the file content it is keyed by.
+        """
+        abandoned = self._abandoned.pop(scenario.uuid, None)
+        if abandoned is not None:
+            abandoned.set()
+
+    def _store(self, key: str, scenario: AoE2DEScenario, abandoned: Event):
+        try:
+            uuid = scenario.uuid
+            buffer = io.BytesIO()
+            pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.dispatch_table = copyreg.dispatch_table.copy()
+            pickler.dispatch_table[types.ModuleType] = lambda module: (_importModule, (module.__name__,))
+            pickler.dispatch_table[UUID] = lambda value: (_restoredUuid, ()) if value == uuid else value.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+            # No GC pause here, it is process wide and the window keeps running meanwhile
+            pickler.dump(scenario.sections)
+            if abandoned.is_set():
+                return
+            meta = {
+                'format': ScenarioCache.FORMAT,
+                'game_version': scenario.game_version,
+                'scenario_version': scenario.scenario_version,
+                'variant': scenario.variant,
+                'file_header': scenario._file_header,
+            }
+            data = zlib.compress(pickle.dumps((meta, buffer.getvalue()), protocol=pickle.HIGHEST_PROTOCOL), 1)
+            if abandoned.is_set():
+                return
+            os.makedirs(self.cacheDir, exist_ok=True)
+            fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmpPath, self._snapshotPath(key))
+            except OSError:
+                self._remove(tmpPath)
+                raise
+            self.evict()
+        except Exception as e:
+            # Sections changed under the pickler, or the disk refused, the next load parses again
+            print(f'Fail to store scenario snapshot {key}: {e!r}')
+        finally:
+            self._abandoned.pop(scenario.uuid, None)
+
+    def evict(self):
+        """Remove least recently used snapshots until they fit in maxBytes"""
+        try:
+            entries = [entry for entry in os.scandir(self.cacheDir)
+                       if entry.is_file() and entry.name.endswith(ScenarioCache.SUFFIX)]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        total = 0
+        for entry in entries:
+            total += entry.stat().st_size
+            if total > self.maxBytes:
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import queue
+from threading import Event, Lock, Thread, local
+from typing import Callable
+
+from AoE2ScenarioParser.scenarios.aoe2_de_scenario import AoE2DEScenario
+
+from ScenarioCache import ScenarioCache
+
+# Content sections in the order ASP parses them
+ASP_SECTIONS = ('FileHeader', 'DataHeader', 'Messages', 'Cinematics', 'BackgroundImage', 'PlayerDataTwo',
+                'GlobalVictory', 'Diplomacy', 'Options', 'Map', 'Units', 'Triggers', 'Files')
+
+class ScenarioLoadCancelled(BaseException):
+    """Raised in the worker thread, a BaseException so ASP can not catch it as a parsing error"""
+
+class ScenarioLoader():
+    """
+    Parse a scenario file with ASP in a worker thread.
+
+    ASP reports progress by printing, so whatever the worker writes to stdout
+    must reach `catchOutput`. Progress and the result are queued, and `poll`
+    dispatches them to the callbacks on the Tk thread.
+
+    A cancelled loader drops its result at once, ASP stops at its next status print.
+    With a cache, an unchanged file is restored from its snapshot instead of parsed.
+    """
+    # ASP keeps version dependent globals, never parse two scenarios at a time
+    PARSE_LOCK = Lock()
+    SECTION_MARK = '🔄 Gathering '
+    _worker = local()
+
+    def __init__(self, path: str,
+                 onProgress: Callable[[str, int, int], None],
+                 onDone: Callable[[AoE2DEScenario], None],
+                 onError: Callable[[Exception], None],
+                 cache: ScenarioCache | None = None):
+        self.path = path
+        self.cache = cache
+        self.onProgress = onProgress
+        self.onDone = onDone
+        self.onError = onError
+        self._events: queue.Queue[tuple] = queue.Queue()
+        self._cancel = Event()
+        self._finished = False
+        self._thread = Thread(target=self._run, name='ScenarioLoader', daemon=True)
+
+    @property
+    def finished(self) -> bool:
+        """True once the result is dispatched, or the load is cancelled"""
+        return self._finished or self._cancel.is_set()
+
+    @staticmethod
+    def current() -> ScenarioLoader | None:
+        """The loader running in this thread, if any"""
+        return getattr(ScenarioLoader._worker, 'loader', None)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self):
+        ScenarioLoader._worker.loader = self
+        try:
+            with ScenarioLoader.PARSE_LOCK:
+                if self._cancel.is_set():
+                    raise ScenarioLoadCancelled()
+                scenario = self._restore()
+                if scenario is None:
+                    scenario = AoE2DEScenario.from_file(self.path)
+                    if self._key is not None:
+                        self.cache.storeLater(self._key, scenario)
+                elif self._cancel.is_set():
+                    raise ScenarioLoadCancelled()
+        except ScenarioLoadCancelled:
+            pass
+        except Exception as e:
+            self._events.put(('error', e))
+        else:
+            self._events.put(('done', scenario))
+
+    def _restore(self) -> AoE2DEScenario | None:
+        self._key = None
+        if self.cache is None:
+            return None
+        try:
+            self._key = self.cache.keyOf(self.path)
+        except OSError:
+            # Let ASP report the unreadable file
+            return None
+        return self.cache.load(self.path, self._key)
+
+    def catchOutput(self, s: str):
+        """Read ASP status prints in the worker thread, raise there once cancelled"""
+        if self._cancel.is_set():
+            raise ScenarioLoadCancelled()
+        start = s.find(ScenarioLoader.SECTION_MARK)
+        if start == -1:
+            return
+        start += len(ScenarioLoader.SECTION_MARK)
+        end = s.find(' data...', start)
+        if end > start:
+            section = s[start : end]
+            index = ASP_SECTIONS.index(section) if section in ASP_SECTIONS else 0
+            self._events.put(('progress', section, index, len(ASP_SECTIONS)))
+
+    def poll(self):
+        """Dispatch queued events, call on the Tk thread"""
+        while not self._cancel.is_set():
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if event[0] == 'progress':
+                self.onProgress(*event[1:])
+            else:
+                self._finished = True
+                if event[0] == 'done':
+                    self.onDone(event[1])
+                else:
+                    self.onError(event[1])
@@ -134,4 +134,7 @@ TERRAIN_PAL = {
     119: TERRAIN_COLOR_GRASS,
     120: TERRAIN_COLOR_GRASS,
     121: TERRAIN_COLOR_GRASS
-}
\ No newline at end of file
+}
+
+# Shown for terrain ids missing from TERRAIN_PAL
+TERRAIN_PAL_FALLBACK = TERRAIN_COLOR_BLACK
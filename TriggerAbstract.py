@@ -1,4 +1,7 @@
 import re
+from operator import attrgetter
+from typing import Callable
+from weakref import WeakKeyDictionary
 from Localization import *
 
 from AoE2ScenarioParser.objects.data_objects.trigger import Trigger
@@ -7,6 +10,7 @@ from AoE2ScenarioParser.objects.data_objects.condition import Condition
 from AoE2ScenarioParser.datasets.conditions import ConditionId
 from AoE2ScenarioParser.datasets.effects import EffectId
 from AoE2ScenarioParser.exceptions.asp_exceptions import UnsupportedAttributeError, UnsupportedVersionError
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
 
 
 class FindCFunction():
@@ -958,3 +962,374 @@ def abstractEffect(effect: Effect) -> str:
             return EFFECT_NAME[effect.effect_type]
     else:
         return EFFECT_NAME[effect.effect_type]
+
+class AbstractRenderer():
+    """
+    Abstracts rendered from dispatch tables compiled from the localized formats.
+
+    `compile` runs at language load. An entry holds the pre-fetched format
+    strings of a CE type and a tuple of argument extractors, rendering is a
+    dict lookup and one `format` call. The output is the same as
+    abstractCondition/abstractEffect, they still render types without an entry.
+    """
+    def __init__(self):
+        # condition_type -> (format, inverted format, extractors)
+        self._conditions: dict[int, tuple[str, str, tuple[Callable[[Condition], object], ...]]] = None
+        # effect_type -> (format, shift format, use shift format, extractors)
+        self._effects: dict[int, tuple[str, str | None, Callable[[Effect], bool] | None,
+                                       tuple[Callable[[Effect], object], ...]]] = None
+
+    def compile(self):
+        """Build the tables from TEXT, call again after the language changes"""
+        comparisons = TEXT['datasetComparison']
+        operations = TEXT['datasetOperation']
+        includeCWO = TEXT['fmtStringIncludeCWO']
+
+        def triggerName(ce: Condition | Effect) -> str:
+            triggers = ce.get_scenario().trigger_manager.triggers
+            if ce.trigger_id >= 0 and ce.trigger_id < len(triggers):
+                return ce.get_scenario().trigger_manager.get_trigger(ce.trigger_id).name
+            else:
+                return '<-1>'
+
+        # Shared by conditions and effects
+        player = lambda ce: getPlayerAbstract(ce.source_player)
+        targetPlayer = lambda ce: getPlayerAbstract(ce.target_player)
+        technology = lambda ce: getTechnologyAbstract(ce.technology)
+        quantity = attrgetter('quantity')
+        variable = attrgetter('variable')
+        variable2 = attrgetter('variable2')
+        timer = attrgetter('timer')
+
+        unit = lambda ce: getUnitAbstract(ce.unit_object)
+        nextUnit = lambda ce: getUnitAbstract(ce.next_object)
+        area = lambda ce: getAreaAbstract(ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2)
+        areaOrFullMap = lambda ce: getAreaAbstract(ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2, allowEmpty=True)
+        objects = lambda ce: getNonSpecificUnitAbstract(ce.object_list, ce.object_group, ce.object_type)
+        objectsOrNext = lambda ce: getNonSpecificUnitAbstract(ce.object_list, ce.object_group, ce.object_type,
+                                                              unit=ce.next_object)
+        withCWO = lambda ce: includeCWO if ce.include_changeable_weapon_objects == 1 else ''
+        comparison = lambda ce: comparisons[ce.comparison]
+        conditionArguments = {
+            ConditionId.NONE: (),
+            ConditionId.BRING_OBJECT_TO_AREA: (unit, area),
+            ConditionId.BRING_OBJECT_TO_OBJECT: (unit, nextUnit),
+            ConditionId.OWN_OBJECTS: (player, objects, quantity, withCWO),
+            ConditionId.OWN_FEWER_OBJECTS: (player, objects, quantity, areaOrFullMap, withCWO),
+            ConditionId.OBJECTS_IN_AREA: (player, objects, quantity, areaOrFullMap,
+                                          lambda ce: TEXT['datasetObjectState'][ce.object_state], withCWO),
+            ConditionId.DESTROY_OBJECT: (unit, ),
+            ConditionId.CAPTURE_OBJECT: (player, unit),
+            ConditionId.ACCUMULATE_ATTRIBUTE: (player, lambda ce: getResourceAbstract(ce.attribute), quantity),
+            ConditionId.RESEARCH_TECHNOLOGY: (player, technology),
+            ConditionId.TIMER: (timer, ),
+            ConditionId.OBJECT_SELECTED: (unit, ),
+            ConditionId.AI_SIGNAL: (attrgetter('ai_signal'), ),
+            ConditionId.PLAYER_DEFEATED: (player, ),
+            ConditionId.OBJECT_HAS_TARGET: (unit, objectsOrNext),
+            ConditionId.OBJECT_VISIBLE: (unit, ),
+            ConditionId.OBJECT_NOT_VISIBLE: (unit, ),
+            ConditionId.RESEARCHING_TECH: (player, technology),
+            ConditionId.UNITS_GARRISONED: (unit, quantity),
+            ConditionId.DIFFICULTY_LEVEL: (lambda ce: TEXT['datasetDifficultyLevel'][ce.quantity], ),
+            ConditionId.CHANCE: (quantity, ),
+            ConditionId.TECHNOLOGY_STATE: (player, technology, lambda ce: TEXT['datasetTechnologyState'][ce.quantity]),
+            ConditionId.VARIABLE_VALUE: (variable, quantity, comparison),
+            ConditionId.OBJECT_HP: (unit, quantity, comparison),
+            ConditionId.DIPLOMACY_STATE: (player, targetPlayer, lambda ce: TEXT['datasetDiplomacyState'][ce.quantity]),
+            ConditionId.SCRIPT_CALL: (),
+            ConditionId.OBJECT_SELECTED_MULTIPLAYER: (player, unit),
+            ConditionId.OBJECT_VISIBLE_MULTIPLAYER: (player, unit),
+            ConditionId.OBJECT_HAS_ACTION: (unit, objectsOrNext, lambda ce: TEXT['datasetUnitAIAction'][ce.unit_ai_action]),
+            ConditionId.OR: (),
+            ConditionId.AI_SIGNAL_MULTIPLAYER: (attrgetter('ai_signal'), ),
+            ConditionId.BUILDING_IS_TRADING: (unit, ),
+            ConditionId.DISPLAY_TIMER_TRIGGERED: (attrgetter('timer_id'), ),
+            ConditionId.VICTORY_TIMER: (player, lambda ce: TEXT['datasetVictoryTimerType'][ce.victory_timer_type],
+                                        quantity, comparison),
+            ConditionId.AND: (),
+            ConditionId.DECISION_TRIGGERED: (attrgetter('decision_id'),
+                                             lambda ce: TEXT['datasetDecisionOption'][ce.decision_option]),
+            ConditionId.OBJECT_ATTACKED: (player, objects, unit, quantity),
+            ConditionId.HERO_POWER_CAST: (player, ),
+            ConditionId.COMPARE_VARIABLES: (variable, variable2, comparison),
+            ConditionId.TRIGGER_ACTIVE: (triggerName, ),
+        }
+        formats = TEXT['conditionDescriptionFormat']
+        invertFormats = TEXT['conditionDescriptionInvertFormat']
+        self._conditions = {}
+        for typeKey, extractors in conditionArguments.items():
+            if typeKey in formats:
+                invertFormat = invertFormats[typeKey] if typeKey in invertFormats \
+                    else TEXT['fmtStringNot'] + ' ' + formats[typeKey]
+                self._conditions[typeKey] = (formats[typeKey], invertFormat, extractors)
+
+        unitName = lambda ce: getUnitListName(ce.object_list_unit_id)
+        unitName2 = lambda ce: getUnitListName(ce.object_list_unit_id_2)
+        message = lambda ce: getMessageAbstract(ce.message)
+        operation = lambda ce: operations[ce.operation]
+        location = lambda ce: getLocationAbstract(ce.location_x, ce.location_y)
+        locationOrObject = lambda ce: getLocationAbstract(ce.location_x, ce.location_y, ce.location_object_reference)
+        resource = lambda ce: getResourceAbstract(ce.tribute_list)
+        armorClass = lambda ce: getArmorClassAbstract(ce.armour_attack_class)
+        attackArmorQuantity = attrgetter('armour_attack_quantity')
+        attribute = lambda ce: getAttributesAbstract(ce.object_attributes, ce.armour_attack_class)
+        selectedUnits = lambda ce: getUnitsAbstract(ce.selected_object_ids)
+        cost = lambda ce: getCostAbstract([(ce.resource_1, ce.resource_1_quantity),
+                                           (ce.resource_2, ce.resource_2_quantity),
+                                           (ce.resource_3, ce.resource_3_quantity)])
+        enable = lambda ce: TEXT['fmtDisable'] if ce.enabled == 0 else TEXT['fmtEnable']
+        changeViewTime = lambda ce: TEXT['fmtChangeViewTime'].format(ce.quantity) if ce.quantity > 0 else ''
+        # Units picked by selected ids first, then by the area of units of list, group or type
+        units = lambda ce: getNonSpecificUnitAbstract(ce.object_list_unit_id, ce.object_group, ce.object_type,
+                                                      ce.source_player, ce.selected_object_ids,
+                                                      ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2,
+                                                      allowAreaEmpty=True)
+        unitsOfList = lambda ce: getNonSpecificUnitAbstract(ce.object_list_unit_id, -1, -1,
+                                                            ce.source_player, ce.selected_object_ids,
+                                                            ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2,
+                                                            allowAreaEmpty=True)
+
+        def createObjectFacing(ce: Effect) -> str:
+            if ce.facet == -1:
+                return ''
+            else:
+                return TEXT['fmtStringFaceTo'].format(TEXT['dataUnitFaceToName'].get(ce.facet, f'<{ce.facet}>'))
+
+        def scriptName(ce: Effect) -> str:
+            scriptAbstract = FindCFunction.findFirstCFunctionName(ce.message)
+            if scriptAbstract == None:
+                scriptAbstract = getMessageAbstract(ce.message)
+            return scriptAbstract
+
+        modifyMessage = lambda ce: ce.object_attributes == 50 and ce.quantity == 0
+
+        def modifyValue(ce: Effect) -> object:
+            if modifyMessage(ce):
+                return getMessageAbstract(ce.message)
+            return ce.quantity if ce.object_attributes not in [8,9] else ce.armour_attack_quantity
+
+        effectArguments = {
+            EffectId.NONE: (),
+            EffectId.CHANGE_DIPLOMACY: (player, targetPlayer, lambda ce: TEXT['datasetDiplomacyState'][ce.diplomacy]),
+            EffectId.RESEARCH_TECHNOLOGY: (player, technology,
+                                           lambda ce: TEXT['fmtStringForceResearch'] if ce.force_research_technology else ''),
+            EffectId.SEND_CHAT: (player, message),
+            EffectId.PLAY_SOUND: (player, lambda ce: getLocationAbstract(ce.location_x, ce.location_y,
+                                                                         ce.location_object_reference, allowEmpty=True),
+                                  attrgetter('sound_name')),
+            EffectId.TRIBUTE: (player, targetPlayer, quantity, resource),
+            EffectId.UNLOCK_GATE: (selectedUnits, ),
+            EffectId.LOCK_GATE: (selectedUnits, ),
+            EffectId.ACTIVATE_TRIGGER: (triggerName, ),
+            EffectId.DEACTIVATE_TRIGGER: (triggerName, ),
+            EffectId.AI_SCRIPT_GOAL: (attrgetter('ai_script_goal'), ),
+            EffectId.CREATE_OBJECT: (player, unitName, location, createObjectFacing),
+            EffectId.TASK_OBJECT: (units, locationOrObject, lambda ce: TEXT['datasetActionType'][ce.action_type]),
+            EffectId.DECLARE_VICTORY: (player, lambda ce: TEXT['fmtStringVictory'] if ce.enabled == 1 else TEXT['fmtStringDefeat']),
+            EffectId.KILL_OBJECT: (units, ),
+            EffectId.REMOVE_OBJECT: (lambda ce: getNonSpecificUnitAbstract(ce.object_list_unit_id, ce.object_group, ce.object_type,
+                                                                           ce.source_player, ce.selected_object_ids,
+                                                                           ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2,
+                                                                           allowAreaEmpty=True, unitState=ce.object_state), ),
+            EffectId.CHANGE_VIEW: (player, location,
+                                   lambda ce: TEXT['fmtStringViewScroll'] if ce.scroll == 1 else TEXT['fmtStringViewSwitch'],
+                                   changeViewTime),
+            EffectId.UNLOAD: (units, locationOrObject),
+            EffectId.CHANGE_OWNERSHIP: (units, targetPlayer),
+            EffectId.PATROL: (units, location),
+            EffectId.DISPLAY_INSTRUCTIONS: (message, ),
+            EffectId.CLEAR_INSTRUCTIONS: (attrgetter('instruction_panel_position'), ),
+            EffectId.FREEZE_OBJECT: (units, ),
+            EffectId.USE_ADVANCED_BUTTONS: (),
+            EffectId.DAMAGE_OBJECT: (units, quantity),
+            EffectId.PLACE_FOUNDATION: (player, unitName, location),
+            EffectId.CHANGE_OBJECT_NAME: (unitsOfList, message),
+            EffectId.CHANGE_OBJECT_HP: (units, quantity, operation),
+            EffectId.CHANGE_OBJECT_ATTACK: (units, attackArmorQuantity, operation, armorClass),
+            EffectId.STOP_OBJECT: (units, ),
+            EffectId.ATTACK_MOVE: (units, locationOrObject),
+            EffectId.CHANGE_OBJECT_ARMOR: (units, attackArmorQuantity, operation, armorClass),
+            EffectId.CHANGE_OBJECT_RANGE: (units, quantity, operation),
+            EffectId.CHANGE_OBJECT_SPEED: (units, lambda ce: ce.quantity*10),
+            EffectId.HEAL_OBJECT: (units, quantity),
+            EffectId.TELEPORT_OBJECT: (units, location),
+            EffectId.CHANGE_OBJECT_STANCE: (units, lambda ce: TEXT['datasetAttackStance'][ce.attack_stance]),
+            EffectId.DISPLAY_TIMER: (timer, attrgetter('display_time'),
+                                     lambda ce: TEXT['datasetTimeUnit'].get(ce.time_unit, f'<{ce.time_unit}>'),
+                                     lambda ce: TEXT['fmtTimerReset'] if ce.reset_timer == 1 else TEXT['fmtTimerCreate'],
+                                     message),
+            EffectId.ENABLE_DISABLE_OBJECT: (player, unitName, enable),
+            EffectId.ENABLE_DISABLE_TECHNOLOGY: (player, technology, enable),
+            EffectId.CHANGE_OBJECT_COST: (player, unitName, cost),
+            EffectId.SET_PLAYER_VISIBILITY: (player, targetPlayer, lambda ce: TEXT['datasetVisibilityState'][ce.visibility_state]),
+            EffectId.CHANGE_OBJECT_ICON: (units, unitName2),
+            EffectId.REPLACE_OBJECT: (units, targetPlayer, unitName2),
+            EffectId.CHANGE_OBJECT_DESCRIPTION: (player, unitName, message),
+            EffectId.CHANGE_PLAYER_NAME: (player, message),
+            EffectId.CHANGE_TRAIN_LOCATION: (player, unitName, unitName2, attrgetter('button_location')),
+            EffectId.CHANGE_TECHNOLOGY_LOCATION: (player, technology, unitName2, attrgetter('button_location')),
+            EffectId.CHANGE_CIVILIZATION_NAME: (player, message),
+            EffectId.CREATE_GARRISONED_OBJECT: (unitsOfList, player, unitName2),
+            EffectId.ACKNOWLEDGE_AI_SIGNAL: (attrgetter('ai_signal_value'), ),
+            EffectId.MODIFY_ATTRIBUTE: (player,
+                                        lambda ce: getUnitListName(ce.object_list_unit_id if ce.object_list_unit_id != -1 else ce.item_id),
+                                        attribute, modifyValue, operation),
+            EffectId.MODIFY_RESOURCE: (player, resource, quantity, operation),
+            EffectId.MODIFY_RESOURCE_BY_VARIABLE: (player, resource, variable, operation),
+            EffectId.SET_BUILDING_GATHER_POINT: (unitsOfList, location),
+            EffectId.SCRIPT_CALL: (scriptName, ),
+            EffectId.CHANGE_VARIABLE: (variable, quantity, operation),
+            EffectId.CLEAR_TIMER: (timer, ),
+            EffectId.CHANGE_OBJECT_PLAYER_COLOR: (unitsOfList, lambda ce: TEXT['datasetPlayerColorId'][ce.player_color]),
+            EffectId.CHANGE_OBJECT_CIVILIZATION_NAME: (lambda ce: getNonSpecificUnitAbstract(-1, -1, -1,
+                                                                                             ce.source_player, ce.selected_object_ids,
+                                                                                             ce.area_x1, ce.area_y1, ce.area_x2, ce.area_y2,
+                                                                                             allowAreaEmpty=True),
+                                                       message),
+            EffectId.CHANGE_OBJECT_PLAYER_NAME: (unitsOfList, message),
+            EffectId.DISABLE_UNIT_TARGETING: (unitsOfList, ),
+            EffectId.ENABLE_UNIT_TARGETING: (unitsOfList, ),
+            EffectId.CHANGE_TECHNOLOGY_COST: (player, technology, cost),
+            EffectId.CHANGE_TECHNOLOGY_RESEARCH_TIME: (player, technology, quantity),
+            EffectId.CHANGE_TECHNOLOGY_NAME: (player, technology, message),
+            EffectId.CHANGE_TECHNOLOGY_DESCRIPTION: (player, technology, message),
+            EffectId.ENABLE_TECHNOLOGY_STACKING: (player, technology,
+                                                  lambda ce: ce.quantity if ce.quantity != -1 else TEXT['fmtUnlimitedTimes']),
+            EffectId.DISABLE_TECHNOLOGY_STACKING: (player, technology),
+            EffectId.ACKNOWLEDGE_MULTIPLAYER_AI_SIGNAL: (attrgetter('ai_signal_value'), ),
+            EffectId.DISABLE_OBJECT_SELECTION: (unitsOfList, ),
+            EffectId.ENABLE_OBJECT_SELECTION: (unitsOfList, ),
+            EffectId.CHANGE_COLOR_MOOD: (lambda ce: TEXT['datasetColorMood'].get(ce.color_mood, f'<{ce.color_mood}>'),
+                                         changeViewTime),
+            EffectId.ENABLE_OBJECT_DELETION: (unitsOfList, ),
+            EffectId.DISABLE_OBJECT_DELETION: (unitsOfList, ),
+            EffectId.TRAIN_UNIT: (),
+            EffectId.INITIATE_RESEARCH: (player, selectedUnits, technology),
+            EffectId.CREATE_OBJECT_ATTACK: (units, attackArmorQuantity, operation, armorClass),
+            EffectId.CREATE_OBJECT_ARMOR: (units, attackArmorQuantity, operation, armorClass),
+            EffectId.MODIFY_ATTRIBUTE_BY_VARIABLE: (player, unitName, attribute, variable, operation),
+            EffectId.SET_OBJECT_COST: (),
+            EffectId.LOAD_KEY_VALUE: (),
+            EffectId.STORE_KEY_VALUE: (),
+            EffectId.DELETE_KEY: (),
+            EffectId.CHANGE_TECHNOLOGY_ICON: (player, technology, quantity),
+            EffectId.CHANGE_TECHNOLOGY_HOTKEY: (player, technology, quantity),
+            EffectId.MODIFY_VARIABLE_BY_RESOURCE: (variable, player, resource, operation),
+            EffectId.MODIFY_VARIABLE_BY_ATTRIBUTE: (variable, player, unitName, attribute, operation),
+            EffectId.CHANGE_OBJECT_CAPTION: (unitsOfList, message),
+            EffectId.CHANGE_PLAYER_COLOR: (player, lambda ce: TEXT['datasetPlayerColorId'][ce.player_color]),
+            EffectId.CREATE_DECISION: (),
+            EffectId.DISABLE_UNIT_ATTACKABLE: (unitsOfList, ),
+            EffectId.ENABLE_UNIT_ATTACKABLE: (unitsOfList, ),
+            EffectId.MODIFY_VARIABLE_BY_VARIABLE: (variable, variable2, operation),
+            EffectId.COUNT_UNITS_INTO_VARIABLE: (variable2, unitsOfList),
+        }
+        # effect_type -> (shift format key, use shift format)
+        effectShifts = {
+            EffectId.CHANGE_OWNERSHIP: (1, lambda ce: ce.flash_object == 1),
+            EffectId.MODIFY_ATTRIBUTE: (2, modifyMessage),
+        }
+        formats = TEXT['effectDescriptionFormat']
+        self._effects = {}
+        for typeKey, extractors in effectArguments.items():
+            if typeKey in formats:
+                shiftKey, useShift = effectShifts.get(typeKey, (None, None))
+                shiftFormat = TEXT['effectDescriptionFormatShift'][shiftKey] if shiftKey is not None else None
+                self._effects[typeKey] = (formats[typeKey], shiftFormat, useShift, extractors)
+
+    def condition(self, condition: Condition) -> str:
+        if self._conditions is None:
+            self.compile()
+        entry = self._conditions.get(condition.condition_type)
+        if entry is None:
+            return abstractCondition(condition)
+        formatString, invertFormat, extractors = entry
+        if condition.inverted != 0 and condition.inverted != -1:
+            formatString = invertFormat
+        if len(extractors) == 0:
+            return formatString
+        try:
+            return formatString.format(*[get(condition) for get in extractors])
+        except (UnsupportedAttributeError, TypeError):
+            # Reports and names the condition
+            return abstractCondition(condition)
+
+    def effect(self, effect: Effect) -> str:
+        if self._effects is None:
+            self.compile()
+        entry = self._effects.get(effect.effect_type)
+        if entry is None:
+            return abstractEffect(effect)
+        formatString, shiftFormat, useShift, extractors = entry
+        if len(extractors) == 0:
+            return formatString
+        try:
+            if useShift is not None and useShift(effect):
+                formatString = shiftFormat
+            return formatString.format(*[get(effect) for get in extractors])
+        except (UnsupportedAttributeError, TypeError):
+            # Reports and names the effect
+            return abstractEffect(effect)
+
+ABSTRACT_RENDERER = AbstractRenderer()
+
+class AbstractCache():
+    """
+    Rendered abstracts of conditions and effects.
+
+    An entry is checked against the values of the attributes the renderer
+    reads for its CE type, so editing a CE needs no invalidation. Clear it when something else an
+    abstract shows changes: the language, unit names or trigger names.
+    """
+    # Copied into fingerprints, an in-place change must show
+    LIST_ATTRIBUTES = ('selected_object_ids', )
+    # Read by the renderer but not among the attributes CeAttributes lists for the type
+    EXTRA_EFFECT_ATTRIBUTES = {EffectId.COUNT_UNITS_INTO_VARIABLE: ('selected_object_ids', )}
+
+    def __init__(self):
+        # CE -> (fingerprint, abstract), dropped with the CE
+        self._entries: WeakKeyDictionary[Condition | Effect, tuple[object, str]] = WeakKeyDictionary()
+        self._conditionFingerprints: dict[int, Callable[[Condition], object]] = {}
+        self._effectFingerprints: dict[int, Callable[[Effect], object]] = {}
+
+    def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def _compileFingerprint(attributes: list[str]) -> Callable[[Condition | Effect], object]:
+        getter = attrgetter(*attributes)
+        listGetters = [attrgetter(attribute) for attribute in attributes if attribute in AbstractCache.LIST_ATTRIBUTES]
+        if len(listGetters) == 0:
+            return getter
+        return lambda ce: (getter(ce), *(tuple(get(ce) or ()) for get in listGetters))
+
+    def condition(self, condition: Condition) -> str:
+        typeKey = condition.condition_type
+        fingerprintOf = self._conditionFingerprints.get(typeKey)
+        if fingerprintOf is None:
+            # Every abstract of a condition reads inverted, even if its type has no such attribute
+            fingerprintOf = self._compileFingerprint(['condition_type', 'inverted', *CONDITION_ATTRIBUTES.get(typeKey, [])])
+            self._conditionFingerprints[typeKey] = fingerprintOf
+        fingerprint = fingerprintOf(condition)
+        entry = self._entries.get(condition)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, ABSTRACT_RENDERER.condition(condition))
+            self._entries[condition] = entry
+        return entry[1]
+
+    def effect(self, effect: Effect) -> str:
+        typeKey = effect.effect_type
+        fingerprintOf = self._effectFingerprints.get(typeKey)
+        if fingerprintOf is None:
+            fingerprintOf = self._compileFingerprint(['effect_type', *EFFECT_ATTRIBUTES.get(typeKey, []),
+                                                      *self.EXTRA_EFFECT_ATTRIBUTES.get(typeKey, ())])
+            self._effectFingerprints[typeKey] = fingerprintOf
+        fingerprint = fingerprintOf(effect)
+        entry = self._entries.get(effect)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, ABSTRACT_RENDERER.effect(effect))
+            self._entries[effect] = entry
+        return entry[1]
+
+ABSTRACT_CACHE = AbstractCache()
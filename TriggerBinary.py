@@ -0,0 +1,379 @@
+"""
+Binary trigger library, holding what TriggerJsonIO.export holds.
+
+    header        HEADER
+    layouts       per layout: LAYOUT_HEADER, then LAYOUT_FIELD per field
+    index         display order (u32 each), offset of each trigger (u64 each)
+    triggers      per trigger: trigger record, then its condition and effect records
+    strings       count (u32), count + 1 offsets into the text (u32 each), UTF-8 text
+    pool          values of list fields, i32 or i64 each
+
+A record is its layout number (u16) and the fields packed at the width
+the layout gives, so all records of a layout have the same size. A layout
+is made per CE type from the attributes written, each field as narrow as
+its values in this file allow. A field holding None in some records gets a
+presence byte before its value, one holding None in all takes no space.
+Layouts and field names are stored in the file, reading does not depend
+on CeAttributes. Everything is little-endian.
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Iterator
+
+TRIGGER_LIBRARY_EXT = '.aoe2tct'
+MAGIC = b'AoE2TCTB'
+VERSION = 2
+# magic, version, flags, trigger count, display order length, layout count, offsets of layouts, index, strings, pool
+HEADER = struct.Struct('<8sHHIIIQQQQ')
+FLAG_WIDE_POOL = 1
+LAYOUT_HEADER = struct.Struct('<BiH')
+LAYOUT_FIELD = struct.Struct('<IB')
+RECORD_LAYOUT = struct.Struct('<H')
+UINT32 = struct.Struct('<I')
+
+LAYOUT_TRIGGER = 0
+LAYOUT_CONDITION = 1
+LAYOUT_EFFECT = 2
+LAYOUT_TYPE_KEYS = {LAYOUT_CONDITION: 'condition_type', LAYOUT_EFFECT: 'effect_type'}
+# Trigger dict keys held by the records after the trigger record
+TRIGGER_CE_KEYS = ('conditions', 'effects')
+# Trigger records end with the condition count and the effect count
+TRIGGER_CE_COUNTS = 'II'
+
+# Field formats from narrow to wide, booleans join integers if mixed
+INT_FORMATS = '?bhiq'
+INT_RANGES = (('b', -0x80, 0x7f), ('h', -0x8000, 0x7fff), ('i', -0x80000000, 0x7fffffff),
+              ('q', -0x8000000000000000, 0x7fffffffffffffff))
+# struct codes of each field format, a string is its index, a list is its start and length in the pool,
+# a field always None is not stored
+FIELD_STRUCT_CODES = {'?': '?', 'b': 'b', 'h': 'h', 'i': 'i', 'q': 'q', 'd': 'd', 'S': 'I', 'L': 'II', 'N': ''}
+# Values packed for None in a field that also holds other values
+FIELD_NONE_VALUES = {'?': (False, ), 'b': (0, ), 'h': (0, ), 'i': (0, ), 'q': (0, ), 'd': (0.0, ), 'S': (0, ), 'L': (0, 0)}
+# Set on the format of a field stored with a presence byte
+FIELD_NULLABLE = 0x80
+
+class TriggerBinaryError(ValueError):
+    """The file is not a trigger library this version can read, or the triggers can not be stored"""
+    pass
+
+def _valueFormat(value: object) -> str:
+    # ASP sets the armour attack attributes to None when an effect does not use them
+    if value is None:
+        return 'N'
+    if type(value) == bool:
+        return '?'
+    # ASP gives IntEnum members for some attributes
+    if isinstance(value, int):
+        for format, low, high in INT_RANGES:
+            if low <= value <= high:
+                return format
+        raise TriggerBinaryError(f"{value} does not fit in 64 bits")
+    if type(value) == float:
+        return 'd'
+    if type(value) == str:
+        return 'S'
+    if type(value) == list:
+        return 'L'
+    raise TriggerBinaryError(f"Can not store {value!r}")
+
+def _mergeFormats(current: str | None, format: str) -> str:
+    if current is None or current == 'N' or current == format:
+        return format
+    if format == 'N':
+        return current
+    if current in INT_FORMATS and format in INT_FORMATS:
+        return max(current, format, key=INT_FORMATS.index)
+    raise TriggerBinaryError(f"Values of types {current} and {format} in one attribute")
+
+def _recordStruct(formats: Iterable[str], nullables: Iterable[bool], tail: str = '') -> struct.Struct:
+    codes = ('?' * (nullable and format != 'N') + FIELD_STRUCT_CODES[format]
+             for format, nullable in zip(formats, nullables))
+    return struct.Struct('<H' + ''.join(codes) + tail)
+
+def _littleEndian(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def writeTriggerBinary(fp: BinaryIO, displayOrder: list[int], triggers: list[dict]):
+    """Write trigger dicts in the shape of TriggerJsonIO.export, in trigger ID order"""
+    # Pass 1: a layout per trigger / CE type, fields as wide as their values need
+    layouts: dict[tuple[int, int], tuple[int, list[str], list[str], list[bool]]] = {}
+    wide = False
+    def scan(kind: int, ceType: int, record: dict, skip: tuple[str, ...]):
+        nonlocal wide
+        layout = layouts.get((kind, ceType))
+        if layout is None:
+            names = [key for key in record if key not in skip]
+            layout = layouts[(kind, ceType)] = (len(layouts), names, [None] * len(names), [False] * len(names))
+        names, formats, nullables = layout[1], layout[2], layout[3]
+        if len(record) != len(names) + len(skip):
+            raise TriggerBinaryError(f"Attributes differ from other records of type {ceType}")
+        for i, name in enumerate(names):
+            value = record[name]
+            formats[i] = _mergeFormats(formats[i], _valueFormat(value))
+            if value is None:
+                nullables[i] = True
+            elif type(value) == list:
+                for item in value:
+                    itemFormat = _valueFormat(item)
+                    if itemFormat not in INT_FORMATS:
+                        raise TriggerBinaryError(f"Can not store {item!r} in list '{name}'")
+                    wide = wide or itemFormat == 'q'
+    for trigger in triggers:
+        scan(LAYOUT_TRIGGER, -1, trigger, TRIGGER_CE_KEYS)
+        for condition in trigger['conditions']:
+            scan(LAYOUT_CONDITION, condition['condition_type'], condition, ('condition_type', ))
+        for effect in trigger['effects']:
+            scan(LAYOUT_EFFECT, effect['effect_type'], effect, ('effect_type', ))
+    if len(layouts) > 0xffff:
+        raise TriggerBinaryError("Too many record layouts")
+
+    # Pass 2: records, with strings and lists going to their tables
+    strings: dict[str, int] = {}
+    pool = array('q' if wide else 'i')
+    structs = {key: _recordStruct(formats, nullables, TRIGGER_CE_COUNTS if key[0] == LAYOUT_TRIGGER else '')
+               for key, (layoutId, names, formats, nullables) in layouts.items()}
+    def pack(kind: int, ceType: int, record: dict, tail: tuple = ()) -> bytes:
+        key = (kind, ceType)
+        layoutId, names, formats, nullables = layouts[key]
+        values = [layoutId]
+        for name, format, nullable in zip(names, formats, nullables):
+            value = record[name]
+            if format == 'N':
+                continue
+            if nullable:
+                values.append(value is not None)
+                if value is None:
+                    values += FIELD_NONE_VALUES[format]
+                    continue
+            if format == 'S':
+                values.append(strings.setdefault(value, len(strings)))
+            elif format == 'L':
+                values += (len(pool), len(value))
+                pool.extend(value)
+            else:
+                values.append(value)
+        return structs[key].pack(*values, *tail)
+    blocks = bytearray()
+    blockOffsets = []
+    for trigger in triggers:
+        blockOffsets.append(len(blocks))
+        blocks += pack(LAYOUT_TRIGGER, -1, trigger, (len(trigger['conditions']), len(trigger['effects'])))
+        for condition in trigger['conditions']:
+            blocks += pack(LAYOUT_CONDITION, condition['condition_type'], condition)
+        for effect in trigger['effects']:
+            blocks += pack(LAYOUT_EFFECT, effect['effect_type'], effect)
+
+    layoutBytes = bytearray()
+    # In the order of layout numbers
+    for (kind, ceType), (layoutId, names, formats, nullables) in layouts.items():
+        layoutBytes += LAYOUT_HEADER.pack(kind, ceType, len(names))
+        for name, format, nullable in zip(names, formats, nullables):
+            flag = FIELD_NULLABLE if nullable and format != 'N' else 0
+            layoutBytes += LAYOUT_FIELD.pack(strings.setdefault(name, len(strings)), ord(format) | flag)
+    texts = [string.encode('utf-8') for string in strings]
+    textOffsets = [0]
+    for text in texts:
+        textOffsets.append(textOffsets[-1] + len(text))
+    stringBytes = UINT32.pack(len(texts)) + struct.pack(f'<{len(textOffsets)}I', *textOffsets) + b''.join(texts)
+
+    layoutOffset = HEADER.size
+    indexOffset = layoutOffset + len(layoutBytes)
+    blocksOffset = indexOffset + 4 * len(displayOrder) + 8 * len(triggers)
+    stringOffset = blocksOffset + len(blocks)
+    # Keep the pool aligned for its values
+    padding = -(stringOffset + len(stringBytes)) % 8
+    poolOffset = stringOffset + len(stringBytes) + padding
+
+    fp.write(HEADER.pack(MAGIC, VERSION, FLAG_WIDE_POOL if wide else 0, len(triggers), len(displayOrder),
+                         len(layouts), layoutOffset, indexOffset, stringOffset, poolOffset))
+    fp.write(layoutBytes)
+    fp.write(struct.pack(f'<{len(displayOrder)}I', *displayOrder))
+    fp.write(struct.pack(f'<{len(triggers)}Q', *(blocksOffset + offset for offset in blockOffsets)))
+    fp.write(blocks)
+    fp.write(stringBytes)
+    fp.write(bytes(padding))
+    fp.write(_littleEndian(pool))
+
+class TriggerBinaryReader():
+    """
+    A trigger library mapped in memory, triggers are decoded only when asked for.
+
+    Use as a context manager or close it, the file stays open until then.
+    """
+    def __init__(self, path: str):
+        self.__file = open(path, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Mapping an empty file
+            self.__file.close()
+            raise TriggerBinaryError("Not a trigger library") from None
+        try:
+            self.__readHeader()
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            self.close()
+            raise TriggerBinaryError(f"Broken trigger library: {e}") from None
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> TriggerBinaryReader:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
+
+    def __len__(self) -> int:
+        return len(self.__triggerOffsets)
+
+    def __readHeader(self):
+        data = self.__map
+        if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+            raise TriggerBinaryError("Not a trigger library")
+        (magic, version, flags, triggerCount, displayCount, layoutCount,
+         layoutOffset, indexOffset, stringOffset, poolOffset) = HEADER.unpack_from(data, 0)
+        if version > VERSION:
+            raise TriggerBinaryError(f"Trigger library version {version} is newer than {VERSION}")
+
+        self.displayOrder: list[int] = list(struct.unpack_from(f'<{displayCount}I', data, indexOffset))
+        self.__triggerOffsets = struct.unpack_from(f'<{triggerCount}Q', data, indexOffset + 4 * displayCount)
+        stringCount = UINT32.unpack_from(data, stringOffset)[0]
+        self.__stringOffsets = struct.unpack_from(f'<{stringCount + 1}I', data, stringOffset + 4)
+        self.__textOffset = stringOffset + 4 * (stringCount + 2)
+        self.__strings: dict[int, str] = {}
+        self.__poolCode = 'q' if flags & FLAG_WIDE_POOL else 'i'
+        self.__poolItemSize = struct.calcsize(self.__poolCode)
+        self.__poolOffset = poolOffset
+
+        # Layout number -> kind, CE type, field names, field formats, nullable fields, record struct,
+        # string field names, and if every field is one value that is never None
+        self.__layouts: list[tuple[int, int, list[str], str, list[bool], struct.Struct, list[str], bool]] = []
+        offset = layoutOffset
+        for _ in range(layoutCount):
+            kind, ceType, fieldCount = LAYOUT_HEADER.unpack_from(data, offset)
+            offset += LAYOUT_HEADER.size
+            names = []
+            formats = ''
+            nullables = []
+            for _ in range(fieldCount):
+                nameIndex, format = LAYOUT_FIELD.unpack_from(data, offset)
+                offset += LAYOUT_FIELD.size
+                names.append(self.__string(nameIndex))
+                formats += chr(format & ~FIELD_NULLABLE)
+                nullables.append(bool(format & FIELD_NULLABLE))
+            if kind not in (LAYOUT_TRIGGER, *LAYOUT_TYPE_KEYS) or any(f not in FIELD_STRUCT_CODES for f in formats):
+                raise TriggerBinaryError(f"Unknown record layout {kind}: {formats}")
+            record = _recordStruct(formats, nullables, TRIGGER_CE_COUNTS if kind == LAYOUT_TRIGGER else '')
+            stringNames = [name for name, format in zip(names, formats) if format == 'S']
+            simple = 'L' not in formats and 'N' not in formats and not any(nullables)
+            self.__layouts.append((kind, ceType, names, formats, nullables, record, stringNames, simple))
+
+    def __string(self, index: int) -> str:
+        string = self.__strings.get(index)
+        if string is None:
+            begin = self.__textOffset + self.__stringOffsets[index]
+            end = self.__textOffset + self.__stringOffsets[index + 1]
+            string = self.__strings[index] = self.__map[begin:end].decode('utf-8')
+        return string
+
+    def __record(self, offset: int, kinds: tuple[int, ...]) -> tuple[int, dict, tuple, int]:
+        """Kind, dict, the values after the fields, and the end of the record at offset"""
+        kind, ceType, names, formats, nullables, record, stringNames, simple = \
+            self.__layouts[RECORD_LAYOUT.unpack_from(self.__map, offset)[0]]
+        if kind not in kinds:
+            raise TriggerBinaryError(f"Unexpected record at byte {offset}")
+        values = record.unpack_from(self.__map, offset)
+        recordDict = {}
+        if kind != LAYOUT_TRIGGER:
+            recordDict[LAYOUT_TYPE_KEYS[kind]] = ceType
+        if simple:
+            # One value per field, only strings to look up
+            end = 1 + len(names)
+            recordDict.update(zip(names, values[1:end]))
+            for name in stringNames:
+                recordDict[name] = self.__string(recordDict[name])
+            return kind, recordDict, values[end:], offset + record.size
+        i = 1
+        for name, format, nullable in zip(names, formats, nullables):
+            if format == 'N':
+                recordDict[name] = None
+                continue
+            if nullable:
+                present = values[i]
+                i += 1
+                if not present:
+                    recordDict[name] = None
+                    i += len(FIELD_NONE_VALUES[format])
+                    continue
+            if format == 'S':
+                recordDict[name] = self.__string(values[i])
+            elif format == 'L':
+                start, length = values[i], values[i + 1]
+                recordDict[name] = list(struct.unpack_from(f'<{length}{self.__poolCode}', self.__map,
+                                                           self.__poolOffset + start * self.__poolItemSize))
+                i += 1
+            else:
+                recordDict[name] = values[i]
+            i += 1
+        return kind, recordDict, values[i:], offset + record.size
+
+    def triggerName(self, triggerId: int) -> str:
+        """The name of the trigger of triggerId in the library, its CEs are not decoded"""
+        if not 0 <= triggerId < len(self):
+            raise TriggerBinaryError(f"No trigger {triggerId} in the library")
+        try:
+            return self.__record(self.__triggerOffsets[triggerId], (LAYOUT_TRIGGER, ))[1]['name']
+        except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+            raise TriggerBinaryError(f"Broken trigger {triggerId}: {e}") from None
+
+    def triggerDict(self, triggerId: int) -> dict:
+        """The trigger of triggerId in the library, as in TriggerJsonIO.export"""
+        if not 0 <= triggerId < len(self):
+            raise TriggerBinaryError(f"No trigger {triggerId} in the library")
+        try:
+            kind, triggerDict, (conditionCount, effectCount), offset = \
+                self.__record(self.__triggerOffsets[triggerId], (LAYOUT_TRIGGER, ))
+            conditions = []
+            for _ in range(conditionCount):
+                kind, condition, _, offset = self.__record(offset, (LAYOUT_CONDITION, ))
+                conditions.append(condition)
+            effects = []
+            for _ in range(effectCount):
+                kind, effect, _, offset = self.__record(offset, (LAYOUT_EFFECT, ))
+                effects.append(effect)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise TriggerBinaryError(f"Broken trigger {triggerId}: {e}") from None
+        triggerDict['conditions'] = conditions
+        triggerDict['effects'] = effects
+        return triggerDict
+
+    def members(self, triggerIds: Iterable[int] | None = None) -> Iterator[tuple[str, int | None, object]]:
+        """
+        The library as JsonObjectReader.members gives a trigger JSON.
+
+        Only the triggers of triggerIds, IDs in the library, are decoded if given.
+        """
+        if triggerIds is None:
+            ids = range(len(self))
+            order = self.displayOrder
+        else:
+            selected = set(triggerIds)
+            ids = sorted(selected)
+            order = [id for id in self.displayOrder if id in selected]
+        yield 'trigger_display_order', None, order
+        if len(ids) == 0:
+            yield 'triggers', None, []
+        for index, id in enumerate(ids):
+            yield 'triggers', index, self.triggerDict(id)
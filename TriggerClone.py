@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from operator import attrgetter
+from uuid import UUID
+from weakref import WeakKeyDictionary
+
+from AoE2ScenarioParser.datasets.players import PlayerId
+from AoE2ScenarioParser.helper.list_functions import hash_list
+from AoE2ScenarioParser.objects.data_objects.condition import Condition
+from AoE2ScenarioParser.objects.data_objects.effect import Effect
+from AoE2ScenarioParser.objects.data_objects.trigger import Trigger
+from AoE2ScenarioParser.objects.managers.trigger_manager import TriggerManager
+from AoE2ScenarioParser.objects.support.new_condition import NewConditionSupport
+from AoE2ScenarioParser.objects.support.new_effect import NewEffectSupport
+from AoE2ScenarioParser.objects.support.trigger_ce_lock import TriggerCELock
+from AoE2ScenarioParser.objects.support.uuid_list import UuidList
+
+# Trigger fields rebuilt for the clone instead of copied
+TRIGGER_REBUILT_FIELDS = ('_conditions', '_effects', '_condition_hash', '_effect_hash', 'new_effect', 'new_condition')
+
+def _copyFields(obj: object) -> dict:
+    """Instance fields of an ASP object, list values copied one level"""
+    fields = obj.__dict__.copy()
+    for key, value in fields.items():
+        if type(value) is list:
+            fields[key] = value.copy()
+    return fields
+
+def cloneCondition(condition: Condition, uuid: UUID = None) -> Condition:
+    """
+    Copy a condition without deepcopy, for the scenario of uuid if given.
+
+    Condition attributes are plain values or lists of ints, copying the
+    fields behind them is enough. Not added to any trigger.
+    """
+    clone = Condition.__new__(Condition)
+    clone.__dict__ = _copyFields(condition)
+    if uuid is not None:
+        clone._uuid = uuid
+    return clone
+
+def cloneEffect(effect: Effect, uuid: UUID = None) -> Effect:
+    """
+    Copy an effect without deepcopy, for the scenario of uuid if given.
+
+    Fields are copied rather than attributes set: quantity and the armour
+    attack attributes share storage, setting them one by one warns or merges.
+    Not added to any trigger.
+    """
+    clone = Effect.__new__(Effect)
+    clone.__dict__ = _copyFields(effect)
+    if uuid is not None:
+        clone._uuid = uuid
+    return clone
+
+def cloneTrigger(trigger: Trigger, uuid: UUID = None) -> Trigger:
+    """
+    Copy a trigger and its conditions and effects without deepcopy.
+
+    Not added to the trigger manager, the caller sets trigger_id.
+    """
+    if uuid is None:
+        uuid = trigger._uuid
+    # Bring the display orders up to date with the CE lists before copying them
+    trigger.condition_order
+    trigger.effect_order
+    clone = Trigger.__new__(Trigger)
+    fields = _copyFields(trigger)
+    for key in TRIGGER_REBUILT_FIELDS:
+        del fields[key]
+    clone.__dict__ = fields
+    clone._uuid = uuid
+    conditions = [cloneCondition(condition, uuid) for condition in trigger.conditions]
+    effects = [cloneEffect(effect, uuid) for effect in trigger.effects]
+    clone._conditions = UuidList(uuid, conditions)
+    clone._condition_hash = hash_list(conditions)
+    clone._effects = UuidList(uuid, effects)
+    clone._effect_hash = hash_list(effects)
+    clone.new_effect = NewEffectSupport(clone)
+    clone.new_condition = NewConditionSupport(clone)
+    return clone
+
+class PlayerRewritePlan():
+    """
+    The player fields a per-player copy of a trigger changes, by CE index.
+
+    A copy starts equal to its source, so which fields change only depends
+    on the source trigger and the copy options, `apply` then only assigns.
+    Plans are cached per trigger and reused while its CE types and players
+    and the options stay the same.
+    """
+    _conditionState = attrgetter('condition_type', 'source_player', 'target_player')
+    _effectState = attrgetter('effect_type', 'source_player', 'target_player')
+    _plans: WeakKeyDictionary[Trigger, tuple[tuple, PlayerRewritePlan]] = WeakKeyDictionary()
+
+    def __init__(self, trigger: Trigger, fromPlayer: int, changeFromPlayerOnly: bool,
+                 includeSource: bool, includeTarget: bool, lock: TriggerCELock | None):
+        alterConditions, alterEffects = TriggerManager._find_alterable_ce(trigger, lock)
+        self.conditionSources, self.conditionTargets = PlayerRewritePlan._fieldsToChange(
+            trigger.conditions, alterConditions, fromPlayer, changeFromPlayerOnly, includeSource, includeTarget)
+        self.effectSources, self.effectTargets = PlayerRewritePlan._fieldsToChange(
+            trigger.effects, alterEffects, fromPlayer, changeFromPlayerOnly, includeSource, includeTarget)
+
+    @staticmethod
+    def _fieldsToChange(ces: list[Condition|Effect], alterable: list[int], fromPlayer: int, changeFromPlayerOnly: bool,
+                        includeSource: bool, includeTarget: bool) -> tuple[list[int], list[int]]:
+        """Indexes of the CEs whose source player and target player change"""
+        sources = []
+        targets = []
+        for index in alterable:
+            ce = ces[index]
+            if ce.source_player == -1 and ce.target_player == -1:
+                continue
+            if includeSource and (not changeFromPlayerOnly or ce.source_player == fromPlayer):
+                sources.append(index)
+            if includeTarget and (not changeFromPlayerOnly or ce.target_player == fromPlayer):
+                targets.append(index)
+        return sources, targets
+
+    @classmethod
+    def of(cls, trigger: Trigger, fromPlayer: int, changeFromPlayerOnly: bool,
+           includeSource: bool, includeTarget: bool, lock: TriggerCELock | None) -> PlayerRewritePlan:
+        """The cached plan of a trigger, made again if the trigger or the options changed"""
+        if lock is None:
+            lockKey = None
+        else:
+            lockKey = (lock.lock_conditions, lock.lock_effects, tuple(lock.lock_condition_type),
+                       tuple(lock.lock_effect_type), tuple(lock.lock_condition_ids), tuple(lock.lock_effect_ids))
+        key = (fromPlayer, changeFromPlayerOnly, includeSource, includeTarget, lockKey,
+               tuple(map(id, trigger.conditions)), tuple(map(cls._conditionState, trigger.conditions)),
+               tuple(map(id, trigger.effects)), tuple(map(cls._effectState, trigger.effects)))
+        entry = cls._plans.get(trigger)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        plan = cls(trigger, fromPlayer, changeFromPlayerOnly, includeSource, includeTarget, lock)
+        cls._plans[trigger] = (key, plan)
+        return plan
+
+    def apply(self, copy: Trigger, player: int):
+        playerId = PlayerId(player)
+        conditions = copy.conditions
+        for index in self.conditionSources:
+            conditions[index].source_player = playerId
+        for index in self.conditionTargets:
+            conditions[index].target_player = playerId
+        effects = copy.effects
+        for index in self.effectSources:
+            effects[index].source_player = playerId
+        for index in self.effectTargets:
+            effects[index].target_player = playerId
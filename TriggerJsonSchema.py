@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from jsonschema import ValidationError
+
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
+
+TRIGGER_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "trigger_display_order": {
+            "type": "array",
+            "items": {
+                "type": "integer"
+            }
+        },
+        "triggers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string"
+                    },
+                    "trigger_id": {
+                        "type": "integer"
+                    },
+                    "condition_order": {
+                        "type": "array",
+                        "items": {
+                            "type": "integer"
+                        }
+                    },
+                    "effect_order": {
+                        "type": "array",
+                        "items": {
+                            "type": "integer"
+                        }
+                    },
+                    "conditions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object"
+                        }
+                    },
+                    "effects": {
+                        "type": "array",
+                        "items": {
+                            "type": "object"
+                        }
+                    }
+                },
+                "required": [
+                    "name",
+                    "trigger_id",
+                    "description_stid",
+                    "description",
+                    "display_as_objective",
+                    "description_order",
+                    "short_description_stid",
+                    "short_description",
+                    "display_on_screen",
+                    "enabled",
+                    "looping",
+                    "header",
+                    "mute_objectives",
+                    "condition_order",
+                    "effect_order",
+                    "conditions",
+                    "effects"
+                ]
+            }
+        }
+    },
+    "required": [
+        "trigger_display_order",
+        "triggers"
+    ],
+    "additionalProperties": False
+}
+
+# Same meaning as in jsonschema, booleans are not integers but 1.0 is
+TYPE_CHECKS: dict[str, Callable[[object], bool]] = {
+    'object': lambda value: type(value) == dict,
+    'array': lambda value: type(value) == list,
+    'string': lambda value: type(value) == str,
+    'integer': lambda value: type(value) == int or (type(value) == float and value.is_integer()),
+}
+SUPPORTED_KEYWORDS = frozenset(('type', 'properties', 'items', 'required', 'additionalProperties'))
+
+# Keys a CE of each type needs, types missing here are exported with the type key only
+CONDITION_KEYS = {conditionType: frozenset(('condition_type', *attributes))
+                  for conditionType, attributes in CONDITION_ATTRIBUTES.items()}
+EFFECT_KEYS = {effectType: frozenset(('effect_type', *attributes))
+               for effectType, attributes in EFFECT_ATTRIBUTES.items()}
+NO_KEYS = frozenset()
+
+def compileSchema(schema: dict) -> Callable[[object], None]:
+    """
+    A checker raising ValidationError as jsonschema does, for the keywords used here.
+
+    Keywords are resolved once here instead of on every value, which is
+    most of the time a jsonschema validator takes on large trigger lists.
+    """
+    unsupported = schema.keys() - SUPPORTED_KEYWORDS
+    if unsupported:
+        raise ValueError(f"Unsupported schema keywords: {', '.join(sorted(unsupported))}")
+    checks = []
+    if 'type' in schema:
+        typeName = schema['type']
+        isType = TYPE_CHECKS[typeName]
+        def checkType(value):
+            if not isType(value):
+                raise ValidationError(f"{value!r} is not of type '{typeName}'")
+        checks.append(checkType)
+    if 'required' in schema:
+        required = tuple(schema['required'])
+        def checkRequired(value):
+            if type(value) == dict:
+                for key in required:
+                    if key not in value:
+                        raise ValidationError(f"'{key}' is a required property")
+        checks.append(checkRequired)
+    if 'properties' in schema:
+        properties = {key: compileSchema(subschema) for key, subschema in schema['properties'].items()}
+        def checkProperties(value):
+            if type(value) == dict:
+                for key, check in properties.items():
+                    if key in value:
+                        check(value[key])
+        checks.append(checkProperties)
+    if schema.get('additionalProperties', True) == False:
+        allowed = frozenset(schema.get('properties', ()))
+        def checkAdditional(value):
+            if type(value) == dict and not value.keys() <= allowed:
+                unexpected = ', '.join(repr(key) for key in value if key not in allowed)
+                raise ValidationError(f"Additional properties are not allowed ({unexpected} unexpected)")
+        checks.append(checkAdditional)
+    if 'items' in schema:
+        itemSchema = schema['items']
+        if itemSchema.keys() == {'type'}:
+            # Plain lists of ids or CEs, test the type inline
+            itemType = itemSchema['type']
+            isItemType = TYPE_CHECKS[itemType]
+            def checkItems(value):
+                if type(value) == list:
+                    for item in value:
+                        if not isItemType(item):
+                            raise ValidationError(f"{item!r} is not of type '{itemType}'")
+        else:
+            checkItem = compileSchema(itemSchema)
+            def checkItems(value):
+                if type(value) == list:
+                    for item in value:
+                        checkItem(item)
+        checks.append(checkItems)
+
+    if len(checks) == 1:
+        return checks[0]
+    def checkAll(value):
+        for check in checks:
+            check(value)
+    return checkAll
+
+MEMBER_CHECKS = {key: compileSchema(subschema) for key, subschema in TRIGGER_JSON_SCHEMA['properties'].items()}
+TRIGGER_CHECK = compileSchema(TRIGGER_JSON_SCHEMA['properties']['triggers']['items'])
+
+def validateMember(key: str, value: object):
+    """Validate a top-level member of a trigger JSON"""
+    check = MEMBER_CHECKS.get(key)
+    if check is None:
+        raise ValidationError(f"Additional properties are not allowed ('{key}' unexpected)")
+    check(value)
+
+def _validateCeKeys(ce: dict, typeKey: str, ceKeys: dict[int, frozenset[str]]):
+    """
+    Check a CE has the attributes import sets for its type.
+
+    Extra keys are left alone as import never reads them, files of other
+    builds may carry attributes this one does not list.
+    """
+    ceType = ce.get(typeKey)
+    if type(ceType) != int:
+        raise ValidationError(f"'{typeKey}' must be an integer, not {ceType!r}")
+    keys = ceKeys.get(ceType, NO_KEYS)
+    if not ce.keys() >= keys:
+        missing = ', '.join(repr(key) for key in keys if key not in ce)
+        raise ValidationError(f"Missing attributes of {typeKey} {ceType}: {missing}")
+
+def validateTrigger(triggerDict: object):
+    """Validate an element of 'triggers', including the attribute names of its CEs"""
+    TRIGGER_CHECK(triggerDict)
+    for condition in triggerDict['conditions']:
+        _validateCeKeys(condition, 'condition_type', CONDITION_KEYS)
+    for effect in triggerDict['effects']:
+        _validateCeKeys(effect, 'effect_type', EFFECT_KEYS)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from AoE2ScenarioParser.datasets.conditions import ConditionId
+from AoE2ScenarioParser.datasets.effects import EffectId
+from AoE2ScenarioParser.objects.data_objects.trigger import Trigger
+from AoE2ScenarioParser.objects.managers.trigger_manager import TriggerManager
+
+# CEs whose trigger_id refers to another trigger, as ASP keeps them linked
+TRIGGER_REFERENCE_EFFECTS = frozenset((EffectId.ACTIVATE_TRIGGER, EffectId.DEACTIVATE_TRIGGER))
+TRIGGER_REFERENCE_CONDITIONS = frozenset((ConditionId.TRIGGER_ACTIVE, ))
+
+def remapTriggerReferences(triggers: Iterable[Trigger], idMap: dict[int, int], missing: int | None = None):
+    """
+    Translate the trigger ids referred by CEs of triggers through idMap.
+
+    An id not in idMap is set to missing, or kept if missing is None.
+    """
+    for trigger in triggers:
+        for effect in trigger.effects:
+            if effect.effect_type in TRIGGER_REFERENCE_EFFECTS:
+                effect.trigger_id = idMap.get(effect.trigger_id, effect.trigger_id if missing is None else missing)
+        for condition in trigger.conditions:
+            if condition.condition_type in TRIGGER_REFERENCE_CONDITIONS:
+                condition.trigger_id = idMap.get(condition.trigger_id, condition.trigger_id if missing is None else missing)
+
+def renumberTriggers(tm: TriggerManager, newIdOrder: Iterable[int]) -> dict[int, int]:
+    """
+    Rebuild the trigger list from the old IDs in newIdOrder, in one pass.
+
+    The trigger at position i gets ID i, triggers left out are removed and
+    CEs referring to them are set to -1, as ASP keeps them linked. The
+    display order stays, without removed triggers. IDs must not repeat.
+    Returns old id -> new id of the remaining triggers.
+    """
+    triggers = tm.triggers
+    displayOrder = tm.trigger_display_order
+    remaining = []
+    idMap = {}
+    for id in newIdOrder:
+        trigger = triggers[id]
+        idMap[id] = len(remaining)
+        trigger.trigger_id = len(remaining)
+        remaining.append(trigger)
+    newOrder = [idMap[id] for id in displayOrder if id in idMap]
+
+    removedIds = dict.fromkeys(range(len(triggers)), -1)
+    tm.triggers = remaining
+    tm.trigger_display_order = newOrder
+    remapTriggerReferences(remaining, {**removedIds, **idMap})
+    return idMap
+
+def removeTriggers(tm: TriggerManager, triggerIds: Iterable[int]) -> dict[int, int]:
+    """Remove triggers at once, see renumberTriggers"""
+    removing = set(triggerIds)
+    return renumberTriggers(tm, [id for id in range(len(tm.triggers)) if id not in removing])
+
+def sortTriggersByDisplay(tm: TriggerManager) -> dict[int, int]:
+    """Set trigger IDs to the display order, as TriggerManager.reorder_triggers does"""
+    return renumberTriggers(tm, tm.trigger_display_order)
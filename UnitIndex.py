@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from math import floor
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from AoE2ScenarioParser.objects.managers.unit_manager import UnitManager
+    from AoE2ScenarioParser.objects.data_objects.unit import Unit
+
+class UnitKeyTable():
+    """
+    Track the (player, index) key of every unit in UnitManager.units.
+
+    Indexes hold Unit objects and resolve keys here, so a change of owner
+    only has to renumber one player's list once.
+    """
+    def __init__(self, um: UnitManager):
+        self.um = um
+        self._keys: dict[int, tuple[int, int]] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        self._keys.clear()
+        for player, units in enumerate(self.um.units):
+            for index, unit in enumerate(units):
+                self._keys[id(unit)] = (player, index)
+
+    def keyOf(self, unit: Unit) -> tuple[int, int]:
+        """Return (player, index) of a unit in UnitManager.units"""
+        return self._keys[id(unit)]
+
+    def _renumber(self, player: int, begin: int):
+        units = self.um.units[player]
+        for index in range(begin, len(units)):
+            self._keys[id(units[index])] = (player, index)
+
+    def changePlayer(self, unit: Unit, oldPlayer: int, oldIndex: int):
+        self._renumber(oldPlayer, oldIndex)
+        self._keys[id(unit)] = (unit.player, len(self.um.units[unit.player]) - 1)
+
+class UnitSpatialIndex():
+    """A uniform grid over unit locations"""
+    CELL_SIZE = 8
+
+    def __init__(self, um: UnitManager, keys: UnitKeyTable):
+        self.um = um
+        self.keys = keys
+        self._cells: dict[tuple[int, int], list[Unit]] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        self._cells.clear()
+        for units in self.um.units:
+            for unit in units:
+                self.add(unit)
+
+    @classmethod
+    def _cellOf(cls, x: float, y: float) -> tuple[int, int]:
+        return (floor(x / cls.CELL_SIZE), floor(y / cls.CELL_SIZE))
+
+    def _cellsIn(self, x1: float, y1: float, x2: float, y2: float) -> Iterator[list[Unit]]:
+        cx1, cy1 = self._cellOf(x1, y1)
+        cx2, cy2 = self._cellOf(x2, y2)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._cells):
+            # Sparse grid, cheaper to visit the occupied cells only
+            for (cx, cy), cell in self._cells.items():
+                if cx1 <= cx <= cx2 and cy1 <= cy <= cy2:
+                    yield cell
+            return
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell:
+                    yield cell
+
+    def add(self, unit: Unit):
+        self._cells.setdefault(self._cellOf(unit.x, unit.y), []).append(unit)
+
+    def remove(self, unit: Unit, x: float, y: float):
+        cellKey = self._cellOf(x, y)
+        cell = self._cells.get(cellKey, [])
+        for i, item in enumerate(cell):
+            if item is unit:
+                del cell[i]
+                break
+        if not cell:
+            self._cells.pop(cellKey, None)
+
+    def move(self, unit: Unit, oldX: float, oldY: float):
+        if self._cellOf(oldX, oldY) == self._cellOf(unit.x, unit.y):
+            return
+        self.remove(unit, oldX, oldY)
+        self.add(unit)
+
+    def queryRect(self, x1: float, y1: float, x2: float, y2: float) -> list[tuple[int, int]]:
+        """Return keys of units where x1 <= x < x2 and y1 <= y < y2, in UnitManager order"""
+        if x1 >= x2 or y1 >= y2:
+            return []
+        hits = [self.keys.keyOf(unit)
+                for cell in self._cellsIn(x1, y1, x2, y2)
+                for unit in cell
+                if x1 <= unit.x < x2 and y1 <= unit.y < y2]
+        hits.sort()
+        return hits
+
+    def queryDot(self, dotX: int, dotY: int) -> list[Unit]:
+        """
+        Return units drawn on a dot of the unit layer, in UnitManager order.
+
+        The unit layer has 2 dots per tile, a unit is at dot (int(x * 2 + 0.5), int(y * 2 + 0.5)).
+        """
+        hits = [unit
+                for cell in self._cellsIn((dotX - 0.5) / 2, (dotY - 0.5) / 2, (dotX + 0.5) / 2, (dotY + 0.5) / 2)
+                for unit in cell
+                if int(unit.x * 2 + 0.5) == dotX and int(unit.y * 2 + 0.5) == dotY]
+        hits.sort(key=self.keys.keyOf)
+        return hits
+
+class UnitRefIdIndex():
+    """
+    A reference_id -> units multimap.
+
+    NOT unique, some scenarios hold several units with the same reference_id.
+    """
+    def __init__(self, um: UnitManager, keys: UnitKeyTable):
+        self.um = um
+        self.keys = keys
+        self._units: dict[int, list[Unit]] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        self._units.clear()
+        for units in self.um.units:
+            for unit in units:
+                self.add(unit)
+
+    def add(self, unit: Unit):
+        self._units.setdefault(unit.reference_id, []).append(unit)
+
+    def remove(self, unit: Unit, refId: int):
+        units = self._units.get(refId, [])
+        for i, item in enumerate(units):
+            if item is unit:
+                del units[i]
+                break
+        if not units:
+            self._units.pop(refId, None)
+
+    def changeReferenceId(self, unit: Unit, oldRefId: int):
+        if oldRefId == unit.reference_id:
+            return
+        self.remove(unit, oldRefId)
+        self.add(unit)
+
+    def query(self, refIds: Iterable[int]) -> list[tuple[int, int]]:
+        """Return keys of units holding any of the reference_ids, in UnitManager order"""
+        hits = [self.keys.keyOf(unit)
+                for refId in set(refIds)
+                for unit in self._units.get(refId, [])]
+        hits.sort()
+        return hits
+
+class UnitIndex():
+    """
+    Indexes over UnitManager.units, built once when a scenario loads.
+
+    Editors must report every change of location, owner and reference_id,
+    so the indexes never need a rebuild. The editor can not add or remove
+    units yet, the indexes need support for that before it can.
+    """
+    def __init__(self, um: UnitManager):
+        self.um = um
+        self.keys = UnitKeyTable(um)
+        self.spatial = UnitSpatialIndex(um, self.keys)
+        self.refIds = UnitRefIdIndex(um, self.keys)
+
+    def keyOf(self, unit: Unit) -> tuple[int, int]:
+        return self.keys.keyOf(unit)
+
+    def move(self, unit: Unit, oldX: float, oldY: float):
+        """Call after unit.x / unit.y has been changed"""
+        self.spatial.move(unit, oldX, oldY)
+
+    def changePlayer(self, unit: Unit, oldPlayer: int, oldIndex: int):
+        """Call after unit.player has been changed, ASP moves it to the end of its new owner's list"""
+        self.keys.changePlayer(unit, oldPlayer, oldIndex)
+
+    def changeReferenceId(self, unit: Unit, oldRefId: int):
+        """Call after unit.reference_id has been changed"""
+        self.refIds.changeReferenceId(unit, oldRefId)
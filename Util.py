@@ -1,6 +1,8 @@
 import math
+import queue
 import re
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import tkinter as tk
 from tkinter.constants import *
 from typing import Any, Callable
@@ -80,7 +82,8 @@ class ReCompiled():
             return match.group(0)
         return None
 
-def fastAoERotate(image: PIL.Image.Image, scale: float, fillcolor=(255, 255, 255)) -> PIL.Image.Image:
+def fastAoERotate(image: PIL.Image.Image, scale: float, fillcolor=(255, 255, 255),
+                  box: tuple[int, int, int, int] | None = None) -> PIL.Image.Image:
     """
     Fast transform for MapView, equivalent to:
     ```
@@ -89,15 +92,15 @@ def fastAoERotate(image: PIL.Image.Image, scale: float, fillcolor=(255, 255, 255
     image = image.resize((image.size[0], int(image.size[0]/2)), resample=Resampling.NEAREST)
     return image
     ```
+    If box (left, top, right, bottom) is given, only that region of the result is rendered.
     """
     width = image.size[0]
     sqrt2 = math.sqrt(2)
 
     # 计算中间尺寸
-    w1 = width * scale  # 放大后尺寸
-    w2 = w1 * sqrt2  # 旋转后理论尺寸
-    dest_width = round(w2)  # 旋转后实际宽度
-    dest_height = round(w2 / 2)  # 最终高度
+    dest_width, dest_height = fastAoERotateSize(width, scale)
+    if box is None:
+        box = (0, 0, dest_width, dest_height)
 
     # 计算组合变换矩阵的参数 (6-tuple)
     a = sqrt2 / scale / 2
@@ -107,9 +110,13 @@ def fastAoERotate(image: PIL.Image.Image, scale: float, fillcolor=(255, 255, 255
     e = sqrt2 / scale
     f = -width / 2         # 垂直平移补偿
 
+    # 区域平移
+    c += a * box[0] + b * box[1]
+    f += d * box[0] + e * box[1]
+
     # 单步变换
     image = image.transform(
-        (dest_width, dest_height),
+        (box[2] - box[0], box[3] - box[1]),
         PIL.Image.AFFINE,
         (a, b, c, d, e, f),
         resample=PIL.Image.NEAREST,
@@ -117,19 +124,72 @@ def fastAoERotate(image: PIL.Image.Image, scale: float, fillcolor=(255, 255, 255
     )
     return image
 
+def fastAoERotateSize(width: int, scale: float) -> tuple[int, int]:
+    """Size of fastAoERotate result, without rendering it"""
+    w1 = width * scale  # 放大后尺寸
+    w2 = w1 * math.sqrt(2)  # 旋转后理论尺寸
+    return (round(w2), round(w2 / 2))  # 旋转后实际宽度, 最终高度
+
+def fastAoERotateBox(width: int, scale: float, box: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    """Region of fastAoERotate result showing a box (left, top, right, bottom) of the source image"""
+    s = math.sqrt(2) / scale
+    corners = [((x + y) / s, (y - x + width) / s / 2) for x in (box[0], box[2]) for y in (box[1], box[3])]
+    # One more pixel around, for nearest sampling at the edges
+    return (math.floor(min(X for X, _ in corners)) - 1, math.floor(min(Y for _, Y in corners)) - 1,
+            math.ceil(max(X for X, _ in corners)) + 1, math.ceil(max(Y for _, Y in corners)) + 1)
+
 class ZoomImageViewer(tk.Canvas):
+    """
+    A Canvas shows a zoomable, draggable picture.
+
+    With viewport_pixels set, a display image larger than that many pixels is
+    not rendered in full: only the visible region plus viewport_margin is
+    transformed, and rendered again once dragging exhausts the margin.
+    A custom transform then needs region_transform and measure as well.
+
+    set_image(progressive=True) shows a coarse picture at once, then renders
+    TILE_SIZE tiles in worker threads and pastes them in as they finish.
+    region_transform must be thread-safe for it.
+
+    refresh() renders only the changed boxes when original_image is edited in place.
+    """
+    TILE_SIZE = 256
+    TILE_POLL_MS = 30
+    COARSE_FACTOR = 4
+
     def coords_conv(self, x: int, y: int) -> tuple[float, float]:
         """Transform the widget coords to unzoomed picture coords"""
         return ((x - self.offset_x) / self.zoom_factor,
                 (y - self.offset_y) / self.zoom_factor)
 
-    def set_image(self, img: PIL.Image.Image):
+    def set_image(self, img: PIL.Image.Image, progressive: bool = False):
         self.original_image = img
-        self.__update_display_image()
-        # 更新图像
-        self.itemconfig(self.img_id, image=self.tk_image)
-        self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        if progressive and self.region_transform is not None and self.measure is not None:
+            self.__update_display_progressive()
+        else:
+            self.__update_display_image()
+            self.__offset_limit()
+        self.__place_image()
+
+    def refresh(self, boxes: list[tuple[int, int, int, int]]):
+        """
+        Render boxes of the zoomed picture again, after original_image changed in place.
+
+        Only the parts inside the display image are transformed and copied to the Tk photo.
+        """
+        if self._tile_futures or self._display_box is None or self.region_transform is None:
+            self.set_image(self.original_image)
+            return
+        left, top = self._display_box[:2]
+        for box in boxes:
+            box = (max(box[0], self._display_box[0]), max(box[1], self._display_box[1]),
+                   min(box[2], self._display_box[2]), min(box[3], self._display_box[3]))
+            if box[0] >= box[2] or box[1] >= box[3]:
+                continue
+            region = self.region_transform(self.original_image, self.zoom_factor, box)
+            self.display_image.paste(region, (box[0] - left, box[1] - top))
+            patch = PIL.ImageTk.PhotoImage(region)
+            self.tk.call(str(self.tk_image), 'copy', str(patch), '-to', box[0] - left, box[1] - top)
 
     def see(self, x: int, y: int):
         """Focus on a point in unzoomed picture coords"""
@@ -137,35 +197,63 @@ class ZoomImageViewer(tk.Canvas):
         wndHeight = self.winfo_height()
         self.offset_x = wndWidth / 2 - x * self.zoom_factor
         self.offset_y = wndHeight / 2 - y * self.zoom_factor
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
 
     def __offset_limit(self):
         """Limit the picture in sight"""
         wndWidth = self.winfo_width()
         wndHeight = self.winfo_height()
+        displayWidth, displayHeight = self._display_size
         if self.offset_x > wndWidth / 2:
             self.offset_x = wndWidth / 2
-        if self.offset_x + self.display_image.width < wndWidth / 2:
-            self.offset_x = wndWidth / 2 - self.display_image.width
+        if self.offset_x + displayWidth < wndWidth / 2:
+            self.offset_x = wndWidth / 2 - displayWidth
         if self.offset_y > wndHeight / 2:
             self.offset_y = wndHeight / 2
-        if self.offset_y + self.display_image.height < wndHeight / 2:
-            self.offset_y = wndHeight / 2 - self.display_image.height
+        if self.offset_y + displayHeight < wndHeight / 2:
+            self.offset_y = wndHeight / 2 - displayHeight
 
     def __init__(self, master, pil_image: PIL.Image.Image,
-                 transform: Callable[[PIL.Image.Image, float], PIL.Image.Image] | None = None, **kwargs):
+                 transform: Callable[[PIL.Image.Image, float], PIL.Image.Image] | None = None,
+                 region_transform: Callable[[PIL.Image.Image, float, tuple[int, int, int, int]], PIL.Image.Image] | None = None,
+                 measure: Callable[[PIL.Image.Image, float], tuple[int, int]] | None = None,
+                 viewport_pixels: int | None = None, viewport_margin: int = 256, **kwargs):
         super().__init__(master, **kwargs)
         self.original_image = pil_image
         self.min_zoom = 2.0
         self.max_zoom = 24.0
-        self.zoom_factor = self.min_zoom * 2
+        # Zoom moves on a fixed ladder of steps, so a transform can cache its frames by zoom
+        self.zoom_ratio = 1.1
+        self._zoom_base = self.min_zoom * 2
+        self._zoom_level = 0
+        self.zoom_factor = self._zoom_base
         self.img_id = None
         self.transform = transform
+        if transform is None:
+            self.region_transform = self.__default_region_transform
+            self.measure = self.__default_measure
+        else:
+            self.region_transform = region_transform
+            self.measure = measure
+        if self.region_transform is None or self.measure is None:
+            viewport_pixels = None
+        self.viewport_pixels = viewport_pixels
+        self.viewport_margin = viewport_margin
 
         # 初始显示
         self.display_image = self.original_image.copy()
         self.tk_image = PIL.ImageTk.PhotoImage(self.display_image)
         self.img_id = self.create_image(0, 0, anchor="nw", image=self.tk_image)
+        # Size of the whole zoomed picture, and the part of it display_image holds
+        self._display_size = self.display_image.size
+        self._display_box = (0, 0, *self._display_size)
+
+        # Progressive rendering, tiles of an older display image are dropped
+        self._render_generation = 0
+        self._tile_executor: ThreadPoolExecutor = None
+        self._tile_futures: list[Future] = []
+        self._tile_queue: queue.Queue[tuple[int, tuple[int, int, int, int], Future]] = queue.Queue()
+        self._tile_after = None
 
         # 绑定缩放事件
         self.bind("<Control-MouseWheel>", self.__on_ctrl_mousewheel)
@@ -175,6 +263,7 @@ class ZoomImageViewer(tk.Canvas):
         self.bind("<B1-Motion>", self.__on_drag)
         self.bind("<ButtonPress-1>", self.__on_drag_start)
         self.bind("<Shift-ButtonPress-1>", self.__on_drag_start)
+        self.bind("<Destroy>", self.__on_destroy)
 
         # 平移偏移（图像相对canvas的偏移）
         self.offset_x = 0
@@ -188,12 +277,140 @@ class ZoomImageViewer(tk.Canvas):
         display_h = int(origin.height * zoom)
         return origin.resize((display_w, display_h), PIL.Image.NEAREST)
 
+    def __default_region_transform(self, origin: PIL.Image.Image, zoom: float,
+                                   box: tuple[int, int, int, int]) -> PIL.Image.Image:
+        return origin.resize((box[2] - box[0], box[3] - box[1]), PIL.Image.NEAREST,
+                             box=tuple(v / zoom for v in box))
+
+    def __default_measure(self, origin: PIL.Image.Image, zoom: float) -> tuple[int, int]:
+        return (int(origin.width * zoom), int(origin.height * zoom))
+
     def __update_display_image(self):
+        if self.viewport_pixels is not None:
+            self._display_size = self.measure(self.original_image, self.zoom_factor)
+            if self._display_size[0] * self._display_size[1] > self.viewport_pixels:
+                # Rendered by __place_image, once the offset is known
+                self._display_box = None
+                return
         if self.transform is not None:
-            self.display_image = self.transform(self.original_image, self.zoom_factor)
+            display_image = self.transform(self.original_image, self.zoom_factor)
         else:
-            self.display_image = self.__default_transform(self.original_image, self.zoom_factor)
+            display_image = self.__default_transform(self.original_image, self.zoom_factor)
+        self._display_size = display_image.size
+        self.__show_display_image(display_image, (0, 0, *self._display_size))
+
+    def __show_display_image(self, image: PIL.Image.Image, box: tuple[int, int, int, int]):
+        """Replace the display image, tiles still rendering for the old one are dropped"""
+        self.__cancel_tiles()
+        self.display_image = image
+        self._display_box = box
         self.tk_image = PIL.ImageTk.PhotoImage(self.display_image)
+        self.itemconfig(self.img_id, image=self.tk_image)
+
+    def __update_display_progressive(self):
+        self._display_size = self.measure(self.original_image, self.zoom_factor)
+        self.__offset_limit()
+        displayWidth, displayHeight = self._display_size
+        if self.viewport_pixels is None or displayWidth * displayHeight <= self.viewport_pixels:
+            box = (0, 0, displayWidth, displayHeight)
+        else:
+            box = self.__visible_box(self.viewport_margin)
+            if box[0] >= box[2] or box[1] >= box[3]:
+                box = (0, 0, 1, 1)
+        self.__show_display_image(self.__coarse_render(box), box)
+        self.__render_tiles(box)
+
+    def __coarse_render(self, box: tuple[int, int, int, int]) -> PIL.Image.Image:
+        """Render a box at 1/COARSE_FACTOR resolution, stretched back to its size"""
+        k = self.COARSE_FACTOR
+        coarseBox = (box[0] // k, box[1] // k, -(-box[2] // k), -(-box[3] // k))
+        coarse = self.region_transform(self.original_image, self.zoom_factor / k, coarseBox)
+        return coarse.resize((box[2] - box[0], box[3] - box[1]), PIL.Image.NEAREST,
+                             box=(box[0] / k - coarseBox[0], box[1] / k - coarseBox[1],
+                                  box[2] / k - coarseBox[0], box[3] / k - coarseBox[1]))
+
+    def __render_tiles(self, box: tuple[int, int, int, int]):
+        if self._tile_executor is None:
+            self._tile_executor = ThreadPoolExecutor(thread_name_prefix='ZoomImageViewer')
+        generation = self._render_generation
+        source, zoom = self.original_image, self.zoom_factor
+        for top in range(box[1], box[3], self.TILE_SIZE):
+            for left in range(box[0], box[2], self.TILE_SIZE):
+                tileBox = (left, top, min(left + self.TILE_SIZE, box[2]), min(top + self.TILE_SIZE, box[3]))
+                future = self._tile_executor.submit(self.region_transform, source, zoom, tileBox)
+                future.add_done_callback(lambda f, tileBox=tileBox: self._tile_queue.put((generation, tileBox, f)))
+                self._tile_futures.append(future)
+        if self._tile_after is None:
+            self._tile_after = self.after(self.TILE_POLL_MS, self.__paste_tiles)
+
+    def __paste_tiles(self):
+        """Paste finished tiles on the Tk thread, one PhotoImage update per poll"""
+        self._tile_after = None
+        pasted = False
+        while True:
+            try:
+                generation, tileBox, future = self._tile_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._render_generation or future.cancelled():
+                continue
+            self._tile_futures.remove(future)
+            if future.exception() is None:
+                tile = future.result()
+            else:
+                # Render the box here instead, the other tiles still get pasted and polled
+                try:
+                    tile = self.region_transform(self.original_image, self.zoom_factor, tileBox)
+                except Exception as e:
+                    print(f"Failed to render tile {tileBox}: {e}")
+                    continue
+            self.display_image.paste(tile, (tileBox[0] - self._display_box[0], tileBox[1] - self._display_box[1]))
+            pasted = True
+        if pasted:
+            self.tk_image = PIL.ImageTk.PhotoImage(self.display_image)
+            self.itemconfig(self.img_id, image=self.tk_image)
+        if self._tile_futures:
+            self._tile_after = self.after(self.TILE_POLL_MS, self.__paste_tiles)
+
+    def __cancel_tiles(self):
+        self._render_generation += 1
+        for future in self._tile_futures:
+            future.cancel()
+        self._tile_futures.clear()
+
+    def __on_destroy(self, event):
+        if event.widget is not self:
+            return
+        self.__cancel_tiles()
+        if self._tile_after is not None:
+            self.after_cancel(self._tile_after)
+            self._tile_after = None
+        if self._tile_executor is not None:
+            self._tile_executor.shutdown(wait=False, cancel_futures=True)
+            self._tile_executor = None
+
+    def __visible_box(self, margin: int = 0) -> tuple[int, int, int, int]:
+        """The visible part of the zoomed picture, in its own coords"""
+        displayWidth, displayHeight = self._display_size
+        return (max(0, int(-self.offset_x) - margin),
+                max(0, int(-self.offset_y) - margin),
+                min(displayWidth, math.ceil(self.winfo_width() - self.offset_x) + margin),
+                min(displayHeight, math.ceil(self.winfo_height() - self.offset_y) + margin))
+
+    def __place_image(self):
+        """Move the display image to the offset, render the viewport again if needed"""
+        if self._display_box is None or not self.__box_covers(self._display_box, self.__visible_box()):
+            box = self.__visible_box(self.viewport_margin)
+            if box[0] >= box[2] or box[1] >= box[3]:
+                box = (0, 0, 1, 1)
+            self.__show_display_image(self.region_transform(self.original_image, self.zoom_factor, box), box)
+        self.coords(self.img_id, self.offset_x + self._display_box[0], self.offset_y + self._display_box[1])
+
+    @staticmethod
+    def __box_covers(outer: tuple[int, int, int, int], inner: tuple[int, int, int, int]) -> bool:
+        if inner[0] >= inner[2] or inner[1] >= inner[3]:
+            return True
+        return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
 
     def __on_drag_start(self, event):
         self._last_x = event.x
@@ -205,7 +422,7 @@ class ZoomImageViewer(tk.Canvas):
         self.offset_x += delta_x
         self.offset_y += delta_y
         self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
         self._last_x = event.x
         self._last_y = event.y
 
@@ -213,18 +430,18 @@ class ZoomImageViewer(tk.Canvas):
         delta = 60 if event.delta > 0 else -60
         self.offset_y += delta
         self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
 
     def __on_shift_mousewheel(self, event):
         delta = 120 if event.delta > 0 else -120
         self.offset_x += delta
         self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
 
     def __on_ctrl_mousewheel(self, event):
         # 获取滚轮方向
-        delta = 1.1 if event.delta > 0 else 0.9
-        new_zoom = self.zoom_factor * delta
+        new_level = self._zoom_level + (1 if event.delta > 0 else -1)
+        new_zoom = self._zoom_base * self.zoom_ratio ** new_level
         if not (self.min_zoom <= new_zoom <= self.max_zoom):
             return
 
@@ -237,21 +454,19 @@ class ZoomImageViewer(tk.Canvas):
         image_y = (canvas_y - self.offset_y) / self.zoom_factor
 
         # 更新缩放因子
+        self._zoom_level = new_level
         self.zoom_factor = new_zoom
         self.__update_display_image()
 
-        # 更新图像
-        self.itemconfig(self.img_id, image=self.tk_image)
-
         # 更新偏移：保持鼠标位置不变
         self.offset_x = canvas_x - image_x * self.zoom_factor
         self.offset_y = canvas_y - image_y * self.zoom_factor
         self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
 
     def __on_resize(self, event):
         self.__offset_limit()
-        self.coords(self.img_id, self.offset_x, self.offset_y)
+        self.__place_image()
         # self.config(scrollregion=self.bbox("all"))
 
 class IntListVar(ttk.Variable):
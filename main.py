@@ -4,11 +4,12 @@ import os
 import sys
 import re
 import json
-import jsonschema
 import base64
 import datetime
 import time
-from typing import Literal, TextIO
+import queue
+import threading
+from typing import BinaryIO, Callable, Iterable, Iterator, Literal, TextIO
 import ctypes
 import tempfile
 from parse import parse
@@ -42,6 +43,13 @@ import AoE2ScenarioParser.settings as ASPSettings
 from Localization import *
 from Options import GlobalOptions, ScenarioOptions
 from TriggerAbstract import *
+from TriggerRemap import remapTriggerReferences, removeTriggers
+from JsonStream import JsonObjectReader, JsonStreamError
+from TriggerBinary import TRIGGER_LIBRARY_EXT, TriggerBinaryError, TriggerBinaryReader, writeTriggerBinary
+from TriggerJsonSchema import TRIGGER_JSON_SCHEMA, ValidationError, validateMember, validateTrigger
+from ScenarioCache import ScenarioCache
+from ScenarioLoader import ASP_SECTIONS, ScenarioLoader
+from UnitIndex import UnitIndex
 from views.TriggerView import TriggerView
 from views.UnitInfo import UnitInfoView
 from views.UnitView import UnitView
@@ -108,10 +116,14 @@ class TriggerJsonIO():
         pass
 
     class TriggerJsonInvalidError(Exception):
-        pass
+        def __init__(self, message: str, index: int | None = None):
+            super().__init__(message)
+            # Position in 'triggers' of the invalid trigger, None if the error is not about one
+            self.index = index
 
     @classmethod
-    def export(cls, tm: TriggerManager, begin:int=None, end:int=None) -> dict:
+    def __exportRange(cls, tm: TriggerManager, begin:int=None, end:int=None) -> tuple[list[int], list[int]]:
+        """Display order of the exported triggers, and their IDs in execution order"""
         if begin is None:
             begin = 0
         if end is None:
@@ -122,172 +134,222 @@ class TriggerJsonIO():
         for id in exportTriggerOrder:
             selectTriggersId.append(id)
         selectTriggersId.sort()
-        triggersList = []
-        for i in selectTriggersId:
-            trigger = tm.triggers[i]
-            triggerDict = {}
-            for attr in cls.triggerAttributesSet:
-                triggerDict[attr] = getattr(trigger, attr)
-            triggerDict['conditions'] = []
-            triggerDict['effects'] = []
-            for condition in trigger.conditions:
-                conditionDict = {'condition_type': condition.condition_type}
-                for attr in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
-                    conditionDict[attr] = getattr(condition, attr)
-                triggerDict['conditions'].append(conditionDict)
-            for effect in trigger.effects:
-                effectDict = {'effect_type': effect.effect_type}
-                for attr in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
-                    effectDict[attr] = getattr(effect, attr)
-                triggerDict['effects'].append(effectDict)
-            triggersList.append(triggerDict)
+        return exportTriggerOrder, selectTriggersId
+
+    @classmethod
+    def triggerToDict(cls, trigger: Trigger) -> dict:
+        triggerDict = {}
+        for attr in cls.triggerAttributesSet:
+            triggerDict[attr] = getattr(trigger, attr)
+        triggerDict['conditions'] = []
+        triggerDict['effects'] = []
+        for condition in trigger.conditions:
+            conditionDict = {'condition_type': condition.condition_type}
+            for attr in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
+                conditionDict[attr] = getattr(condition, attr)
+            triggerDict['conditions'].append(conditionDict)
+        for effect in trigger.effects:
+            effectDict = {'effect_type': effect.effect_type}
+            for attr in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
+                effectDict[attr] = getattr(effect, attr)
+            triggerDict['effects'].append(effectDict)
+        return triggerDict
+
+    @classmethod
+    def export(cls, tm: TriggerManager, begin:int=None, end:int=None) -> dict:
+        exportTriggerOrder, selectTriggersId = cls.__exportRange(tm, begin, end)
+        triggersList = [cls.triggerToDict(tm.triggers[i]) for i in selectTriggersId]
         triggersDump = {
             'trigger_display_order':exportTriggerOrder,
             'triggers': triggersList
         }
         return triggersDump
 
+    @classmethod
+    def exportToFile(cls, tm: TriggerManager, fp: TextIO, begin:int=None, end:int=None, compact=False):
+        """
+        Write what export returns as JSON, one trigger at a time.
+
+        The text equals json.dump with indent=4, or with no whitespace if compact.
+        """
+        if compact:
+            indent, itemSeparator, keySeparator, newline = None, ',', ':', ''
+        else:
+            indent, itemSeparator, keySeparator, newline = 4, ',', ': ', '\n'
+        pad = ' ' * (indent or 0)
+        def dumps(obj, depth: int) -> str:
+            text = json.dumps(obj, indent=indent, separators=(itemSeparator, keySeparator), ensure_ascii=False)
+            return text.replace('\n', '\n' + pad * depth)
+
+        exportTriggerOrder, selectTriggersId = cls.__exportRange(tm, begin, end)
+        fp.write('{' + newline + pad + '"trigger_display_order"' + keySeparator + dumps(exportTriggerOrder, 1)
+                 + itemSeparator + newline + pad + '"triggers"' + keySeparator + '[')
+        for i, id in enumerate(selectTriggersId):
+            if i > 0:
+                fp.write(itemSeparator)
+            fp.write(newline + pad * 2 + dumps(cls.triggerToDict(tm.triggers[id]), 2))
+        if len(selectTriggersId) > 0:
+            fp.write(newline + pad)
+        fp.write(']' + newline + '}')
+
+    @classmethod
+    def exportToLibrary(cls, tm: TriggerManager, fp: BinaryIO, begin:int=None, end:int=None):
+        """Write what export returns as a binary trigger library, see TriggerBinary"""
+        exportTriggerOrder, selectTriggersId = cls.__exportRange(tm, begin, end)
+        writeTriggerBinary(fp, exportTriggerOrder, [cls.triggerToDict(tm.triggers[i]) for i in selectTriggersId])
+
     @classmethod
     def append(cls, tm: TriggerManager, obj: dict):
-        if not cls.__validate(obj):
+        cls.__append(tm, cls.__dictMembers(obj))
+
+    @classmethod
+    def appendFromFile(cls, tm: TriggerManager, fp: BinaryIO, progress: Callable[[int], None] = None):
+        """Append from a JSON file read a trigger at a time, progress gets the bytes read so far"""
+        cls.__append(tm, cls.__fileMembers(fp, progress))
+
+    @classmethod
+    def appendFromLibrary(cls, tm: TriggerManager, path: str, triggerIds: Iterable[int] = None):
+        """Append from a binary trigger library, only the triggers of triggerIds (IDs in the library) if given"""
+        with TriggerBinaryReader(path) as reader:
+            cls.__append(tm, reader.members(triggerIds))
+
+    @classmethod
+    def restore(cls, tm: TriggerManager, obj: dict):
+        cls.__restore(tm, cls.__dictMembers(obj))
+
+    @classmethod
+    def restoreFromFile(cls, tm: TriggerManager, fp: BinaryIO, progress: Callable[[int], None] = None):
+        """Restore from a JSON file read a trigger at a time, progress gets the bytes read so far"""
+        cls.__restore(tm, cls.__fileMembers(fp, progress))
+
+    @classmethod
+    def __dictMembers(cls, obj: dict) -> Iterator[tuple[str, int | None, object]]:
+        """Members of a loaded trigger JSON, as JsonObjectReader.members gives them"""
+        if type(obj) != dict:
             raise cls.TriggerJsonInvalidError("Trigger JSON invalid")
-        importTriggerOriginalIds = []
+        for key, value in obj.items():
+            if key == 'triggers' and type(value) == list and len(value) > 0:
+                for i, triggerDict in enumerate(value):
+                    yield key, i, triggerDict
+            else:
+                yield key, None, value
+
+    @classmethod
+    def __fileMembers(cls, fp: BinaryIO, progress: Callable[[int], None] = None) -> Iterator[tuple[str, int | None, object]]:
+        reader = JsonObjectReader(fp)
+        for member in reader.members(('triggers', )):
+            yield member
+            if progress is not None:
+                progress(reader.bytesRead)
+
+    @classmethod
+    def __readTriggers(cls, members: Iterable[tuple[str, int | None, object]],
+                       onTrigger: Callable[[int, dict], None]) -> list[int]:
+        """
+        Validate members one by one and pass each trigger to onTrigger.
+
+        Raises at the first invalid member, returns the display order.
+        """
+        properties = cls.schema['properties']
+        order = None
+        count = 0
+        keys = set()
+        for key, index, value in members:
+            if key not in properties:
+                raise cls.TriggerJsonInvalidError(f"Unexpected property '{key}'")
+            if index is None or index == 0:
+                if key in keys:
+                    raise cls.TriggerJsonInvalidError(f"Repeated property '{key}'")
+                keys.add(key)
+            if index is None:
+                try:
+                    validateMember(key, value)
+                except ValidationError as e:
+                    raise cls.TriggerJsonInvalidError(e.message)
+                if key == 'trigger_display_order':
+                    order = value
+            else:
+                try:
+                    validateTrigger(value)
+                except ValidationError as e:
+                    raise cls.TriggerJsonInvalidError(e.message, index)
+                onTrigger(index, value)
+                count = index + 1
+        for key in cls.schema['required']:
+            if key not in keys:
+                raise cls.TriggerJsonInvalidError(f"Missing '{key}'")
+        if len(order) != count:
+            raise cls.TriggerJsonInvalidError("Display order does not match the triggers")
+        return order
+
+    @classmethod
+    def __buildTrigger(cls, tm: TriggerManager, triggerDict: dict) -> Trigger:
+        trigger:Trigger = tm.add_trigger(triggerDict['name'])
+        for attr in cls.triggerAttributesSet:
+            setattr(trigger, attr, triggerDict[attr])
+        for conditionDict in triggerDict['conditions']:
+            condition = trigger.new_condition.none()
+            condition.condition_type = conditionDict['condition_type']
+            for attr in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
+                setattr(condition, attr, conditionDict[attr])
+        for effectDict in triggerDict['effects']:
+            effect = trigger.new_effect.none()
+            effect.effect_type = effectDict['effect_type']
+            for attr in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
+                setattr(effect, attr, effectDict[attr])
+        trigger.condition_order = triggerDict['condition_order']
+        trigger.effect_order = triggerDict['effect_order']
+        return trigger
+
+    @classmethod
+    def __append(cls, tm: TriggerManager, members: Iterable[tuple[str, int | None, object]]):
         importTriggerIdMap = {}
         importedTriggers = []
         lengthBefore = len(tm.triggers)
-        newOrder = tm.trigger_display_order.copy()
+        orderBefore = tm.trigger_display_order.copy()
 
-        for i, triggerDict in enumerate(obj['triggers']):
+        def addTrigger(i: int, triggerDict: dict):
             # ID in its source scenario
             oldId = triggerDict['trigger_id']
-            importTriggerOriginalIds.append(oldId)
-            trigger:Trigger = tm.add_trigger(triggerDict['name'])
+            trigger = cls.__buildTrigger(tm, triggerDict)
             importedTriggers.append(trigger)
-            for attr in cls.triggerAttributesSet:
-                setattr(trigger, attr, triggerDict[attr])
             # ID in current scenario
             newId = i + lengthBefore
             importTriggerIdMap[oldId] = newId
             trigger.trigger_id = newId
-            for conditionDict in triggerDict['conditions']:
-                condition = trigger.new_condition.none()
-                condition.condition_type = conditionDict['condition_type']
-                for attr in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
-                    setattr(condition, attr, conditionDict[attr])
-            for effectDict in triggerDict['effects']:
-                effect = trigger.new_effect.none()
-                effect.effect_type = effectDict['effect_type']
-                for attr in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
-                    setattr(effect, attr, effectDict[attr])
-            trigger.condition_order = triggerDict['condition_order']
-            trigger.effect_order = triggerDict['effect_order']
-
-        # Redirect CEs in imported triggers, set to -1 if the target trigger not imported.
-        for trigger in importedTriggers:
-            for condition in trigger.conditions:
-                if condition.trigger_id in importTriggerOriginalIds:
-                    condition.trigger_id = importTriggerIdMap[condition.trigger_id]
-                else:
-                    condition.trigger_id = -1
-            for effect in trigger.effects:
-                if effect.trigger_id in importTriggerOriginalIds:
-                    effect.trigger_id = importTriggerIdMap[effect.trigger_id]
-                else:
-                    effect.trigger_id = -1
 
-        # Import trigger order for imported triggers
-        for id in obj['trigger_display_order']:
-            newOrder.append(importTriggerIdMap[id])
+        try:
+            order = cls.__readTriggers(members, addTrigger)
+
+            # Redirect CEs in imported triggers, set to -1 if the target trigger not imported.
+            remapTriggerReferences(importedTriggers, importTriggerIdMap, missing=-1)
+
+            # Import trigger order for imported triggers
+            newOrder = orderBefore + [importTriggerIdMap[id] for id in order]
+        except BaseException:
+            # Drop what was added before the error
+            tm.triggers = tm.triggers[:lengthBefore]
+            tm.trigger_display_order = orderBefore
+            raise
         tm.trigger_display_order = newOrder
 
     @classmethod
-    def restore(cls, tm: TriggerManager, obj: dict):
-        if not cls.__validate(obj):
-            raise cls.TriggerJsonInvalidError("Trigger JSON invalid")
-        if set(obj['trigger_display_order']) != set(range(len(obj['trigger_display_order']))):
-            raise cls.TriggerJsonNotRestorableError("Not a restorable Trigger JSON")
-        tm.remove_triggers([i for i in range(len(tm.triggers))])
-
-        for triggerDict in obj['triggers']:
-            trigger:Trigger = tm.add_trigger(triggerDict['name'])
-            for attr in cls.triggerAttributesSet:
-                setattr(trigger, attr, triggerDict[attr])
-            for conditionDict in triggerDict['conditions']:
-                condition = trigger.new_condition.none()
-                condition.condition_type = conditionDict['condition_type']
-                for attr in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
-                    setattr(condition, attr, conditionDict[attr])
-            for effectDict in triggerDict['effects']:
-                effect = trigger.new_effect.none()
-                effect.effect_type = effectDict['effect_type']
-                for attr in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
-                    setattr(effect, attr, effectDict[attr])
-            trigger.condition_order = triggerDict['condition_order']
-            trigger.effect_order = triggerDict['effect_order']
-        tm.trigger_display_order = obj['trigger_display_order']
-
-    schema = {
-        "type": "object",
-        "properties": {
-            "trigger_display_order": {
-                "type": "array",
-                "items": {
-                    "type": "integer"
-                }
-            },
-            "triggers": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "name": {
-                            "type": "string"
-                        },
-                        "condition_order": {
-                            "type": "array",
-                            "items": {
-                                "type": "integer"
-                            }
-                        },
-                        "effect_order": {
-                            "type": "array",
-                            "items": {
-                                "type": "integer"
-                            }
-                        },
-                        "conditions": {
-                            "type": "array",
-                            "items": {
-                                "type": "object"
-                            }
-                        },
-                        "effects": {
-                            "type": "array",
-                            "items": {
-                                "type": "object"
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "required": [
-            "trigger_display_order",
-            "triggers"
-        ],
-        "additionalProperties": False
-    }
-
-    @classmethod
-    def __validate(cls, obj: dict) -> bool:
+    def __restore(cls, tm: TriggerManager, members: Iterable[tuple[str, int | None, object]]):
+        triggersBefore = list(tm.triggers)
+        orderBefore = tm.trigger_display_order.copy()
+        removeTriggers(tm, range(len(tm.triggers)))
         try:
-            jsonschema.validate(obj, cls.schema)
-        except jsonschema.ValidationError:
-            return False
-        length = len(obj['triggers'])
-        if len(obj['trigger_display_order']) != length:
-            return False
-        return True
+            order = cls.__readTriggers(members, lambda i, triggerDict: cls.__buildTrigger(tm, triggerDict))
+            if set(order) != set(range(len(order))):
+                raise cls.TriggerJsonNotRestorableError("Not a restorable Trigger JSON")
+        except BaseException:
+            # Removed triggers keep their IDs and CEs, put them back as they were
+            tm.triggers = triggersBefore
+            tm.trigger_display_order = orderBefore
+            raise
+        tm.trigger_display_order = order
+
+    schema = TRIGGER_JSON_SCHEMA
 
 class TCWindow():
 
@@ -300,6 +362,9 @@ class TCWindow():
         # Packed script has no console, redirect IO first
         self.tLog = None
         self.logCatch = None
+        # Written by worker threads, shown by the Tk thread
+        self.logQueue: queue.Queue[str] = queue.Queue()
+        self.scenarioLoader: ScenarioLoader = None
         self.ioAgent = RedirectIO()
         self.ioAgent.write = self.writeLog
         self.stdoutBack = sys.stdout
@@ -325,13 +390,17 @@ class TCWindow():
         self.__loadImages()
 
         self.options = GlobalOptions(workDir)
+        self.scenarioCache = ScenarioCache(f'{workDir}/cache')
         self.wndLog = None
+        self.wndLoading = None
         self.__createMainWindow()
 
         end_init = time.time()
         print(f'Initialize used {end_init - start_init:.3f} seconds')
 
     def windowClose(self):
+        if self.scenarioLoader is not None:
+            self.cancelScenarioLoading()
         if self.openedScenPath == '':
             self.root.destroy()
         elif self.askSaveScenario():
@@ -353,25 +422,38 @@ class TCWindow():
 
     def generateDefaultScenario(self):
         self.openedScenPath = ''
-        ASPSettings.PRINT_STATUS_UPDATES = False
-        self.activeScenario = AoE2DEScenario.from_default()
-        ASPSettings.PRINT_STATUS_UPDATES = True
+        with ScenarioLoader.PARSE_LOCK:
+            ASPSettings.PRINT_STATUS_UPDATES = False
+            self.activeScenario = AoE2DEScenario.from_default()
+            ASPSettings.PRINT_STATUS_UPDATES = True
         print('Loaded default scenario')
         self.windowTitleTail = "default"
         self.triggerManager: TriggerManager = self.activeScenario.trigger_manager
         self.readScenario()
 
-    def __catchScenLoadProgress(self, s: str) -> None:
-        start = s.find('🔄 Gathering ')
-        if start != -1:
-            start += len('🔄 Gathering ')
-            end = s.find(' data...')
-            if end > start:
-                self.statusBarMessage(TEXT['noticeFormatAspLoadingSection'].format(TEXT['noticeValueAspSectionName'][s[start : end]]), True)
-
     def writeLog(self, s:str, /) -> int:
         if self.stdoutBack != None:
             self.stdoutBack.write(s)
+        if threading.current_thread() is not threading.main_thread():
+            # Widgets belong to the Tk thread, it shows the queued text later
+            self.logQueue.put(s)
+            loader = ScenarioLoader.current()
+            if loader is not None:
+                loader.catchOutput(s)
+            return len(s)
+        self.__flushLogQueue()
+        self.__writeLogWidget(s)
+        return len(s)
+
+    def __flushLogQueue(self):
+        while True:
+            try:
+                s = self.logQueue.get_nowait()
+            except queue.Empty:
+                return
+            self.__writeLogWidget(s)
+
+    def __writeLogWidget(self, s:str, /):
         if self.tLog != None and self.tLog.winfo_exists() == True:
             self.tLog.text.configure(state='normal')
             self.tLog.text.insert(END, s)
@@ -381,7 +463,6 @@ class TCWindow():
                 self.tLog.update_idletasks()
         if self.logCatch != None:
             self.logCatch(s)
-        return len(s)
 
     # region Creation
 
@@ -519,6 +600,10 @@ class TCWindow():
         self.menuEdit.add_separator()
         self.menuEdit.add_command(label=TEXT['menuExportTriggerToText'], command=self.exportSelTriggerToText)
         self.menuEdit.add_command(label=TEXT['menuImportTriggerFromText'], command=self.addTriggerFromText)
+        self.menuEdit.add_checkbutton(label=TEXT['menuCompactTriggerText'], variable=self.options.compactTriggerJson)
+        self.menuEdit.add_separator()
+        self.menuEdit.add_command(label=TEXT['menuExportTriggerToLibrary'], command=self.exportSelTriggerToLibrary)
+        self.menuEdit.add_command(label=TEXT['menuImportTriggerFromLibrary'], command=self.addTriggerFromLibrary)
         self.menuEdit.add_separator()
         self.menuEdit.add_command(label=TEXT['menuExportAllText'], command=lambda: print('ExportAllText'), state='disabled')
         self.menuEdit.add_command(label=TEXT['menuImportText'], command=lambda: print('ImportText'), state='disabled')
@@ -580,6 +665,9 @@ class TCWindow():
         except ResourcesFileError as e:
             messagebox.showerror('File Error', 'Fail to change language due to:\n\n{0}'.format(e.args[0]), icon='error')
         else:
+            # Texts and unit names are reloaded
+            ABSTRACT_RENDERER.compile()
+            ABSTRACT_CACHE.clear()
             self.reinitialize()
 
     def statusBarMessage(self, msg: str, update=False, layer: Literal['bottom', 'top'] = 'bottom') -> None:
@@ -659,38 +747,51 @@ class TCWindow():
         if not jsonExt and not os.path.isfile(saveFilePath):
             saveFilePath += '.json'
 
-        tDump = TriggerJsonIO.export(self.triggerManager)
         with open(saveFilePath, 'w', encoding='utf-8') as fp:
-            json.dump(tDump, fp, indent=4, ensure_ascii=False)
+            TriggerJsonIO.exportToFile(self.triggerManager, fp, compact=self.options.compactTriggerJson.get())
         self.statusBarMessage(TEXT['noticeTriggerJsonSaved'])
 
+    def __triggerJsonProgress(self, path: str) -> Callable[[int], None]:
+        """Progress callback of TriggerJsonIO reading path, shown in the status bar"""
+        size = max(os.path.getsize(path), 1)
+        shown = -1
+        def progress(bytesRead: int):
+            nonlocal shown
+            percent = bytesRead * 100 // size
+            if percent != shown:
+                shown = percent
+                self.statusBarMessage(TEXT['noticeFormatTriggerJsonReading'].format(percent), update=True)
+        return progress
+
+    def __showTriggerJsonInvalid(self, e: TriggerJsonIO.TriggerJsonInvalidError):
+        if e.index is None:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonSchemaError'])
+        else:
+            messagebox.showerror(title=TEXT['titleError'],
+                                 message=TEXT['messageFormatJsonTriggerInvalid'].format(e.index, e))
+
     def importTriggerFromText(self):
         openFilePath = askopenfilename(title=TEXT['titleSelectTriggerJson'],
                                        filetypes=[('JSON', '*.json'), (TEXT['typeNameAll'], '*')])
-        triggersDump = None
         if openFilePath == '':
             return
-        with open(openFilePath, 'r', encoding='utf-8') as f:
-            try:
-                triggersDump = json.load(f)
-            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonDecodeError'])
-            except Exception as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
-                raise e
-        if triggersDump:
-            try:
-                TriggerJsonIO.restore(self.triggerManager, triggersDump)
-            except TriggerJsonIO.TriggerJsonInvalidError:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonSchemaError'])
-            except TriggerJsonIO.TriggerJsonNotRestorableError:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonNotRestorableError'])
-            except Exception as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
-                raise e
-            else:
-                self.fTEditor.loadTrigger()
-                self.statusBarMessage(TEXT['noticeTriggerJsonRestored'])
+        try:
+            with open(openFilePath, 'rb') as f:
+                TriggerJsonIO.restoreFromFile(self.triggerManager, f, self.__triggerJsonProgress(openFilePath))
+        except (json.decoder.JSONDecodeError, JsonStreamError, UnicodeDecodeError) as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonDecodeError'])
+        except TriggerJsonIO.TriggerJsonInvalidError as e:
+            self.__showTriggerJsonInvalid(e)
+        except TriggerJsonIO.TriggerJsonNotRestorableError:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonNotRestorableError'])
+        except Exception as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
+            raise e
+        else:
+            self.fTEditor.loadTrigger()
+            self.statusBarMessage(TEXT['noticeTriggerJsonRestored'])
+            return
+        self.statusBarMessage('')
 
     def exportSelTriggerToText(self):
         valueRange = self.fTEditor.getRangeValue()
@@ -714,36 +815,122 @@ class TCWindow():
         if not jsonExt and not os.path.isfile(saveFilePath):
             saveFilePath += '.json'
 
-        tDump = TriggerJsonIO.export(self.triggerManager, displayIdBegin, displayIdEnd)
         with open(saveFilePath, 'w', encoding='utf-8') as fp:
-            json.dump(tDump, fp, indent=4, ensure_ascii=False)
+            TriggerJsonIO.exportToFile(self.triggerManager, fp, displayIdBegin, displayIdEnd,
+                                       compact=self.options.compactTriggerJson.get())
         self.statusBarMessage(TEXT['noticeTriggerJsonSaved'])
 
     def addTriggerFromText(self):
         openFilePath = askopenfilename(title=TEXT['titleSelectTriggerJson'],
                                        filetypes=[('JSON', '*.json'), (TEXT['typeNameAll'], '*')])
-        triggersDump = None
         if openFilePath == '':
             return
-        with open(openFilePath, 'r', encoding='utf-8') as f:
-            try:
-                triggersDump = json.load(f)
-            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonDecodeError'])
-            except Exception as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
-                raise e
-        if triggersDump:
-            try:
-                TriggerJsonIO.append(self.triggerManager, triggersDump)
-            except TriggerJsonIO.TriggerJsonInvalidError:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonSchemaError'])
-            except Exception as e:
-                messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
-                raise e
-            else:
-                self.fTEditor.loadTrigger()
-                self.statusBarMessage(TEXT['noticeTriggerJsonAdded'])
+        try:
+            with open(openFilePath, 'rb') as f:
+                TriggerJsonIO.appendFromFile(self.triggerManager, f, self.__triggerJsonProgress(openFilePath))
+        except (json.decoder.JSONDecodeError, JsonStreamError, UnicodeDecodeError) as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageJsonDecodeError'])
+        except TriggerJsonIO.TriggerJsonInvalidError as e:
+            self.__showTriggerJsonInvalid(e)
+        except Exception as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
+            raise e
+        else:
+            self.fTEditor.loadTrigger()
+            self.statusBarMessage(TEXT['noticeTriggerJsonAdded'])
+            return
+        self.statusBarMessage('')
+
+    def exportSelTriggerToLibrary(self):
+        valueRange = self.fTEditor.getRangeValue()
+        if type(valueRange) == str:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageValueRangeInvalid'].format(valueRange))
+            return
+        displayIdBegin, displayIdEnd, displayIdTarget = valueRange
+
+        if not self.openedScenPath:
+            initialFile = 'default' + TRIGGER_LIBRARY_EXT
+        else:
+            scenFolder, scenName = os.path.split(self.openedScenPath)
+            scenStem, scenExt = os.path.splitext(scenName)
+            initialFile = scenStem + TRIGGER_LIBRARY_EXT
+        saveFilePath = asksaveasfilename(title=TEXT['titleSelectSaveTriggerJson'],
+                                         initialfile=initialFile,
+                                         filetypes=[(TEXT['typeNameTriggerLibrary'], '*' + TRIGGER_LIBRARY_EXT)])
+        if not saveFilePath:
+            return
+        libraryName, libraryExt = os.path.splitext(saveFilePath)
+        if not libraryExt and not os.path.isfile(saveFilePath):
+            saveFilePath += TRIGGER_LIBRARY_EXT
+
+        try:
+            with open(saveFilePath, 'wb') as fp:
+                TriggerJsonIO.exportToLibrary(self.triggerManager, fp, displayIdBegin, displayIdEnd)
+        except TriggerBinaryError as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
+            return
+        self.statusBarMessage(TEXT['noticeTriggerLibrarySaved'])
+
+    def __askLibraryTriggers(self, path: str) -> list[int] | None:
+        """Let the user select triggers of the library at path, their IDs in the library or None if cancelled"""
+        with TriggerBinaryReader(path) as reader:
+            order = list(reader.displayOrder)
+            names = [reader.triggerName(triggerId) for triggerId in order]
+        selected = None
+        wndLibrary = ttk.Toplevel(TEXT['titleLibraryTriggers'], master=self.main, transient=self.main)
+        self.centerWindowGeometry(wndLibrary, self.dpi(500), self.dpi(600), location=0.3)
+        lblLibrary = ttk.Label(wndLibrary, text=TEXT['labelLibraryTriggers'], anchor=W)
+        lblLibrary.pack(side=TOP, fill=X, padx=self.dpi(20), pady=self.dpi((10, 6)))
+        fButtons = ttk.Frame(wndLibrary)
+        fButtons.pack(side=BOTTOM, fill=X, padx=self.dpi(20), pady=self.dpi(10))
+        fTriggers = ttk.Frame(wndLibrary)
+        fTriggers.pack(side=TOP, fill=BOTH, expand=True, padx=self.dpi(20))
+        # Extended selection, Shift+click selects a range of the display order
+        lbTriggers = tk.Listbox(fTriggers, selectmode=EXTENDED, activestyle=NONE, exportselection=False)
+        sbTriggers = ttk.Scrollbar(fTriggers, orient=VERTICAL, command=lbTriggers.yview)
+        lbTriggers.configure(yscrollcommand=sbTriggers.set)
+        sbTriggers.pack(side=RIGHT, fill=Y)
+        lbTriggers.pack(side=LEFT, fill=BOTH, expand=True)
+        for displayIndex, name in enumerate(names):
+            lbTriggers.insert(END, f'{displayIndex}  {name}')
+        lbTriggers.selection_set(0, END)
+
+        def confirm():
+            nonlocal selected
+            selected = [order[displayIndex] for displayIndex in lbTriggers.curselection()]
+            wndLibrary.destroy()
+        btnConfirm = ttk.Button(fButtons, text=TEXT['btnConfirm'], command=confirm)
+        btnConfirm.pack(side=RIGHT)
+        btnCancel = ttk.Button(fButtons, text=TEXT['btnCancel'], command=wndLibrary.destroy)
+        btnCancel.pack(side=RIGHT, padx=self.dpi((0, 10)))
+        btnSelectAll = ttk.Button(fButtons, text=TEXT['btnSelectAll'], command=lambda: lbTriggers.selection_set(0, END))
+        btnSelectAll.pack(side=LEFT)
+        wndLibrary.grab_set()
+        self.main.wait_window(wndLibrary)
+        # Nothing selected adds nothing, same as cancelling
+        return selected or None
+
+    def addTriggerFromLibrary(self):
+        openFilePath = askopenfilename(title=TEXT['titleSelectTriggerJson'],
+                                       filetypes=[(TEXT['typeNameTriggerLibrary'], '*' + TRIGGER_LIBRARY_EXT),
+                                                  (TEXT['typeNameAll'], '*')])
+        if openFilePath == '':
+            return
+        try:
+            triggerIds = self.__askLibraryTriggers(openFilePath)
+            if triggerIds is None:
+                return
+            TriggerJsonIO.appendFromLibrary(self.triggerManager, openFilePath, triggerIds)
+        except TriggerBinaryError as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageTriggerLibraryError'].format(e))
+        except TriggerJsonIO.TriggerJsonInvalidError as e:
+            self.__showTriggerJsonInvalid(e)
+        except Exception as e:
+            messagebox.showerror(title=TEXT['titleError'], message=TEXT['messageError'].format(e))
+            raise e
+        else:
+            self.fTEditor.loadTrigger()
+            self.statusBarMessage(TEXT['noticeTriggerLibraryAdded'])
 
     def itemSelect(self, event):
         curItem = self.fTEditor.tvTriggerList.focus()
@@ -794,6 +981,7 @@ class TCWindow():
             return False
 
     def __saveScen(self, path):
+        self.scenarioCache.abandon(self.activeScenario)
         try:
             self.activeScenario.write_to_file(path)
         except OverflowError as e:
@@ -835,16 +1023,79 @@ class TCWindow():
     def openScenario(self, path=None):
         if path == None:
             path = self.openedScenPath
-        if path == '':
+        if path == '' or self.scenarioLoader is not None:
             return
         scenFolder, scenName = os.path.split(path)
         scenStem, scenExt = os.path.splitext(scenName)
         print(scenFolder, scenStem, scenExt)
-        self.statusBarMessage(TEXT['noticeScenarioLoading'], update=True)
-        try:
-            self.logCatch = self.__catchScenLoadProgress
-            self.activeScenario:AoE2DEScenario = AoE2DEScenario.from_file(path)
-        except UnknownScenarioStructureError as e:
+        self.statusBarMessage(TEXT['noticeScenarioLoading'])
+        # Parse in a worker thread, the window keeps repainting and the load can be cancelled
+        self.scenarioLoader = ScenarioLoader(path,
+                                             onProgress=self.__scenarioLoadProgress,
+                                             onDone=lambda scenario: self.__scenarioLoaded(path, scenario),
+                                             onError=self.__scenarioLoadFailed,
+                                             cache=self.scenarioCache)
+        self.__showLoadingDialog()
+        self.scenarioLoader.start()
+        self.__pollScenarioLoader()
+
+    def cancelScenarioLoading(self):
+        if self.scenarioLoader is None:
+            return
+        self.scenarioLoader.cancel()
+        self.scenarioLoader = None
+        self.__closeLoadingDialog()
+        self.statusBarMessage(TEXT['noticeScenarioLoadCancelled'])
+
+    def __pollScenarioLoader(self):
+        self.__flushLogQueue()
+        loader = self.scenarioLoader
+        if loader is None:
+            return
+        loader.poll()
+        if not loader.finished:
+            self.root.after(50, self.__pollScenarioLoader)
+
+    def __showLoadingDialog(self):
+        self.wndLoading = ttk.Toplevel(TEXT['noticeScenarioLoading'], master=self.main, transient=self.main)
+        self.centerWindowGeometry(self.wndLoading, self.dpi(400), self.dpi(120), location=0.4)
+        self.wndLoading.resizable(False, False)
+        self.wndLoading.protocol('WM_DELETE_WINDOW', self.cancelScenarioLoading)
+        self.varLoadingSection = ttk.StringVar(value=TEXT['noticeScenarioLoading'])
+        lblLoadingSection = ttk.Label(self.wndLoading, textvariable=self.varLoadingSection, anchor=W)
+        lblLoadingSection.pack(side=TOP, fill=X, padx=self.dpi(20), pady=self.dpi((10, 6)))
+        self.pbLoading = ttk.Progressbar(self.wndLoading, maximum=len(ASP_SECTIONS), value=0)
+        self.pbLoading.pack(side=TOP, fill=X, padx=self.dpi(20))
+        btnCancel = ttk.Button(self.wndLoading, text=TEXT['btnCancel'], command=self.cancelScenarioLoading)
+        btnCancel.pack(side=BOTTOM, anchor=E, padx=self.dpi(20), pady=self.dpi(10))
+        self.wndLoading.grab_set()
+
+    def __closeLoadingDialog(self):
+        if self.wndLoading is not None and self.wndLoading.winfo_exists():
+            self.wndLoading.grab_release()
+            self.wndLoading.destroy()
+        self.wndLoading = None
+
+    def __scenarioLoadProgress(self, section: str, index: int, total: int):
+        message = TEXT['noticeFormatAspLoadingSection'].format(TEXT['noticeValueAspSectionName'][section])
+        self.statusBarMessage(message)
+        self.varLoadingSection.set(message)
+        self.pbLoading.configure(value=index, maximum=total)
+
+    def __scenarioLoaded(self, path: str, scenario: AoE2DEScenario):
+        self.scenarioLoader = None
+        self.__closeLoadingDialog()
+        scenFolder, scenName = os.path.split(path)
+        self.activeScenario = scenario
+        self.windowTitleTail = scenName
+        self.openedScenPath = path
+        self.triggerManager = self.activeScenario.trigger_manager
+        self.readScenario()
+
+    def __scenarioLoadFailed(self, e: Exception):
+        self.scenarioLoader = None
+        self.__closeLoadingDialog()
+        if isinstance(e, UnknownScenarioStructureError):
             def checkVersionNotSupportedRaise(e: UnknownScenarioStructureError):
                 """Catch ASP version not supported exception."""
                 if not isinstance(e.args[0], str):
@@ -869,7 +1120,7 @@ class TCWindow():
 
             if not checkVersionNotSupportedRaise(e):
                 messagebox.showerror(title=TEXT['titleOpenfailed'], message=TEXT['messageOpenfailed'].format(e))
-        except UnsupportedVersionError as e:
+        elif isinstance(e, UnsupportedVersionError):
             def checkTriggerNotSupportedRaise(e: UnsupportedVersionError):
                 """Catch ASP trigger not supported exception."""
                 if not isinstance(e.args[0], str):
@@ -889,16 +1140,9 @@ class TCWindow():
 
             if not checkTriggerNotSupportedRaise(e):
                 messagebox.showerror(title=TEXT['titleOpenfailed'], message=TEXT['messageOpenfailed'].format(e))
-        except Exception as e:
+        else:
             messagebox.showerror(title=TEXT['titleOpenfailed'], message=TEXT['messageOpenfailed'].format(e))
             raise e
-        else:
-            self.windowTitleTail = scenName
-            self.openedScenPath = path
-            self.triggerManager = self.activeScenario.trigger_manager
-            self.readScenario()
-        finally:
-            self.logCatch = None
 
     def openScenarioAskFile(self):
         openFilePath = askopenfilename(title=TEXT['titleSelectScenario'],
@@ -907,6 +1151,7 @@ class TCWindow():
 
     def readScenario(self):
         self.root.title(f"{TEXT['titleMainWindow']} - [{self.windowTitleTail}]")
+        self.unitIndex = UnitIndex(self.activeScenario.unit_manager)
         self.fMetaViewTab.loadMeta()
         self.fTEditor.loadTrigger()
         self.fMapViewTab.loadMapView()
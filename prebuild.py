@@ -3,6 +3,8 @@ import importlib.util
 import json
 import os
 
+from TerrainPal import TERRAIN_PAL, TERRAIN_PAL_FALLBACK
+
 def createDummyVersion(path):
     with open(path, "w") as f:
         f.write(f'VERSION_STRING = ""\n')
@@ -59,6 +61,25 @@ def createCeAttributeDict(outPath):
         f.write('EFFECT_ATTRIBUTES = ' + str(effectAttributes) + '\n')
         f.write('CONDITION_ATTRIBUTES = ' + str(conditionAttributes) + '\n')
 
+def createTerrainLut(outPath):
+    # Dense, clamped uint8 [terrain_id][elevation][3] table for MapRender,
+    # the row after the last terrain id holds the colour for unknown ids.
+    terrainCount = max(TERRAIN_PAL) + 1
+    elevationCount = max(len(colors) for colors in TERRAIN_PAL.values())
+    lut = bytearray((terrainCount + 1) * elevationCount * 3)
+    rows = [TERRAIN_PAL.get(terrainId, TERRAIN_PAL_FALLBACK) for terrainId in range(terrainCount)]
+    rows.append(TERRAIN_PAL_FALLBACK)
+    for terrainId, colors in enumerate(rows):
+        for elevation in range(elevationCount):
+            # Elevations beyond a palette's length reuse its brightest colour
+            color = colors[min(elevation, len(colors) - 1)]
+            offset = (terrainId * elevationCount + elevation) * 3
+            lut[offset:offset + 3] = bytes(min(max(c, 0), 255) for c in color)
+
+    with open(outPath, 'w', encoding='utf-8') as f:
+        f.write(f'TERRAIN_LUT_SHAPE = {(terrainCount + 1, elevationCount, 3)}\n')
+        f.write(f'TERRAIN_LUT_BYTES = {bytes(lut)!r}\n')
+
 if __name__ == '__main__':
     workDir = os.path.dirname(__file__)
 
@@ -70,4 +91,6 @@ if __name__ == '__main__':
     print('Created ' + '_prebuild/AoE2TC_icon.py')
     createCeAttributeDict(outPath=f'{workDir}/_prebuild/CeAttributes.py')
     print('Created ' + '_prebuild/CeAttributes.py')
+    createTerrainLut(outPath=f'{workDir}/_prebuild/TerrainLut.py')
+    print('Created ' + '_prebuild/TerrainLut.py')
     print('prebuild done.')
\ No newline at end of file
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AoE2ScenarioParser.scenarios.aoe2_de_scenario import AoE2DEScenario
+import AoE2ScenarioParser.settings as ASPSettings
+
+from Localization import LOCALIZATION_DEFINES, loadLocalizationDefines, loadLocalizedText
+from TriggerAbstract import AbstractRenderer, abstractCondition, abstractEffect
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
+
+WORK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Small values hit the special cases: -1 for none, 8 / 9 / 50 attributes, 0 quantity
+INT_VALUES = (-1, 0, 1, 2, 3, 5, 8, 9, 50, 100, 4000)
+STRING_VALUES = ('', 'Hello', 'A message longer than the abstract limit', 'void main() { xsChatData("x"); }', 'line\nbreak')
+
+def randomValue(rng: random.Random, current: object) -> object:
+    if type(current) == list:
+        return [rng.randrange(0, 5000) for _ in range(rng.choice((0, 1, 3)))]
+    elif type(current) == str:
+        return rng.choice(STRING_VALUES)
+    else:
+        return rng.choice(INT_VALUES)
+
+def fakeCorpus(count: int, seed: int = 0) -> tuple[AoE2DEScenario, list]:
+    """
+    Conditions and effects of every type with random attributes, count in total.
+
+    Keep the scenario alive as long as the CEs, they find it by a weak reference.
+    """
+    rng = random.Random(seed)
+    # Random attributes do not fit the types, ASP warns about them
+    warnings.simplefilter('ignore')
+    ASPSettings.PRINT_STATUS_UPDATES = False
+    scenario = AoE2DEScenario.from_default()
+    tm = scenario.trigger_manager
+    for i in range(10):
+        tm.add_trigger(f'Trigger {i}')
+    conditionTypes = list(CONDITION_ATTRIBUTES)
+    effectTypes = list(EFFECT_ATTRIBUTES)
+    ces = []
+    while len(ces) < count:
+        trigger = tm.add_trigger('Corpus')
+        for _ in range(100):
+            if rng.random() < 0.3:
+                ce = trigger.new_condition.none()
+                ce.condition_type = rng.choice(conditionTypes)
+                ce.inverted = rng.choice((-1, 0, 1))
+                attributes = CONDITION_ATTRIBUTES[ce.condition_type]
+            else:
+                ce = trigger.new_effect.none()
+                ce.effect_type = rng.choice(effectTypes)
+                attributes = EFFECT_ATTRIBUTES[ce.effect_type]
+            for attribute in attributes:
+                try:
+                    setattr(ce, attribute, randomValue(rng, getattr(ce, attribute)))
+                except (TypeError, ValueError):
+                    # Armour attack fields of some types only take values as a pair
+                    pass
+            ces.append(ce)
+    return scenario, ces[:count]
+
+def renderAll(ces: list, renderCondition, renderEffect) -> list[str]:
+    return [renderCondition(ce) if hasattr(ce, 'condition_type') else renderEffect(ce) for ce in ces]
+
+if __name__ == '__main__':
+    scenario, ces = fakeCorpus(100000)
+    # Broken attributes are reported by print, keep the timing readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        results = []
+        loadLocalizationDefines(WORK_DIR)
+        for define in LOCALIZATION_DEFINES:
+            loadLocalizedText(WORK_DIR, define['code'])
+            renderer = AbstractRenderer()
+            start = time.perf_counter()
+            renderer.compile()
+            compileTime = time.perf_counter() - start
+            start = time.perf_counter()
+            reference = renderAll(ces, abstractCondition, abstractEffect)
+            referenceTime = time.perf_counter() - start
+            start = time.perf_counter()
+            compiled = renderAll(ces, renderer.condition, renderer.effect)
+            compiledTime = time.perf_counter() - start
+            mismatches = sum(a != b for a, b in zip(reference, compiled))
+            results.append((define['code'], referenceTime, compiledTime, compileTime, mismatches))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print(f'{len(ces)} CEs')
+    print(f'{"lang":>6} {"match":>10} {"compiled":>10} {"speedup":>8} {"compile":>9} {"mismatch":>9}')
+    for lang, referenceTime, compiledTime, compileTime, mismatches in results:
+        print(f'{lang:>6} {referenceTime * 1000:>8.0f}ms {compiledTime * 1000:>8.0f}ms {referenceTime / compiledTime:>7.2f}x'
+              f' {compileTime * 1000:>7.2f}ms {mismatches:>9}')
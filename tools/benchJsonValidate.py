@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsonschema
+
+from TriggerJsonSchema import TRIGGER_JSON_SCHEMA, ValidationError, validateMember, validateTrigger
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
+from benchAbstract import fakeCorpus
+
+TRIGGER_KEYS = [key for key in TRIGGER_JSON_SCHEMA['properties']['triggers']['items']['required']
+                if key not in ('conditions', 'effects')]
+
+def dumpTriggers(tm) -> dict:
+    """What TriggerJsonIO.export writes, without loading the window"""
+    triggers = []
+    for trigger in tm.triggers:
+        triggerDict = {key: getattr(trigger, key) for key in TRIGGER_KEYS}
+        triggerDict['conditions'] = [{'condition_type': c.condition_type,
+                                      **{attr: getattr(c, attr) for attr in CONDITION_ATTRIBUTES[c.condition_type]}}
+                                     for c in trigger.conditions]
+        triggerDict['effects'] = [{'effect_type': e.effect_type,
+                                   **{attr: getattr(e, attr) for attr in EFFECT_ATTRIBUTES[e.effect_type]}}
+                                  for e in trigger.effects]
+        triggers.append(triggerDict)
+    # Through text, as a file would be read
+    return json.loads(json.dumps({'trigger_display_order': tm.trigger_display_order, 'triggers': triggers}))
+
+def validateCompiled(obj: dict):
+    for key in TRIGGER_JSON_SCHEMA['required']:
+        if key not in obj:
+            raise ValidationError(f"'{key}' is a required property")
+    for key, value in obj.items():
+        if key == 'triggers' and type(value) == list:
+            validateMember(key, [])
+            for triggerDict in value:
+                validateTrigger(triggerDict)
+        else:
+            validateMember(key, value)
+
+def timed(function, obj: dict) -> float:
+    start = time.perf_counter()
+    function(obj)
+    return time.perf_counter() - start
+
+def mutations(obj: dict):
+    """Copies of obj broken in one place each"""
+    trigger = obj['triggers'][0]
+    breaks = [
+        lambda o: o.pop('triggers'),
+        lambda o: o.__setitem__('extra', 1),
+        lambda o: o['trigger_display_order'].append('1'),
+        lambda o: o['trigger_display_order'].append(True),
+        lambda o: o['triggers'].append([]),
+        lambda o: o['triggers'][0].pop('name'),
+        lambda o: o['triggers'][0].__setitem__('name', 3),
+        lambda o: o['triggers'][0].__setitem__('trigger_id', 1.5),
+        lambda o: o['triggers'][0].__setitem__('conditions', {}),
+        lambda o: o['triggers'][0]['effects'].append(2),
+        lambda o: o['triggers'][0]['effect_order'].append(None),
+    ]
+    for brk in breaks:
+        broken = {'trigger_display_order': list(obj['trigger_display_order']),
+                  'triggers': [dict(trigger, effects=list(trigger['effects']), effect_order=list(trigger['effect_order']))]}
+        brk(broken)
+        yield broken
+
+if __name__ == '__main__':
+    scenario, ces = fakeCorpus(100000)
+    obj = dumpTriggers(scenario.trigger_manager)
+    size = len(json.dumps(obj, indent=4))
+    validator = jsonschema.validators.validator_for(TRIGGER_JSON_SCHEMA)(TRIGGER_JSON_SCHEMA)
+    results = [
+        ('jsonschema.validate', timed(lambda o: jsonschema.validate(o, TRIGGER_JSON_SCHEMA), obj)),
+        ('cached validator', timed(validator.validate, obj)),
+        ('compiled + CE names', timed(validateCompiled, obj)),
+    ]
+    mismatches = 0
+    for broken in mutations(obj):
+        try:
+            validateCompiled(broken)
+            compiledValid = True
+        except ValidationError:
+            compiledValid = False
+        mismatches += validator.is_valid(broken) != compiledValid
+    print(f'{len(obj["triggers"])} triggers, {len(ces)} CEs, {size / 1e6:.1f} MB indented')
+    for name, seconds in results:
+        print(f'{name:>20} {seconds * 1000:>8.0f}ms {size / 1e6 / seconds:>8.1f} MB/s')
+    print(f'{"mismatch":>20} {mismatches:>8}')
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PIL.Image
+import PIL.ImageDraw
+from PIL import ImageColor
+
+from CommonPalette import AOE_PAL
+from MapRender import MapCompositor, UnitDotPalette, rasterizeTerrain, rasterizeUnits
+from TerrainPal import TERRAIN_PAL
+
+UNIT_DOT_PAL = [(255, 255, 255), (0, 0, 255), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+                (0, 255, 255), (255, 0, 255), (64, 64, 64), (255, 128, 0)]
+
+class FakeMapManager():
+    """Stand-in for ASP MapManager, holds only what the map renderer reads"""
+    def __init__(self, size: int, seed: int = 0):
+        rng = random.Random(seed)
+        terrainIds = list(TERRAIN_PAL)
+        self.map_width = size
+        self.map_height = size
+        self.terrain = [SimpleNamespace(terrain_id=rng.choice(terrainIds), elevation=rng.randrange(0, 8))
+                        for _ in range(size * size)]
+
+    def get_tile(self, x: int, y: int):
+        return self.terrain[x + y * self.map_width]
+
+def rasterizeTerrainLegacy(mm: FakeMapManager) -> PIL.Image.Image:
+    """The per-tile putpixel loop MapView used before MapRender"""
+    image = PIL.Image.new('RGB', (mm.map_width, mm.map_height))
+    for y in range(0, mm.map_height):
+        for x in range(0, mm.map_width):
+            tile = mm.get_tile(x, y)
+            image.putpixel((x,y), TERRAIN_PAL[tile.terrain_id][tile.elevation])
+    return image
+
+def fakeUnitNames(seed: int = 0) -> dict[int, dict]:
+    rng = random.Random(seed)
+    return {const: {'minimap_mode': rng.choice((0, 1, 4)), 'minimap_color': rng.choice((0, 0, rng.randrange(1, len(AOE_PAL))))}
+            for const in range(2000)}
+
+def fakeUnits(count: int, sizeMap: int, seed: int = 0) -> list[SimpleNamespace]:
+    rng = random.Random(seed)
+    return [SimpleNamespace(x=rng.uniform(0, sizeMap), y=rng.uniform(0, sizeMap),
+                            unit_const=rng.randrange(0, 2000), player=rng.randrange(0, 9))
+            for _ in range(count)]
+
+def rasterizeUnitsLegacy(units: list[SimpleNamespace], sizeMap: int, unitNames: dict[int, dict]) -> PIL.Image.Image:
+    """The per-unit putpixel loop MapView used before MapRender"""
+    image = PIL.Image.new('RGBA', (sizeMap * 2 + 1, sizeMap * 2 + 1), (0,0,0,0))
+    for unit in units:
+        if unitNames[unit.unit_const]['minimap_mode'] in [1, 4]:
+            if 0 <= unit.x < sizeMap and 0 <= unit.y < sizeMap:
+                x = int(unit.x * 2 + 0.5)
+                y = int(unit.y * 2 + 0.5)
+                if unitNames[unit.unit_const]['minimap_color'] == 0:
+                    color = (*UNIT_DOT_PAL[unit.player], 255)
+                else:
+                    color = (*ImageColor.getcolor(AOE_PAL[unitNames[unit.unit_const]['minimap_color']], "RGB"), 255)
+                image.putpixel((x,y), color)
+    return image
+
+def drawAreaLegacy(terrain: PIL.Image.Image, units: PIL.Image.Image, area: tuple[int, int, int, int]) -> PIL.Image.Image:
+    """The full copy, mask and composite MapView did for every selection change before MapCompositor"""
+    image = terrain.copy()
+    mask = PIL.Image.new('RGBA', terrain.size, (0,0,0,0))
+    PIL.ImageDraw.Draw(mask).rectangle(area, (255, 255, 0, 176))
+    image.paste(mask, mask=mask)
+    image = image.resize((image.width * 4,)*2, resample=PIL.Image.NEAREST)
+    unitLayer = units.resize((units.width * 2,)*2, resample=PIL.Image.NEAREST)
+    image.paste(unitLayer, (-1, -1), unitLayer)
+    return image
+
+def dragArea(compositor: MapCompositor, area: tuple[int, int, int, int]):
+    """Grow a selection one tile at a time, as dragging its corner does"""
+    x1, y1, x2, y2 = area
+    for step in range(8):
+        compositor.setSelection((x1, y1, x2 + step, y2 + step))
+
+def sameImage(a: PIL.Image.Image, b: PIL.Image.Image) -> bool:
+    return a.mode == b.mode and a.size == b.size and a.tobytes() == b.tobytes()
+
+def timeIt(func, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == '__main__':
+    # Layers differing from the legacy loops, the timings mean nothing then
+    mismatches = 0
+    print(f'{"size":>6} {"legacy":>10} {"numpy":>10} {"speedup":>8} {"same":>5}')
+    for size in (120, 240, 480):
+        mm = FakeMapManager(size)
+        legacy = timeIt(rasterizeTerrainLegacy, mm)
+        vectorized = timeIt(rasterizeTerrain, mm)
+        same = sameImage(rasterizeTerrainLegacy(mm), rasterizeTerrain(mm))
+        mismatches += not same
+        print(f'{size:>6} {legacy * 1000:>8.1f}ms {vectorized * 1000:>8.1f}ms {legacy / vectorized:>7.1f}x {same!s:>5}')
+
+    unitNames = fakeUnitNames()
+    palette = UnitDotPalette(unitNames, UNIT_DOT_PAL)
+    print()
+    print(f'{"units":>6} {"legacy":>10} {"numpy":>10} {"speedup":>8} {"same":>5}')
+    for count in (5000, 20000, 50000):
+        units = fakeUnits(count, 480)
+        legacy = timeIt(rasterizeUnitsLegacy, units, 480, unitNames)
+        vectorized = timeIt(rasterizeUnits, units, 480, palette)
+        same = sameImage(rasterizeUnitsLegacy(units, 480, unitNames), rasterizeUnits(units, 480, palette))
+        mismatches += not same
+        print(f'{count:>6} {legacy * 1000:>8.1f}ms {vectorized * 1000:>8.1f}ms {legacy / vectorized:>7.1f}x {same!s:>5}')
+
+    print()
+    print(f'{"size":>6} {"legacy":>10} {"dirty":>10} {"speedup":>8}')
+    for size in (120, 240, 480):
+        terrain = rasterizeTerrain(FakeMapManager(size))
+        units = rasterizeUnits(fakeUnits(size * 20, size), size, palette)
+        compositor = MapCompositor()
+        compositor.load(terrain, units)
+        area = (size // 3, size // 3, size // 2, size // 2)
+        legacy = timeIt(lambda: [drawAreaLegacy(terrain, units, (*area[:2], area[2] + step, area[3] + step))
+                                 for step in range(8)]) / 8
+        dirty = timeIt(dragArea, compositor, area) / 8
+        print(f'{size:>6} {legacy * 1000:>8.2f}ms {dirty * 1000:>8.2f}ms {legacy / dirty:>7.1f}x')
+
+    if mismatches:
+        print(f'{mismatches} layers differ from the legacy rendering')
+        sys.exit(1)
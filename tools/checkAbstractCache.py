@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import io
+import os
+import random
+import sys
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Localization import loadLocalizationDefines, loadLocalizedText
+from TriggerAbstract import ABSTRACT_CACHE, ABSTRACT_RENDERER
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
+from benchAbstract import WORK_DIR, fakeCorpus, randomValue
+
+# Every attribute an abstract could read, changed one at a time below
+ALL_ATTRIBUTES = sorted({'selected_object_ids', 'inverted',
+                         *(attr for attrs in CONDITION_ATTRIBUTES.values() for attr in attrs),
+                         *(attr for attrs in EFFECT_ATTRIBUTES.values() for attr in attrs)})
+
+def render(ce) -> tuple[str, str]:
+    """The cached abstract of ce and a fresh one"""
+    if hasattr(ce, 'condition_type'):
+        return ABSTRACT_CACHE.condition(ce), ABSTRACT_RENDERER.condition(ce)
+    return ABSTRACT_CACHE.effect(ce), ABSTRACT_RENDERER.effect(ce)
+
+def checkSelectedUnits(scenario) -> list[str]:
+    """Editing only the selected units of a Count Units into Variable effect shows"""
+    effect = scenario.trigger_manager.add_trigger('Selected units').new_effect.count_units_into_variable()
+    effect.selected_object_ids = [1, 2]
+    before = ABSTRACT_CACHE.effect(effect)
+    errors = []
+    effect.selected_object_ids = [3]
+    assigned = ABSTRACT_CACHE.effect(effect)
+    if assigned == before or assigned != ABSTRACT_RENDERER.effect(effect):
+        errors.append(f'assigned selected_object_ids: {before!r} -> {assigned!r}')
+    effect.selected_object_ids.append(4)
+    appended = ABSTRACT_CACHE.effect(effect)
+    if appended == assigned or appended != ABSTRACT_RENDERER.effect(effect):
+        errors.append(f'appended to selected_object_ids: {assigned!r} -> {appended!r}')
+    return errors
+
+def checkEveryAttribute(ces: list, seed: int = 0) -> list[str]:
+    """Change each attribute of each CE, the cache must render what the renderer does"""
+    rng = random.Random(seed)
+    errors = []
+    for ce in ces:
+        render(ce)
+        for attribute in ALL_ATTRIBUTES:
+            if not hasattr(ce, attribute):
+                continue
+            try:
+                setattr(ce, attribute, randomValue(rng, getattr(ce, attribute)))
+            except (TypeError, ValueError):
+                # Armour attack fields of some types only take values as a pair
+                continue
+            cached, fresh = render(ce)
+            if cached != fresh:
+                ceType = ce.condition_type if hasattr(ce, 'condition_type') else ce.effect_type
+                errors.append(f'type {ceType} {attribute}: cached {cached!r}, rendered {fresh!r}')
+    return errors
+
+if __name__ == '__main__':
+    loadLocalizationDefines(WORK_DIR)
+    loadLocalizedText(WORK_DIR, 'en_US')
+    ABSTRACT_RENDERER.compile()
+    scenario, ces = fakeCorpus(3000)
+    # Broken attributes are reported by print, keep the result readable
+    with redirect_stdout(io.StringIO()):
+        errors = checkSelectedUnits(scenario) + checkEveryAttribute(ces)
+    for error in errors:
+        print(error)
+    print(f'{len(ces)} CEs, {len(ALL_ATTRIBUTES)} attributes, {len(errors)} stale abstracts')
+    sys.exit(1 if errors else 0)
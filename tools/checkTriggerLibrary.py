@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AoE2ScenarioParser.datasets.conditions import ConditionId
+from AoE2ScenarioParser.datasets.effects import EffectId
+from AoE2ScenarioParser.datasets.trigger_lists import ObjectAttribute
+from AoE2ScenarioParser.scenarios.aoe2_de_scenario import AoE2DEScenario
+import AoE2ScenarioParser.settings as ASPSettings
+
+from TriggerBinary import TriggerBinaryReader, writeTriggerBinary
+from TriggerJsonSchema import TRIGGER_JSON_SCHEMA
+from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
+from benchAbstract import fakeCorpus
+
+TRIGGER_KEYS = [key for key in TRIGGER_JSON_SCHEMA['properties']['triggers']['items']['required']
+                if key not in ('conditions', 'effects')]
+
+def newCe(factory, name: str):
+    # OR / AND are keywords, ASP names them or_ / and_
+    return getattr(factory, name.lower(), None) or getattr(factory, name.lower() + '_')
+
+def asFilled(scenario: AoE2DEScenario):
+    """One trigger per CE type, made by the ASP factory with its defaults"""
+    tm = scenario.trigger_manager
+    for conditionId in ConditionId:
+        newCe(tm.add_trigger(f'Condition {conditionId.name}').new_condition, conditionId.name)()
+    for effectId in EffectId:
+        newCe(tm.add_trigger(f'Effect {effectId.name}').new_effect, effectId.name)()
+    # Armour attack attributes None and set in records of one layout
+    trigger = tm.add_trigger('Modify Attribute')
+    trigger.new_effect.modify_attribute(quantity=100, object_attributes=ObjectAttribute.HIT_POINTS)
+    trigger.new_effect.modify_attribute(object_attributes=ObjectAttribute.ARMOR,
+                                        armour_attack_quantity=2, armour_attack_class=4)
+
+def dumpTriggers(tm) -> list[dict]:
+    """What TriggerJsonIO.triggerToDict gives, without loading the window"""
+    triggers = []
+    for trigger in tm.triggers:
+        triggerDict = {key: getattr(trigger, key) for key in TRIGGER_KEYS}
+        triggerDict['conditions'] = [{'condition_type': c.condition_type,
+                                      **{attr: getattr(c, attr) for attr in CONDITION_ATTRIBUTES.get(c.condition_type, [])}}
+                                     for c in trigger.conditions]
+        triggerDict['effects'] = [{'effect_type': e.effect_type,
+                                   **{attr: getattr(e, attr) for attr in EFFECT_ATTRIBUTES.get(e.effect_type, [])}}
+                                  for e in trigger.effects]
+        triggers.append(triggerDict)
+    return triggers
+
+def roundTrip(tm) -> list[tuple[str, dict, dict]]:
+    """(trigger name, written, read) of each trigger read back different"""
+    triggers = dumpTriggers(tm)
+    fd, path = tempfile.mkstemp(suffix='.aoe2tct')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            writeTriggerBinary(fp, tm.trigger_display_order, triggers)
+        with TriggerBinaryReader(path) as reader:
+            read = [reader.triggerDict(triggerDict['trigger_id']) for triggerDict in triggers]
+    finally:
+        os.remove(path)
+    return [(written['name'], written, back) for written, back in zip(triggers, read) if written != back]
+
+def report(title: str, tm) -> int:
+    mismatches = roundTrip(tm)
+    print(f'{title}: {len(tm.triggers)} triggers, {len(mismatches)} mismatch')
+    for name, written, back in mismatches:
+        for key in ('conditions', 'effects'):
+            for ceWritten, ceBack in zip(written[key], back[key]):
+                if ceWritten != ceBack:
+                    print(f'  {name}: {ceWritten} -> {ceBack}')
+    return len(mismatches)
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    ASPSettings.PRINT_STATUS_UPDATES = False
+    scenario = AoE2DEScenario.from_default()
+    asFilled(scenario)
+    mismatches = report('ASP defaults', scenario.trigger_manager)
+    corpus, ces = fakeCorpus(10000)
+    mismatches += report('random attributes', corpus.trigger_manager)
+    sys.exit(1 if mismatches else 0)
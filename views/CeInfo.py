@@ -691,17 +691,17 @@ class CeInfoView(ttk.Frame):
                 raise ValueError(f"Unknown effect attribute: {attribute}")
 
     def updateConditionTreeNode(self, item: str, condition:Condition) -> None:
-        abstract = abstractCondition(condition)
+        abstract = ABSTRACT_CACHE.condition(condition)
         self.tl.item(item, text=' ' + abstract)
         self.app.statusBarMessage(abstract)
 
     def updateEffectTreeNode(self, item: str, effect:Effect) -> None:
-        abstract = abstractEffect(effect)
+        abstract = ABSTRACT_CACHE.effect(effect)
         self.tl.item(item, text=' ' + abstract)
         self.app.statusBarMessage(abstract)
 
     def loadConditionAttributes(self, condition: Condition):
-        abstract = abstractCondition(condition)
+        abstract = ABSTRACT_CACHE.condition(condition)
         self.wCType.variable.set(condition.condition_type)
         for attribute in CONDITION_ATTRIBUTES.get(condition.condition_type, []):
             try:
@@ -733,7 +733,7 @@ class CeInfoView(ttk.Frame):
         self.app.statusBarMessage(abstract)
 
     def loadEffectAttributes(self, effect: Effect):
-        abstract = abstractEffect(effect)
+        abstract = ABSTRACT_CACHE.effect(effect)
         self.wEType.load(effect.effect_type)
         for attribute in EFFECT_ATTRIBUTES.get(effect.effect_type, []):
             try:
@@ -6,17 +6,13 @@ from tkinter.constants import *
 import ttkbootstrap as ttk
 
 import PIL.Image
-import PIL.ImageDraw
 import PIL.ImageTk
-from PIL.Image import Resampling
-from PIL import ImageColor
 
 from AoE2ScenarioParser.objects.managers.map_manager import MapManager
 from Localization import TEXT, UNIT_NAME
-from TerrainPal import TERRAIN_PAL
-from CommonPalette import AOE_PAL
+from MapRender import ImageLruCache, MapCompositor, UnitDotPalette, rasterizeTerrain, rasterizeUnits
 from TriggerAbstract import getAreaAbstract
-from Util import IntListVar, PairValueEntry, ZoomImageViewer, fastAoERotate
+from Util import IntListVar, PairValueEntry, ZoomImageViewer, fastAoERotate, fastAoERotateBox, fastAoERotateSize
 
 if TYPE_CHECKING:
     from main import TCWindow
@@ -43,6 +39,10 @@ class MapView(ttk.Frame):
         (255, 128, 0),
     ]
 
+    RHOMBUS_CACHE_BYTES = 256 * 1024 * 1024
+    # Zoomed views larger than this are rendered around the viewport only
+    VIEWPORT_PIXELS = 4096 * 2048
+
     def __init__(self, app: TCWindow, master = None, **kwargs):
         super().__init__(master, **kwargs)
         self.app = app
@@ -52,7 +52,10 @@ class MapView(ttk.Frame):
 
         self.zvMapView = ZoomImageViewer(self,
                                         PIL.Image.new('RGB', (1,1)), bg="black",
-                                        transform=self.__rotateMap)
+                                        transform=self.__rotateMap,
+                                        region_transform=self.__rotateMapRegion,
+                                        measure=self.__rotatedMapSize,
+                                        viewport_pixels=MapView.VIEWPORT_PIXELS)
         self.zvMapView.pack(side=LEFT, fill=BOTH, expand=YES, anchor=CENTER)
         self.zvMapView.bind('<ButtonRelease-1>', lambda e: \
                             self.drawSetPoint1(
@@ -100,10 +103,19 @@ class MapView(ttk.Frame):
 
         # The top layer shows units
         self.imgUnitsDotLayer: PIL.Image.Image = None
+        # MapView is recreated on language change, so UNIT_NAME is read once per language load
+        self.unitDotPalette = UnitDotPalette(UNIT_NAME, MapView.UNIT_DOT_PAL)
 
         self.sizeMap: int = None
         self.background = self.app.style.colors.bg
 
+        # Terrain, units and the selected area at 4 pixels per tile, before rotation
+        self.compositor = MapCompositor()
+        # Rendered rhombus views by zoom, valid while no layer version changes
+        self.rhombusCache = ImageLruCache(MapView.RHOMBUS_CACHE_BYTES)
+        # Composite boxes of unit dots changed since the last refresh
+        self._unitDirty: list[tuple[int, int, int, int]] = []
+
     def modifyPoint(self):
         if not self._updatingCoords:
             x1, y1, x2, y2 = self.pointSelect.get()
@@ -187,34 +199,25 @@ class MapView(ttk.Frame):
 
     def loadMapView(self):
         self.sizeMap = self.mm.map_width
-        self.imgDotMapRaw = PIL.Image.new('RGB', (self.sizeMap,self.sizeMap))
-        for y in range(0, self.mm.map_height):
-            for x in range(0, self.mm.map_width):
-                tile = self.mm.get_tile(x, y)
-                self.imgDotMapRaw.putpixel((x,y), TERRAIN_PAL[tile.terrain_id][tile.elevation])
-        self.loadUnitLayer()
-        self.__redrawMap()
+        self.imgDotMapRaw = rasterizeTerrain(self.mm)
+        self.imgUnitsDotLayer = rasterizeUnits(self.um.get_all_units(), self.sizeMap, self.unitDotPalette)
+        self.compositor.load(self.imgDotMapRaw, self.imgUnitsDotLayer)
+        self.rhombusCache.clear()
+        # Show a coarse map at once and refine it, instead of blocking scenario loading
+        self.__redrawMap(progressive=True)
         self.zvMapView.see(*self.__inverseMapViewCoordinateConv((self.sizeMap // 2, self.sizeMap // 2)))
 
     def loadUnitLayer(self):
-        self.imgUnitsDotLayer = PIL.Image.new('RGBA', (self.sizeMap * 2 + 1, self.sizeMap * 2 + 1), (0,0,0,0))
-        for unit in self.um.get_all_units():
-            if UNIT_NAME[unit.unit_const]['minimap_mode'] in [1, 4]:
-                if 0 <= unit.x < self.sizeMap and 0 <= unit.y < self.sizeMap:
-                    x = int(unit.x * 2 + 0.5)
-                    y = int(unit.y * 2 + 0.5)
-                    if UNIT_NAME[unit.unit_const]['minimap_color'] == 0:
-                        color = (*MapView.UNIT_DOT_PAL[unit.player], 255)
-                    else:
-                        color = (*ImageColor.getcolor(
-                            AOE_PAL[UNIT_NAME[unit.unit_const]['minimap_color']],
-                            "RGB"), 255)
-                    self.imgUnitsDotLayer.putpixel((x,y), color)
+        self.imgUnitsDotLayer = rasterizeUnits(self.um.get_all_units(), self.sizeMap, self.unitDotPalette)
+        self._unitDirty += self.compositor.setUnits(self.imgUnitsDotLayer)
+        self.rhombusCache.clear()
+        self.updateUnitLayer()
 
     def updateUnitLayer(self):
         def __updateUnitLayer():
             del self._unitLayerUpdate
-            self.zvMapView.set_image(self.zvMapView.original_image)
+            dirty, self._unitDirty = self._unitDirty, []
+            self.__refreshMap(dirty)
 
         if not hasattr(self, '_unitLayerUpdate'):
             self._unitLayerUpdate = self.after(200, __updateUnitLayer)
@@ -224,18 +227,14 @@ class MapView(ttk.Frame):
             return
         dot_x = int(ux * 2 + 0.5)
         dot_y = int(uy * 2 + 0.5)
-        self.imgUnitsDotLayer.putpixel((dot_x,dot_y), (0,0,0,0))
-        for unit in self.um.get_all_units():
-            if UNIT_NAME[unit.unit_const]['minimap_mode'] in [1, 4]:
-                if 0 <= unit.x < self.sizeMap and 0 <= unit.y < self.sizeMap:
-                    if int(unit.x * 2 + 0.5) == dot_x and int(unit.y * 2 + 0.5) == dot_y:
-                        if UNIT_NAME[unit.unit_const]['minimap_color'] == 0:
-                            color = (*MapView.UNIT_DOT_PAL[unit.player], 255)
-                        else:
-                            color = (*ImageColor.getcolor(
-                                AOE_PAL[UNIT_NAME[unit.unit_const]['minimap_color']],
-                                "RGB"), 255)
-                        self.imgUnitsDotLayer.putpixel((dot_x,dot_y), color)
+        dotColor = None
+        for unit in self.app.unitIndex.spatial.queryDot(dot_x, dot_y):
+            if 0 <= unit.x < self.sizeMap and 0 <= unit.y < self.sizeMap:
+                color = self.unitDotPalette.colorOf(unit.unit_const, unit.player)
+                if color is not None:
+                    dotColor = color
+        self._unitDirty += self.compositor.setUnitDot(dot_x, dot_y, dotColor)
+        self.rhombusCache.clear()
         self.updateUnitLayer()
 
     def __mapViewCoordinateConv(self, rhombus_xy: tuple[int, int]) -> tuple[int, int]:
@@ -271,20 +270,37 @@ class MapView(ttk.Frame):
 
     def __rotateMap(self, image:PIL.Image.Image, zoom: float) -> PIL.Image.Image:
         """Transform a dot map to zoomed rhombus view"""
-        image = image.resize((image.width * 4,)*2, resample=Resampling.NEAREST)
-        unitLayer = self.imgUnitsDotLayer.resize((self.imgUnitsDotLayer.width * 2,)*2,
-                                                  resample=Resampling.NEAREST)
-        image.paste(unitLayer, (-int(1),)*2, unitLayer)
-        image = fastAoERotate(image, zoom / 4, fillcolor=self.background)
-        return image
-
-    def __redrawMap(self):
+        key = (round(zoom, 6), *self.compositor.versions)
+        rhombus = self.rhombusCache.get(key)
+        if rhombus is not None:
+            return rhombus
+        rhombus = fastAoERotate(self.compositor.image, zoom / 4, fillcolor=self.background)
+        self.rhombusCache.put(key, rhombus)
+        return rhombus
+
+    def __rotateMapRegion(self, image:PIL.Image.Image, zoom: float, box: tuple[int, int, int, int]) -> PIL.Image.Image:
+        """Transform a dot map to a region of zoomed rhombus view"""
+        return fastAoERotate(self.compositor.image, zoom / 4, fillcolor=self.background, box=box)
+
+    def __rotatedMapSize(self, image:PIL.Image.Image, zoom: float) -> tuple[int, int]:
+        return fastAoERotateSize(image.width * 4, zoom / 4)
+
+    def __redrawMap(self, progressive=False):
         self.pointSelect.set([-1,]*4)
-        imgDotBase = self.imgDotMapRaw.copy()
-        self.zvMapView.set_image(imgDotBase)
+        self.zvMapView.set_image(self.imgDotMapRaw, progressive=progressive)
+
+    def __refreshMap(self, dirty: list[tuple[int, int, int, int]]):
+        """Render the rhombus view again where composite boxes changed"""
+        if not dirty:
+            return
+        self.rhombusCache.clear()
+        scale = self.zvMapView.zoom_factor / 4
+        width = self.compositor.image.width
+        self.zvMapView.refresh([fastAoERotateBox(width, scale, box) for box in dirty])
 
     def drawClear(self) -> None:
-        self.__redrawMap()
+        self.pointSelect.set([-1,]*4)
+        self.__refreshMap(self.compositor.setSelection(None))
 
     def drawSetPoint1(self, xy: tuple[int, int], see = False, draw=True) -> None:
         xy = self.__mapLocationFix(xy)
@@ -313,12 +329,7 @@ class MapView(ttk.Frame):
                 x1, y1 = x2, y2 = coords[:2]
             else:
                 x1, y1, x2, y2 = self.getArea()
-            imgDotBase = self.imgDotMapRaw.copy()
-            imgDotMask = PIL.Image.new('RGBA', (self.sizeMap,self.sizeMap), (0,0,0,0))
-            imageDraw = PIL.ImageDraw.Draw(imgDotMask)
-            imageDraw.rectangle((x1, y1, x2, y2), (255, 255, 0, 176))
-            imgDotBase.paste(imgDotMask, mask=imgDotMask)
-            self.zvMapView.set_image(imgDotBase)
+            self.__refreshMap(self.compositor.setSelection((x1, y1, x2, y2)))
             if see:
                 self.zvMapView.see(*self.__inverseMapViewCoordinateConv(((x1 + x2) / 2, (y1 + y2) / 2)))
 
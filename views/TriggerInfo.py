@@ -7,6 +7,7 @@ import ttkbootstrap as ttk
 from AoE2ScenarioParser.objects.data_objects.trigger import Trigger
 
 from Localization import TEXT
+from TriggerAbstract import ABSTRACT_CACHE
 from Util import ReCompiled, Tooltip, ValueSelectButton
 
 if TYPE_CHECKING:
@@ -124,6 +125,8 @@ class TriggerInfoView(ttk.Frame):
             newName = self.varTName.get()
             self.tl.item(curItem, text=' ' + newName)
             trigger.name = newName
+            # (De)activate trigger CEs show the name
+            ABSTRACT_CACHE.clear()
 
     def __setTriggerEnableAndLoop(self):
         curItem = self.tl.focus()
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from tkinter.messagebox import askokcancel
-from typing import TYPE_CHECKING, Literal
-import copy
+from typing import TYPE_CHECKING, Callable, Literal
 from tkinter.constants import *
 import ttkbootstrap as ttk
 
@@ -10,33 +10,25 @@ from AoE2ScenarioParser.datasets.players import PlayerId
 from AoE2ScenarioParser.objects.data_objects.condition import Condition
 from AoE2ScenarioParser.objects.data_objects.effect import Effect
 from AoE2ScenarioParser.objects.data_objects.trigger import Trigger
-from AoE2ScenarioParser.objects.managers.trigger_manager import TriggerManager
 from AoE2ScenarioParser.objects.support.trigger_ce_lock import TriggerCELock
 
 from Localization import TEXT
 from TriggerAbstract import *
+from TriggerClone import PlayerRewritePlan, cloneCondition, cloneEffect, cloneTrigger
+from TriggerRemap import removeTriggers, sortTriggersByDisplay
 from Util import Tooltip, ValueSelectButton
-from _prebuild.CeAttributes import CONDITION_ATTRIBUTES, EFFECT_ATTRIBUTES
 
 if TYPE_CHECKING:
     from main import TCWindow
 
 def copyEffect(effect: Effect, parent: Trigger):
-    trigger = parent
-    srcEffect = copy.deepcopy(effect)
-    newEffect = trigger.new_effect.none()
-    newEffect.effect_type = srcEffect.effect_type
-    for attribute in EFFECT_ATTRIBUTES.get(srcEffect.effect_type, []):
-        setattr(newEffect, attribute, getattr(srcEffect, attribute))
+    newEffect = cloneEffect(effect, parent._uuid)
+    parent.effects.append(newEffect)
     return newEffect
 
 def copyCondition(condition: Condition, parent: Trigger):
-    trigger = parent
-    srcCondition = copy.deepcopy(condition)
-    newCondition = trigger.new_condition.none()
-    newCondition.condition_type = srcCondition.condition_type
-    for attribute in CONDITION_ATTRIBUTES.get(srcCondition.condition_type, []):
-        setattr(newCondition, attribute, getattr(srcCondition, attribute))
+    newCondition = cloneCondition(condition, parent._uuid)
+    parent.conditions.append(newCondition)
     return newCondition
 
 def reorderCEs(parent: Trigger, reorderCondition=True, reorderEffect=True) -> None:
@@ -59,35 +51,237 @@ class TriggerTreeView(ttk.Treeview):
     A Treeview holds Trigger/Condition/Effect.
 
     Trigger node is the parent of condition/effect nodes.
-    Tags hold which type the node is.
-    Values show and hold the id and display id of T/C/E.
+    Each node maps to the T/C/E object it shows, the ids are derived from the
+    objects when asked: the id from the trigger manager or the parent trigger,
+    the display id from the display order. Values show them for the nodes in
+    view only, so inserting or deleting a node never renumbers the others.
+
+    The tree is virtualized: a trigger holds a placeholder child until it is
+    opened the first time, then `loadChildren` creates its CE nodes. Pending
+    CE nodes get their text from `renderText` once they are scrolled into view.
+
+    Inside `batch()`, inserts, moves, deletes and item changes are queued and
+    applied by one Tcl call.
     """
-    def __init__(self, master=None, show=ttk.TREE, selectmode=BROWSE, columns=(0), **kwargs):
+    LAZY_TAG = 'lazy'
+    PENDING_TAG = 'pending'
+    # Item ids given to nodes inserted in a batch, Tk names its own I001...
+    BATCH_ID_PREFIX = 'B'
+    BATCH_PROC = 'TriggerTreeViewApply'
+    BATCH_SCRIPT = 'proc %s {tree ops} { foreach op $ops { $tree {*}$op } }' % BATCH_PROC
+
+    def __init__(self, master=None, show=ttk.TREE, selectmode=BROWSE, columns=(0),
+                 loadChildren: Callable[[str], None] = None, renderText: Callable[[str], str] = None,
+                 displayOrder: Callable[[], list[int]] = None, **kwargs):
         super().__init__(master, show=show, selectmode=selectmode, columns=columns, **kwargs)
+        self.loadChildren = loadChildren
+        self.renderText = renderText
+        self.displayOrder = displayOrder
+        self._renderScheduled = False
+        # Node -> the object it shows
+        self._nodes: dict[str, Trigger|Condition|Effect] = {}
+        # Node -> the ids its values show
+        self._shownIds: dict[str, tuple[int, int]] = {}
+        # Trigger id -> display id, rebuilt once found stale
+        self._displayIds: dict[int, int] = {}
+        # Queued tree commands while a batch is open, else None
+        self._batchOps: list[tuple] | None = None
+        # Node inserted in the open batch -> its parent
+        self._batchParents: dict[str, str] = {}
+        self._batchIdCount = 0
+        self._selectHeld = False
+        self._onSelect: Callable[[object], None] = None
+        self.tk.eval(TriggerTreeView.BATCH_SCRIPT)
+        # Tk focuses the item before generating the event and opening it
+        self.bind('<<TreeviewOpen>>', lambda e: self.ensureChildren(self.focus()), add='+')
+
+    def insert(self, parent, index, text, node:Trigger|Condition|Effect,
+                tceType:Literal['trigger', 'effect', 'condition']='trigger', pending=False, **kwargs):
+        if tceType == 'trigger':
+            tags = ''
+        elif pending:
+            tags = (tceType, TriggerTreeView.PENDING_TAG)
+        else:
+            tags = tceType
+        item = self.__insertItem(parent, index, text=' ' + text, values=('', ), tags=tags, **kwargs)
+        self._nodes[item] = node
+        self.renderVisibleLater()
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            self._shownIds.pop(item, None)
+            # Only trigger nodes have children
+            if type(self._nodes.pop(item, None)) != Trigger:
+                continue
+            if item in self._batchParents:
+                children = [child for child, parent in self._batchParents.items() if parent == item]
+            else:
+                children = self.get_children(item)
+            for child in children:
+                self._nodes.pop(child, None)
+                self._shownIds.pop(child, None)
+        if self._batchOps is None:
+            super().delete(*items)
+        else:
+            self._batchOps.append(('delete', items))
+        self.renderVisibleLater()
+
+    def clear(self):
+        """Delete every node"""
+        self._nodes.clear()
+        self._shownIds.clear()
+        self.delete(*self.get_children())
+
+    def move(self, item, parent, index):
+        if self._batchOps is None:
+            super().move(item, parent, index)
+        else:
+            self._batchOps.append(('move', item, parent, index))
+        self.renderVisibleLater()
+
+    def __insertItem(self, parent, index, **options) -> str:
+        if self._batchOps is None:
+            return super().insert(parent, index, **options)
+        self._batchIdCount += 1
+        item = f'{TriggerTreeView.BATCH_ID_PREFIX}{self._batchIdCount}'
+        self._batchOps.append(('insert', parent, index, '-id', item, *self.__optionWords(options)))
+        self._batchParents[item] = parent
+        return item
+
+    def __itemConfigure(self, item, **options):
+        if self._batchOps is None:
+            self.item(item, **options)
+        else:
+            self._batchOps.append(('item', item, *self.__optionWords(options)))
+
+    @staticmethod
+    def __optionWords(options: dict) -> list:
+        words = []
+        for key, value in options.items():
+            words += ('-' + key, value)
+        return words
 
-    def insert(self, parent, index, text, tceId:int, tceDisplayId:int,
-                tceType:Literal['trigger', 'effect', 'condition']='trigger', **kwargs):
-        return super().insert(parent, index, text=' ' + text,
-                                values=(f'({tceId},{tceDisplayId})', ), tags='' if tceType == 'trigger' else tceType, **kwargs)
+    @contextmanager
+    def batch(self, holdSelect=True):
+        """
+        Queue tree changes and apply them in one Tcl call on exit.
+
+        Reads inside the batch see the tree as it was when the batch opened,
+        set focus and selection after it. <<TreeviewSelect>> is held until Tk
+        has handled the events of the batch, then fires once if the selection
+        changed.
+        """
+        if self._batchOps is not None:
+            yield
+            return
+        if holdSelect and not self._selectHeld:
+            self._selectHeld = True
+            self.after_idle(self.__releaseSelect, (self.focus(), self.selection()))
+        self._batchOps = []
+        try:
+            yield
+        finally:
+            ops, self._batchOps = self._batchOps, None
+            self._batchParents.clear()
+            if ops:
+                self.tk.call(TriggerTreeView.BATCH_PROC, self._w, tuple(ops))
+
+    def bindSelect(self, callback: Callable[[object], None]):
+        """Bind <<TreeviewSelect>> to callback, held back while batches apply"""
+        self._onSelect = callback
+        self.bind('<<TreeviewSelect>>', lambda e: None if self._selectHeld else callback(e))
+
+    def __releaseSelect(self, selection: tuple):
+        # Idle callbacks run after the queued window events
+        self._selectHeld = False
+        if self._onSelect is not None and (self.focus(), self.selection()) != selection:
+            self._onSelect(None)
+
+    def insertLazyChildren(self, item:str):
+        """Give a trigger node the placeholder child, its CE nodes are created when it opens"""
+        self.__insertItem(item, END, tags=TriggerTreeView.LAZY_TAG)
+
+    def childrenLoaded(self, item:str) -> bool:
+        children = self.get_children(item)
+        return len(children) != 1 or not self.tag_has(TriggerTreeView.LAZY_TAG, children[0])
+
+    def ensureChildren(self, item:str):
+        """Create the CE nodes of a trigger node if it still holds the placeholder"""
+        if item == '' or self.childrenLoaded(item):
+            return
+        self.delete(self.get_children(item)[0])
+        self.loadChildren(item)
+        self.renderVisibleLater()
+
+    def renderVisibleLater(self):
+        """Render text of the pending nodes and ids of the nodes in view, once the tree is idle"""
+        if not self._renderScheduled:
+            self._renderScheduled = True
+            self.after_idle(self.__renderVisible)
+
+    def __renderVisible(self):
+        self._renderScheduled = False
+        with self.batch(holdSelect=False):
+            item = self.identify_row(0)
+            while item != '' and self.bbox(item) != '':
+                if item in self._nodes:
+                    ids = self.getNodeId(item)
+                    if self._shownIds.get(item) != ids:
+                        self._shownIds[item] = ids
+                        self.__itemConfigure(item, values=(f'({ids[0]},{ids[1]})', ))
+                if self.tag_has(TriggerTreeView.PENDING_TAG, item):
+                    self.__itemConfigure(item, text=' ' + self.renderText(item), tags=self.itemType(item))
+                item = self.__nextVisible(item)
+
+    def __nextVisible(self, item:str) -> str:
+        if self.tk.getboolean(self.item(item, 'open')):
+            children = self.get_children(item)
+            if children:
+                return children[0]
+        while item != '':
+            next = self.next(item)
+            if next != '':
+                return next
+            item = self.parent(item)
+        return ''
 
     def itemType(self, item:str) -> Literal['trigger', 'effect', 'condition', 'root']:
         if item == '':
             return 'root'
-        elif self.parent(item) == '':
+        node = self._nodes.get(item)
+        if type(node) == Trigger:
             return 'trigger'
-        elif 'effect' in self.item(item)['tags']:
+        elif type(node) == Effect:
             return 'effect'
-        elif 'condition' in self.item(item)['tags']:
+        elif type(node) == Condition:
             return 'condition'
         else:
             raise ValueError(f"Node {item} doesn't match any type")
 
-    def getNodeId(self, item:str) -> tuple[int, int]:
-        id, displayId = self.item(item)['values'][0][1:-1].split(',')
-        return int(id), int(displayId)
+    def getNodeObject(self, item:str) -> Trigger|Condition|Effect:
+        return self._nodes[item]
 
-    def setNodeId(self, item:str, ids:tuple[int, int]):
-        self.item(item, values=(f'({ids[0]},{ids[1]})', ))
+    def getNodeId(self, item:str) -> tuple[int, int]:
+        node = self._nodes[item]
+        if type(node) == Trigger:
+            return node.trigger_id, self.__triggerDisplayId(node.trigger_id)
+        trigger = self._nodes[self.parent(item)]
+        if type(node) == Condition:
+            id = trigger.conditions.index(node)
+            return id, trigger.condition_order.index(id)
+        else:
+            id = trigger.effects.index(node)
+            return id, trigger.effect_order.index(id)
+
+    def __triggerDisplayId(self, triggerId:int) -> int:
+        order = self.displayOrder()
+        displayId = self._displayIds.get(triggerId)
+        if displayId is None or displayId >= len(order) or order[displayId] != triggerId:
+            self._displayIds = {id: displayId for displayId, id in enumerate(order)}
+            # A trigger added in bulk joins the order after its node
+            displayId = self._displayIds.get(triggerId, -1)
+        return displayId
 
     def getTriggerNode(self, item:str) -> str:
         parent = self.parent(item)
@@ -245,10 +439,16 @@ class TriggerView(ttk.Frame):
             ## TriggerList
             lfTList = ttk.LabelFrame(self, text=TEXT['labelTriggerList'])
             lfTList.pack(fill=BOTH, expand=YES, padx=self.app.dpi((10, 5)), pady=self.app.dpi((0, 5)))
-            self.tvTriggerList = TriggerTreeView(master=lfTList, style='Borderless.Treeview')
-            self.tvTriggerList.bind('<<TreeviewSelect>>', self.app.itemSelect)
+            self.tvTriggerList = TriggerTreeView(master=lfTList, style='Borderless.Treeview',
+                                                 loadChildren=self.loadCeNodes, renderText=self.renderCeText,
+                                                 displayOrder=lambda: self.tm.trigger_display_order)
+            self.tvTriggerList.bindSelect(self.app.itemSelect)
             tvsbTriggerList = ttk.Scrollbar(master=lfTList, command=self.tvTriggerList.yview)
-            self.tvTriggerList.configure(yscrollcommand=tvsbTriggerList.set)
+            def __scrollTriggerList(first, last):
+                # Called whenever rows come into view: scroll, resize, open or insert
+                tvsbTriggerList.set(first, last)
+                self.tvTriggerList.renderVisibleLater()
+            self.tvTriggerList.configure(yscrollcommand=__scrollTriggerList)
             self.tvTriggerList.column('#0', width=self.app.dpi(200))
             self.tvTriggerList.column('#1', width=self.app.dpi(100), anchor=E, stretch=False)
             self.tvTriggerList.bind('<Control-x>', lambda *args: self.tceCopyToClipboard(cut=True))
@@ -271,40 +471,42 @@ class TriggerView(ttk.Frame):
         createTriggerList()
 
     def getTrigger(self, item:str) -> Trigger:
-        triggerNode = self.tl.getTriggerNode(item)
         if self.tl.itemType(item) == 'trigger':
-            triggerId = self.tl.getNodeId(triggerNode)[0]
-            return self.tm.get_trigger(triggerId)
+            return self.tl.getNodeObject(item)
 
     def getCondition(self, item:str) -> Condition:
         if self.tl.itemType(item) == 'condition':
-            conditionId = self.tl.getNodeId(item)[0]
-            triggerNode = self.tl.getTriggerNode(item)
-            triggerId = self.tl.getNodeId(triggerNode)[0]
-            return self.tm.get_trigger(triggerId).get_condition(conditionId)
+            return self.tl.getNodeObject(item)
 
     def getEffect(self, item:str) -> Effect:
         if self.tl.itemType(item) == 'effect':
-            effectId = self.tl.getNodeId(item)[0]
-            triggerNode = self.tl.getTriggerNode(item)
-            triggerId = self.tl.getNodeId(triggerNode)[0]
-            return self.tm.get_trigger(triggerId).get_effect(effectId)
+            return self.tl.getNodeObject(item)
 
     def loadTrigger(self):
-        for item in self.tl.get_children():
-            self.tl.delete(item)
-        for displayId, id in enumerate(self.tm.trigger_display_order):
-            trigger = self.tm.get_trigger(id)
-            triggerImage = self.app.getTriggerIcon(trigger)
-            itemTrigger = self.tl.insert("", END, text=trigger.name, tceId=id, tceDisplayId=displayId, image=triggerImage)
-            for cDisplayId, cId in enumerate(trigger.condition_order):
-                condition = trigger.conditions[cId]
-                itemCE = self.tl.insert(itemTrigger, END, text=abstractCondition(condition),
-                                                   tceId=cId, tceDisplayId=cDisplayId, image=self.app.imgConditionEnabled, tceType='condition')
-            for eDisplayId, eId in enumerate(trigger.effect_order):
-                effect = trigger.effects[eId]
-                itemCE = self.tl.insert(itemTrigger, END, text=abstractEffect(effect),
-                                                   tceId=eId, tceDisplayId=eDisplayId, image=self.app.imgEffectEnabled, tceType='effect')
+        with self.tl.batch():
+            self.tl.clear()
+            for id in self.tm.trigger_display_order:
+                trigger = self.tm.get_trigger(id)
+                triggerImage = self.app.getTriggerIcon(trigger)
+                itemTrigger = self.tl.insert("", END, text=trigger.name, node=trigger, image=triggerImage)
+                if len(trigger.conditions) + len(trigger.effects) > 0:
+                    self.tl.insertLazyChildren(itemTrigger)
+
+    def loadCeNodes(self, itemTrigger:str):
+        """Create the CE nodes of a trigger node, their text is rendered when they come into view"""
+        trigger = self.tl.getNodeObject(itemTrigger)
+        for cId in trigger.condition_order:
+            self.tl.insert(itemTrigger, END, text='', node=trigger.conditions[cId],
+                           image=self.app.imgConditionEnabled, tceType='condition', pending=True)
+        for eId in trigger.effect_order:
+            self.tl.insert(itemTrigger, END, text='', node=trigger.effects[eId],
+                           image=self.app.imgEffectEnabled, tceType='effect', pending=True)
+
+    def renderCeText(self, item:str) -> str:
+        if self.tl.itemType(item) == 'condition':
+            return ABSTRACT_CACHE.condition(self.getCondition(item))
+        else:
+            return ABSTRACT_CACHE.effect(self.getEffect(item))
 
     # region TriggerViewOperation
 
@@ -314,19 +516,19 @@ class TriggerView(ttk.Frame):
             case 'trigger':
                 triggerId = self.tl.getNodeId(curItem)[0]
                 trigger = self.tm.get_trigger(triggerId)
-                self.tceClipboard = copy.deepcopy(trigger)
+                self.tceClipboard = cloneTrigger(trigger)
             case 'condition':
                 parent = self.tl.getTriggerNode(curItem)
                 triggerId = self.tl.getNodeId(parent)[0]
                 trigger = self.tm.get_trigger(triggerId)
                 ceId, _ = self.tl.getNodeId(curItem)
-                self.tceClipboard = copy.deepcopy(trigger.conditions[ceId])
+                self.tceClipboard = cloneCondition(trigger.conditions[ceId])
             case 'effect':
                 parent = self.tl.getTriggerNode(curItem)
                 triggerId = self.tl.getNodeId(parent)[0]
                 trigger = self.tm.get_trigger(triggerId)
                 ceId, _ = self.tl.getNodeId(curItem)
-                self.tceClipboard = copy.deepcopy(trigger.effects[ceId])
+                self.tceClipboard = cloneEffect(trigger.effects[ceId])
             case _:
                 return
         if cut:
@@ -343,7 +545,7 @@ class TriggerView(ttk.Frame):
                 curItem = self.tl.getTriggerNode(curItem)
                 _, insertIndex = self.tl.getNodeId(curItem)
                 insertIndex += 1
-            newTrigger = copy.deepcopy(self.tceClipboard)
+            newTrigger = cloneTrigger(self.tceClipboard, self.tm._uuid)
             newTrigger.trigger_id = len(self.tm.triggers)
             self.tm.triggers.append(newTrigger)
             self.tm.trigger_display_order.insert(insertIndex + 1, self.tm.trigger_display_order.pop())
@@ -352,6 +554,8 @@ class TriggerView(ttk.Frame):
             if curItem == '':
                 return
             parent = self.tl.getTriggerNode(curItem)
+            # Before the new CE joins the trigger, ceAdd inserts its node
+            self.tl.ensureChildren(parent)
             triggerId = self.tl.getNodeId(parent)[0]
             trigger = self.tm.get_trigger(triggerId)
             if type(self.tceClipboard) == Condition:
@@ -394,32 +598,16 @@ class TriggerView(ttk.Frame):
         if not self.tl.bbox(self.tl.next(curItem)):
             self.tl.see(self.tl.next(curItem))
 
-    def triggerNewAfter(self, afterIndex, trigger:Trigger, ignoreIndex=False):
-        idNewTrigger = len(self.tl.get_children(""))
+    def triggerNewAfter(self, afterIndex, trigger:Trigger, select=True) -> str:
         triggerImage = self.app.getTriggerIcon(trigger)
-        if ignoreIndex == False:
-            itemTrigger = self.tl.insert("", afterIndex + 1, text=trigger.name,
-                                                    tceId=idNewTrigger, tceDisplayId=afterIndex + 1, image=triggerImage)
-        else:
-            itemTrigger = self.tl.insert("", afterIndex + 1, text=trigger.name,
-                                                    tceId=-1, tceDisplayId=-1, image=triggerImage)
-        if ignoreIndex == False:
-            next = self.tl.next(itemTrigger)
-            while next != '':
-                id, displayId = self.tl.getNodeId(next)
-                self.tl.setNodeId(next, (id, displayId + 1))
-                next = self.tl.next(next)
+        itemTrigger = self.tl.insert("", afterIndex + 1, text=trigger.name, node=trigger, image=triggerImage)
+        if select:
             self.tl.focus(itemTrigger)
             self.tl.selection_set(itemTrigger)
 
-        for cDisplayId, cId in enumerate(trigger.condition_order):
-            condition = trigger.conditions[cId]
-            itemCE = self.tl.insert(itemTrigger, END, text=abstractCondition(condition),
-                                               tceId=cId, tceDisplayId=cDisplayId, image=self.app.imgConditionEnabled, tceType='condition')
-        for eDisplayId, eId in enumerate(trigger.effect_order):
-            effect = trigger.effects[eId]
-            itemCE = self.tl.insert(itemTrigger, END, text=abstractEffect(effect),
-                                               tceId=eId, tceDisplayId=eDisplayId, image=self.app.imgEffectEnabled, tceType='effect')
+        if len(trigger.conditions) + len(trigger.effects) > 0:
+            self.tl.insertLazyChildren(itemTrigger)
+        return itemTrigger
 
     def ceAdd(self, parent: str, tag: str, obj: Effect|Condition, insertIndex:int=None):
         self.tl.item(parent, open=True)
@@ -435,24 +623,15 @@ class TriggerView(ttk.Frame):
             itemIndex = effectBeginIndex + insertIndex
             if itemIndex > effectEndIndex:
                 raise ValueError('Insert index out of range')
-            ceIndex = effectEndIndex - effectBeginIndex
-            ceName = abstractEffect(obj)
+            ceName = ABSTRACT_CACHE.effect(obj)
             ceImage = self.app.imgEffectEnabled
         else:
             itemIndex = insertIndex
             if itemIndex > effectBeginIndex:
                 raise ValueError('Insert index out of range')
-            ceIndex = effectBeginIndex
-            ceName = abstractCondition(obj)
+            ceName = ABSTRACT_CACHE.condition(obj)
             ceImage = self.app.imgConditionEnabled
-        itemCE = self.tl.insert(parent, itemIndex, text=ceName,
-                                           tceId=ceIndex,tceDisplayId=insertIndex, image=ceImage, tceType=tag)
-
-        next = self.tl.next(itemCE)
-        while next != '' and self.tl.itemType(next) == tag:
-            id, displayId = self.tl.getNodeId(next)
-            self.tl.setNodeId(next, (id, displayId + 1))
-            next = self.tl.next(next)
+        itemCE = self.tl.insert(parent, itemIndex, text=ceName, node=obj, image=ceImage, tceType=tag)
 
         # See if out of sight
         if not self.tl.bbox(itemCE):
@@ -465,6 +644,8 @@ class TriggerView(ttk.Frame):
         if curItem == '':
             return
         parent = self.tl.getTriggerNode(curItem)
+        # Before the new CE joins the trigger, ceAdd inserts its node
+        self.tl.ensureChildren(parent)
         triggerId = self.tl.getNodeId(parent)[0]
         trigger = self.tm.get_trigger(triggerId)
 
@@ -484,6 +665,8 @@ class TriggerView(ttk.Frame):
         if curItem == '':
             return
         parent = self.tl.getTriggerNode(curItem)
+        # Before the new CE joins the trigger, ceAdd inserts its node
+        self.tl.ensureChildren(parent)
         triggerId = self.tl.getNodeId(parent)[0]
         trigger = self.tm.get_trigger(triggerId)
 
@@ -505,57 +688,21 @@ class TriggerView(ttk.Frame):
         nodeType = self.tl.itemType(curItem)
         parent = self.tl.getTriggerNode(curItem)
         triggerId = self.tl.getNodeId(parent)[0]
-        idToDelete, displayIdToDelete = self.tl.getNodeId(curItem)
+        idToDelete, _ = self.tl.getNodeId(curItem)
         nextSelection = self.tl.next(curItem)
         if nextSelection == '':
             nextSelection = self.tl.prev(curItem)
         if nodeType == 'trigger':
-            # itemIterator = self.tl.
-            for child in self.tl.get_children(''):
-                if child == '':
-                    break
-                elif child == curItem:
-                    continue
-                else:
-                    id, displayId = self.tl.getNodeId(child)
-                    if id > idToDelete:
-                        id -= 1
-                    if displayId > displayIdToDelete:
-                        displayId -= 1
-                    self.tl.setNodeId(child, (id, displayId))
-
             # Call AoE2SP
             self.tm.remove_trigger(idToDelete)
             # print(self.tm.trigger_display_order)
 
         elif nodeType == 'condition':
-            for child in self.tl.get_children(parent):
-                if self.tl.itemType(child) == 'condition':
-                    if child == curItem:
-                        continue
-                    else:
-                        id, displayId = self.tl.getNodeId(child)
-                        if id > idToDelete:
-                            id -= 1
-                        if displayId > displayIdToDelete:
-                            displayId -= 1
-                        self.tl.setNodeId(child, (id, displayId))
             # Call AoE2SP
             self.tm.get_trigger(triggerId).remove_condition(idToDelete)
             # Need call this property to update order (ASP 0.4.7)
             self.tm.get_trigger(triggerId).condition_order
         else:
-            for child in self.tl.get_children(parent):
-                if self.tl.itemType(child) == 'effect':
-                    if child == curItem:
-                        continue
-                    else:
-                        id, displayId = self.tl.getNodeId(child)
-                        if id > idToDelete:
-                            id -= 1
-                        if displayId > displayIdToDelete:
-                            displayId -= 1
-                        self.tl.setNodeId(child, (id, displayId))
             # Call AoE2SP
             self.tm.get_trigger(triggerId).remove_effect(idToDelete)
             # Need call this property to update order (ASP 0.4.7)
@@ -580,8 +727,6 @@ class TriggerView(ttk.Frame):
             if prevDisplayId + 1 == displayId:
                 self.tl.move(curItem, self.tl.parent(curItem), self.tl.index(prev))
                 displayId, prevDisplayId = prevDisplayId, displayId
-                self.tl.setNodeId(curItem, (id, displayId))
-                self.tl.setNodeId(prev, (prevId, prevDisplayId))
                 if self.tl.itemType(curItem) == 'trigger':
                     # Call AoE2SP
                     self.tm.trigger_display_order[prevDisplayId], self.tm.trigger_display_order[displayId]\
@@ -613,8 +758,6 @@ class TriggerView(ttk.Frame):
             if displayId + 1 == nextDisplayId:
                 self.tl.move(curItem, self.tl.parent(curItem), self.tl.index(next))
                 displayId, nextDisplayId = nextDisplayId, displayId
-                self.tl.setNodeId(curItem, (id, displayId))
-                self.tl.setNodeId(next, (nextId, nextDisplayId))
                 if self.tl.itemType(curItem) == 'trigger':
                     # Call AoE2SP
                     self.tm.trigger_display_order[nextDisplayId], self.tm.trigger_display_order[displayId]\
@@ -679,34 +822,10 @@ class TriggerView(ttk.Frame):
         playerCount = self.app.activeScenario.player_manager.active_players
         create_copy_for_players = list(range(1, playerCount+1))
         if nodeType == 'trigger':
-            trigger = self.tm.get_trigger(idToDuplicate)
-            if self.app.options.addDuplicateMark.get():
-                if trigger.description.endswith('<Copy>'):
-                    return
-                if trigger.description.endswith('<Original>'):
-                    trigger.description = trigger.description[:-len('<Original>')]
-            newTriggers = self.copyTriggerPerPlayer(PlayerId.ONE, trigger,
-                                                    change_from_player_only = self.app.options.changeFromPlayerOnly.get(),
-                                                    include_player_source = self.app.options.includeSource.get(),
-                                                    include_player_target = self.app.options.includeTarget.get(),
-                                                    create_copy_for_players = create_copy_for_players,
-                                                    name_fix_format = self.app.options.nameFixFormat.get(),
-                                                    name_gaia_fix = self.app.options.nameGaiaFix.get())
-            if self.app.options.addDuplicateMark.get():
-                if not trigger.description.endswith('<Original>'):
-                    trigger.description += '<Original>'
-            newTriggerCount = len(newTriggers)
-            self.tm.trigger_display_order = \
-                self.tm.trigger_display_order[0 : displayIdToDuplicate + 1] + \
-                self.tm.trigger_display_order[-newTriggerCount:] + \
-                self.tm.trigger_display_order[displayIdToDuplicate + 1 : -newTriggerCount]
-            afterIndex = displayIdToDuplicate
-            for newTrigger in newTriggers.values():
-                if self.app.options.addDuplicateMark.get():
-                    newTrigger.description += '<Copy>'
-                self.triggerNewAfter(afterIndex, newTrigger)
-                afterIndex += 1
-            
+            changes = self.duplicateTriggersPerPlayer(displayIdToDuplicate, displayIdToDuplicate + 1, create_copy_for_players)
+            if len(changes) == 0:
+                return
+            self.triggerInsertCopies(changes, select=True)
         elif nodeType == 'condition':
             trigger = self.tm.get_trigger(triggerId)
             condition = trigger.conditions[idToDuplicate]
@@ -817,9 +936,18 @@ class TriggerView(ttk.Frame):
                 if check is False:
                     if not askokcancel(TEXT['messageTitleWarning'], TEXT['messageWarningDeduplicateNotMatch'], icon='warning'):
                         return
-        self.tl.focus(next)
-        for i in range(1, playerCount):
-            self.itemDelete()
+        if nodeType == 'trigger':
+            items = self.tl.get_children('')
+            nextSelection = items[displayId + playerCount] if displayId + playerCount < len(items) else curItem
+            removeTriggers(self.tm, self.tm.trigger_display_order[displayId + 1 : displayId + playerCount])
+            with self.tl.batch():
+                self.tl.delete(*items[displayId + 1 : displayId + playerCount])
+            self.tl.focus(nextSelection)
+            self.tl.selection_set(nextSelection)
+        else:
+            self.tl.focus(next)
+            for i in range(1, playerCount):
+                self.itemDelete()
         # See if out of sight
         if not self.tl.bbox(curItem):
             self.tl.see(curItem)
@@ -827,12 +955,12 @@ class TriggerView(ttk.Frame):
     def __copyTriggerFast(self, trigger: Trigger) -> Trigger:
         """Call trigger reference directly for boost, than the same method in ASP"""
 
-        deepcopy_trigger = copy.deepcopy(trigger)
-        deepcopy_trigger.trigger_id = len(self.tm.triggers)
+        clone_trigger = cloneTrigger(trigger)
+        clone_trigger.trigger_id = len(self.tm.triggers)
 
-        self.tm.triggers.append(deepcopy_trigger)
+        self.tm.triggers.append(clone_trigger)
 
-        return deepcopy_trigger
+        return clone_trigger
 
     def copyTriggerPerPlayer(
             self,
@@ -845,7 +973,8 @@ class TriggerView(ttk.Frame):
             include_gaia: bool = False,
             create_copy_for_players: list[int] = None,
             name_fix_format: str = "(p{0})",
-            name_gaia_fix: str = "(GAIA)"
+            name_gaia_fix: str = "(GAIA)",
+            append: bool = True
     ) -> dict[PlayerId, Trigger]:
         """
         Copies a trigger for all or a selection of players. Every copy will change desired player attributes with it.
@@ -868,6 +997,7 @@ class TriggerView(ttk.Frame):
                 defined)
             create_copy_for_players: A list of Players to create a copy for. The `from_player` will be
                 excluded from this list.
+            append: If set to `False`, the copies are not added to the trigger manager and have no ID yet.
 
         Returns:
             A dict with all the new created triggers. The key is the player for which the trigger is
@@ -886,41 +1016,19 @@ class TriggerView(ttk.Frame):
         if include_gaia and PlayerId.GAIA not in create_copy_for_players:
             create_copy_for_players.append(PlayerId.GAIA)
 
-        alter_conditions, alter_effects = TriggerManager._find_alterable_ce(trigger, trigger_ce_lock)
+        plan = PlayerRewritePlan.of(trigger, from_player, change_from_player_only,
+                                    include_player_source, include_player_target, trigger_ce_lock)
 
         return_dict: dict[PlayerId, Trigger] = {}
         for player in create_copy_for_players:
             if player == from_player:
                 continue
 
-            new_trigger = self.__copyTriggerFast(trigger)
+            new_trigger = self.__copyTriggerFast(trigger) if append else cloneTrigger(trigger)
             # new_trigger = self.tm.copy_trigger(TriggerSelect.trigger(trigger), append_after_source=False, add_suffix=False)
             new_trigger.name += " " + (name_gaia_fix if player == PlayerId.GAIA else name_fix_format.format(player))
             return_dict[player] = new_trigger
-
-            for cond_x in alter_conditions:
-                cond:Condition = new_trigger.conditions[cond_x]
-                if cond.source_player == -1 and cond.target_player == -1:
-                    continue
-
-                if include_player_source:
-                    if not change_from_player_only or (change_from_player_only and cond.source_player == from_player):
-                        cond.source_player = PlayerId(player)
-                if include_player_target:
-                    if not change_from_player_only or (change_from_player_only and cond.target_player == from_player):
-                        cond.target_player = PlayerId(player)
-
-            for effect_x in alter_effects:
-                effect:Effect = new_trigger.effects[effect_x]
-                if effect.source_player == -1 and effect.target_player == -1:
-                    continue
-
-                if include_player_source:
-                    if not change_from_player_only or (change_from_player_only and effect.source_player == from_player):
-                        effect.source_player = PlayerId(player)
-                if include_player_target:
-                    if not change_from_player_only or (change_from_player_only and effect.target_player == from_player):
-                        effect.target_player = PlayerId(player)
+            plan.apply(new_trigger, player)
 
         return return_dict
 
@@ -1002,6 +1110,74 @@ class TriggerView(ttk.Frame):
             target = None
         return begin, end, target
 
+    def duplicateTriggersPerPlayer(self, displayIdBegin: int, displayIdEnd: int,
+                                   create_copy_for_players: list[int]) -> list[tuple[int, list[Trigger]]]:
+        """
+        Copy the triggers in a display range for players, all in one pass.
+
+        Copies get contiguous IDs after the existing triggers and follow their
+        source in the display order, which is built once. Returns the display
+        ID of each copied source with its copies, in display order.
+        """
+        addMark = self.app.options.addDuplicateMark.get()
+        copyOptions = dict(change_from_player_only = self.app.options.changeFromPlayerOnly.get(),
+                           include_player_source = self.app.options.includeSource.get(),
+                           include_player_target = self.app.options.includeTarget.get(),
+                           create_copy_for_players = create_copy_for_players,
+                           name_fix_format = self.app.options.nameFixFormat.get(),
+                           name_gaia_fix = self.app.options.nameGaiaFix.get(),
+                           append = False)
+        displayOrder = self.tm.trigger_display_order
+        newTriggerId = len(self.tm.triggers)
+        newTriggers: list[Trigger] = []
+        newOrder = displayOrder[0 : displayIdBegin]
+        changes = []
+        for displayId in range(displayIdBegin, displayIdEnd):
+            id = displayOrder[displayId]
+            trigger = self.tm.triggers[id]
+            newOrder.append(id)
+            if addMark:
+                if trigger.description.endswith('<Copy>'):
+                    continue
+                if trigger.description.endswith('<Original>'):
+                    trigger.description = trigger.description[:-len('<Original>')]
+            copies = list(self.copyTriggerPerPlayer(PlayerId.ONE, trigger, **copyOptions).values())
+            if addMark:
+                trigger.description += '<Original>'
+            for newTrigger in copies:
+                if addMark:
+                    newTrigger.description += '<Copy>'
+                newTrigger.trigger_id = newTriggerId
+                newOrder.append(newTriggerId)
+                newTriggerId += 1
+            newTriggers += copies
+            changes.append((displayId, copies))
+        newOrder += displayOrder[displayIdEnd:]
+
+        self.tm.triggers.extend(newTriggers)
+        self.tm.trigger_display_order = newOrder
+        return changes
+
+    def triggerInsertCopies(self, changes: list[tuple[int, list[Trigger]]], select=False):
+        """
+        Insert nodes of the copies from duplicateTriggersPerPlayer, display IDs are the ones before copying.
+
+        With select, the last copy is focused and selected as inserting them one by one did.
+        """
+        inserted = 0
+        lastItem = None
+        with self.tl.batch():
+            for displayId, copies in changes:
+                afterIndex = displayId + inserted
+                for newTrigger in copies:
+                    lastItem = self.triggerNewAfter(afterIndex, newTrigger, select=False)
+                    afterIndex += 1
+                inserted += len(copies)
+        # Batch nodes keep their IDs, focus them once they exist
+        if select and lastItem is not None:
+            self.tl.focus(lastItem)
+            self.tl.selection_set(lastItem)
+
     def triggerDuplicateMultiple(self):
         valueRange = self.getRangeValue()
         if type(valueRange) == str:
@@ -1009,50 +1185,10 @@ class TriggerView(ttk.Frame):
             return
         displayIdBegin, displayIdEnd, displayIdTarget = valueRange
 
-        toDuplicateTriggersIdList = self.tm.trigger_display_order[displayIdBegin: displayIdEnd]
-        newTriggerOrder = self.tm.trigger_display_order[0: displayIdBegin]
-        newTriggerOrderTail = self.tm.trigger_display_order[displayIdEnd:]
         playerCount = self.app.activeScenario.player_manager.active_players
         create_copy_for_players = list(range(1, playerCount+1))
-        for id in toDuplicateTriggersIdList:
-            # Duplicate trigger
-            trigger = self.tm.get_trigger(id)
-            if self.app.options.addDuplicateMark.get():
-                if trigger.description.endswith('<Copy>'):
-                    continue
-                if trigger.description.endswith('<Original>'):
-                    trigger.description = trigger.description[:-len('<Original>')]
-            newTriggers = self.copyTriggerPerPlayer(PlayerId.ONE, trigger,
-                                                    change_from_player_only = self.app.options.changeFromPlayerOnly.get(),
-                                                    include_player_source = self.app.options.includeSource.get(),
-                                                    include_player_target = self.app.options.includeTarget.get(),
-                                                    create_copy_for_players = create_copy_for_players,
-                                                    name_fix_format = self.app.options.nameFixFormat.get(),
-                                                    name_gaia_fix = self.app.options.nameGaiaFix.get())
-            if self.app.options.addDuplicateMark.get():
-                if not trigger.description.endswith('<Original>'):
-                    trigger.description += '<Original>'
-            newTriggerCount = len(newTriggers)
-            newTriggerOrder.append(id)
-            afterIndex = len(newTriggerOrder) - 1
-            newTriggerOrder += self.tm.trigger_display_order[-newTriggerCount:]
-            # Add nodes
-            for newTrigger in newTriggers.values():
-                if self.app.options.addDuplicateMark.get():
-                    newTrigger.description += '<Copy>'
-                self.triggerNewAfter(afterIndex, newTrigger, ignoreIndex=True)
-                afterIndex += 1
-
-        newTriggerOrder += newTriggerOrderTail
-        self.tm.trigger_display_order = newTriggerOrder
-        # Update IDs
-        for displayId, child in enumerate(self.tl.get_children('')):
-            if child == '':
-                break
-            else:
-                self.tl.setNodeId(child, (self.tm.trigger_display_order[displayId], displayId))
-        # self.tl.focus(self.tl.get_children("")[displayIdBegin])
-        # self.tl.selection_set(next)
+        changes = self.duplicateTriggersPerPlayer(displayIdBegin, displayIdEnd, create_copy_for_players)
+        self.triggerInsertCopies(changes)
         self.clearRangeValue()
         self.app.statusBarMessage(TEXT['noticeDuplicateCompleted'])
 
@@ -1081,24 +1217,18 @@ class TriggerView(ttk.Frame):
             self.app.statusBarMessage(TEXT['noticeFormatValueRangeInvalid'].format(TEXT['noticeValueRangeErrMsgMustBeMultiple']))
             return
 
-        itemTrigger = self.tl.get_children("")[displayIdBegin]
+        items = self.tl.get_children("")
+        next = items[displayIdEnd] if displayIdEnd < len(items) else ''
         toRemoveTriggersIdList = [self.tm.trigger_display_order[i] \
                                 for i in range(displayIdBegin, displayIdEnd) \
                                 if (i - displayIdBegin) % playerCount != 0]
         # Delete nodes
-        for i in range(displayIdBegin, displayIdEnd):
-            next = self.tl.next(itemTrigger)
-            if (i - displayIdBegin) % playerCount != 0:
-                self.tl.delete(itemTrigger)
-            itemTrigger = next
+        with self.tl.batch():
+            self.tl.delete(*[items[i] for i in range(displayIdBegin, displayIdEnd) if (i - displayIdBegin) % playerCount != 0])
         # Delete triggers
-        self.tm.remove_triggers(toRemoveTriggersIdList)
-        # Update IDs
-        for displayId, child in enumerate(self.tl.get_children('')):
-            if child == '':
-                break
-            else:
-                self.tl.setNodeId(child, (self.tm.trigger_display_order[displayId], displayId))
+        removeTriggers(self.tm, toRemoveTriggersIdList)
+        # Trigger ids are remapped
+        self.tl.renderVisibleLater()
         self.tl.focus(next)
         self.tl.selection_set(next)
         self.clearRangeValue()
@@ -1111,21 +1241,16 @@ class TriggerView(ttk.Frame):
             return
         displayIdBegin, displayIdEnd, displayIdTarget = valueRange
 
-        itemTrigger = self.tl.get_children("")[displayIdBegin]
+        items = self.tl.get_children("")
+        next = items[displayIdEnd] if displayIdEnd < len(items) else ''
         toRemoveTriggersIdList = self.tm.trigger_display_order[displayIdBegin: displayIdEnd]
         # Delete nodes
-        for i in range(displayIdBegin, displayIdEnd):
-            next = self.tl.next(itemTrigger)
-            self.tl.delete(itemTrigger)
-            itemTrigger = next
+        with self.tl.batch():
+            self.tl.delete(*items[displayIdBegin : displayIdEnd])
         # Delete triggers
-        self.tm.remove_triggers(toRemoveTriggersIdList)
-        # Update IDs
-        for displayId, child in enumerate(self.tl.get_children('')):
-            if child == '':
-                break
-            else:
-                self.tl.setNodeId(child, (self.tm.trigger_display_order[displayId], displayId))
+        removeTriggers(self.tm, toRemoveTriggersIdList)
+        # Trigger ids are remapped
+        self.tl.renderVisibleLater()
         self.tl.focus(next)
         self.tl.selection_set(next)
         self.clearRangeValue()
@@ -1148,21 +1273,11 @@ class TriggerView(ttk.Frame):
 
         if displayIdTarget > displayIdEnd:
             displayIdBegin, displayIdEnd, displayIdTarget = displayIdEnd, displayIdTarget, displayIdBegin
-        # Fix displayID between target and begin
-        itemFix = self.tl.get_children("")[displayIdTarget]
-        for i in range(displayIdTarget, displayIdBegin):
-            nextFix = self.tl.next(itemFix)
-            id, dId = self.tl.getNodeId(itemFix)
-            self.tl.setNodeId(itemFix, (id, dId + (displayIdEnd - displayIdBegin)))
-            itemFix = nextFix
-        # Move and fix displayID
-        itemMove = self.tl.get_children("")[displayIdEnd-1]
-        for i in range(displayIdEnd-1, displayIdBegin-1, -1):
-            nextMove = self.tl.prev(itemMove)
-            id, dId = self.tl.getNodeId(itemMove)
-            self.tl.move(itemMove, '', displayIdTarget)
-            self.tl.setNodeId(itemMove, (id, dId - (displayIdBegin - displayIdTarget)))
-            itemMove = nextMove
+        # Move nodes
+        items = self.tl.get_children("")
+        with self.tl.batch():
+            for i in range(displayIdEnd-1, displayIdBegin-1, -1):
+                self.tl.move(items[i], '', displayIdTarget)
         # Move scen display order
         self.tm.trigger_display_order = \
             self.tm.trigger_display_order[0 : displayIdTarget] + \
@@ -1173,33 +1288,16 @@ class TriggerView(ttk.Frame):
     def itemSortByDisplay(self):
         if len(self.tm.triggers) == 0:
             return
-        self.tm.reorder_triggers(self.tm.trigger_display_order)
-        # Update IDs
-        for displayId, child in enumerate(self.tl.get_children('')):
-            if child == '':
-                break
-            else:
-                self.tl.setNodeId(child, (self.tm.trigger_display_order[displayId], displayId))
+        sortTriggersByDisplay(self.tm)
+        # Trigger ids are remapped
+        self.tl.renderVisibleLater()
         self.app.statusBarMessage(TEXT['noticeSortCompleted'])
 
     def itemSortCeByDisplay(self):
         for trigger in self.tm.triggers:
             reorderCEs(trigger, True, True)
-        # Update IDs
-        for displayId, child in enumerate(self.tl.get_children('')):
-            if child == '':
-                break
-            else:
-                triggerId = self.tm.trigger_display_order[displayId]
-                trigger = self.tm.get_trigger(triggerId)
-                conditionAmount = len(trigger.conditions)
-                for ceDisplayId, ceChild in enumerate(self.tl.get_children(child)):
-                    if ceDisplayId < conditionAmount:
-                        cDId = ceDisplayId
-                        self.tl.setNodeId(ceChild, (trigger.condition_order[cDId], cDId))
-                    else:
-                        eDId = ceDisplayId - conditionAmount
-                        self.tl.setNodeId(ceChild, (trigger.effect_order[eDId], eDId))
+        # CE ids are remapped
+        self.tl.renderVisibleLater()
 
         self.app.statusBarMessage(TEXT['noticeSortCompleted'])
 
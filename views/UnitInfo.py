@@ -180,6 +180,7 @@ class UnitInfoView(ttk.Frame):
                     if attribute in ['x', 'y']:
                         old_x, old_y = unit.x, unit.y
                         setattr(unit, attribute, floatValue)
+                        self.outer.unitIndex.move(unit, old_x, old_y)
                         self.outer.fMapViewTab.updateUnitLayerDot(old_x, old_y)
                         self.outer.fMapViewTab.updateUnitLayerDot(unit.x, unit.y)
                     else:
@@ -189,8 +190,8 @@ class UnitInfoView(ttk.Frame):
         if self.unitFocus is not None:
             unit = self.unitFocus.getUnit(self.um)
             unit.player = self.varUPlayer.get()
-            newIndex = self.um.units[unit.player].index(unit)
-            self.unitFocus = UnitKey(unit.player, newIndex)
+            self.app.unitIndex.changePlayer(unit, self.unitFocus.player, self.unitFocus.index)
+            self.unitFocus = UnitKey.fromTuple(self.app.unitIndex.keyOf(unit))
             self.app.fMapViewTab.updateUnitLayerDot(unit.x, unit.y)
 
     def __modifyUnitGarrison(self, garrison: int):
@@ -216,7 +217,9 @@ class UnitInfoView(ttk.Frame):
         print(f'modifyReferenceId = {intValue}')
         if self.unitFocus is not None:
             unit = self.unitFocus.getUnit(self.um)
+            oldRefId = unit.reference_id
             unit.reference_id = intValue
+            self.app.unitIndex.changeReferenceId(unit, oldRefId)
             for item in self.ul.get_children(""):
                 if self.ul.getNodeUnitKey(item) == self.unitFocus:
                     self.ul.setNodeRefId(item, unit.reference_id)
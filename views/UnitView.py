@@ -141,14 +141,13 @@ class UnitView(ttk.Frame):
 
     def getUnitById(self, id, firstSearchPlayer=0) -> Unit:
         """Get Unit object by reference_id, search every player to find the unit."""
+        keys = [key for key in self.app.unitIndex.refIds.query((id, ))
+                if key[0] <= self.pm.active_players]
+        if not keys:
+            return None
         # Search from selected player first
-        playerList = [firstSearchPlayer, ] + \
-            [i for i in range(0, self.pm.active_players + 1) if i != firstSearchPlayer]
-        for p in playerList:
-            unit = next((i for i in self.um.units[p] if i.reference_id == id), None)
-            if unit != None:
-                break
-        return unit
+        player, index = next((key for key in keys if key[0] == firstSearchPlayer), keys[0])
+        return self.um.units[player][index]
 
     def __selectUnit(self, e):
         key = self.tvUnitList.getUnitFocusKey()
@@ -173,12 +172,14 @@ class UnitView(ttk.Frame):
             playerList = [p for p in range(0, self.pm.active_players + 1)]
         else:
             return
-        for player in playerList:
-            for listId, unit in enumerate(self.um.units[player]):
-                if areaFilter:
-                    if unit.x >= x1 and unit.x < x2 and unit.y >= y1 and unit.y < y2:
-                        self.tvUnitList.insert('', END, unit.reference_id, unit.unit_const, player, listId)
-                else:
+        if areaFilter:
+            for player, listId in self.app.unitIndex.spatial.queryRect(x1, y1, x2, y2):
+                if player in playerList:
+                    unit = self.um.units[player][listId]
+                    self.tvUnitList.insert('', END, unit.reference_id, unit.unit_const, player, listId)
+        else:
+            for player in playerList:
+                for listId, unit in enumerate(self.um.units[player]):
                     self.tvUnitList.insert('', END, unit.reference_id, unit.unit_const, player, listId)
 
     def unitIdFilter(self, refIds: list[int]):
@@ -186,11 +187,10 @@ class UnitView(ttk.Frame):
             return
         for item in self.tvUnitList.get_children():
             self.tvUnitList.delete(item)
-        playerList = [p for p in range(0, self.pm.active_players + 1)]
-        for player in playerList:
-            for listId, unit in enumerate(self.um.units[player]):
-                if unit.reference_id in refIds:
-                    self.tvUnitList.insert('', END, unit.reference_id, unit.unit_const, player, listId)
+        for player, listId in self.app.unitIndex.refIds.query(refIds):
+            if player <= self.pm.active_players:
+                unit = self.um.units[player][listId]
+                self.tvUnitList.insert('', END, unit.reference_id, unit.unit_const, player, listId)
         items = self.tvUnitList.get_children()
         if items:
             self.tvUnitList.focus(items[0])